@@ -0,0 +1,37 @@
+"""made role_name unique per organization
+
+Revision ID: c9e1a3b5d7f0
+Revises: b8d0f2a4c6e8
+Create Date: 2026-10-18 22:04:51.137620
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e1a3b5d7f0'
+down_revision: Union[str, None] = 'b8d0f2a4c6e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Refuse to run, naming the offenders, rather than fail halfway through on
+    # an organization that already has two roles with the same name
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT organization_id, role_name, count(*) FROM roles '
+        'GROUP BY organization_id, role_name HAVING count(*) > 1 '
+        'ORDER BY organization_id, role_name LIMIT 20'
+    )).all()
+    if duplicates:
+        listed = ', '.join(f'{role_name!r} x{count} in organization {organization_id}' for organization_id, role_name, count in duplicates)
+        raise RuntimeError(f'Rename or remove the duplicate roles before upgrading: {listed}')
+
+    op.create_unique_constraint('uq_roles_organization_id_role_name', 'roles', ['organization_id', 'role_name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_roles_organization_id_role_name', 'roles', type_='unique')
@@ -0,0 +1,54 @@
+"""added partial indexes for live users
+
+Revision ID: f6b8d0e2a4c6
+Revises: e5a7c9d1f3b5
+Create Date: 2026-10-18 17:21:09.734512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0e2a4c6'
+down_revision: Union[str, None] = 'e5a7c9d1f3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The partial indexes only match queries whose predicate is exactly
+    # is_deleted = false, so NULL is ruled out first
+    op.execute('UPDATE users SET is_deleted = false WHERE is_deleted IS NULL')
+    op.alter_column('users', 'is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=False,
+               existing_server_default=sa.text('false'))
+    op.alter_column('blogs', 'is_deleted',
+               existing_type=sa.BOOLEAN(),
+               server_default=sa.text('false'),
+               existing_nullable=False)
+
+    op.drop_constraint('users_email_key', 'users', type_='unique')
+    op.drop_constraint('users_username_key', 'users', type_='unique')
+    op.create_index('ix_users_live_email', 'users', ['email'], unique=True, postgresql_where=sa.text('is_deleted = false'))
+    op.create_index('ix_users_live_username', 'users', ['username'], unique=True, postgresql_where=sa.text('is_deleted = false'))
+
+
+def downgrade() -> None:
+    # Fails if a deleted user's email or username has since been taken again
+    op.drop_index('ix_users_live_username', table_name='users', postgresql_where=sa.text('is_deleted = false'))
+    op.drop_index('ix_users_live_email', table_name='users', postgresql_where=sa.text('is_deleted = false'))
+    op.create_unique_constraint('users_username_key', 'users', ['username'])
+    op.create_unique_constraint('users_email_key', 'users', ['email'])
+
+    op.alter_column('blogs', 'is_deleted',
+               existing_type=sa.BOOLEAN(),
+               server_default=None,
+               existing_nullable=False)
+    op.alter_column('users', 'is_deleted',
+               existing_type=sa.BOOLEAN(),
+               nullable=True,
+               existing_server_default=sa.text('false'))
@@ -1,30 +1,282 @@
+import asyncio
 import smtplib
-from typing import List, Optional, Union
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
+from api.db.database import AsyncSessionLocal, get_async_engine
+from api.utils.logger import logger
 from api.utils.settings import settings
+from api.v1.models.mail import MailDeadLetter
+
+
+@dataclass
+class MailConfig:
+    '''SMTP server and delivery settings for the mail queue'''
+
+    host: str
+    port: int
+    from_addr: str
+    username: str = ''
+    password: str = ''
+    # "ssl" (implicit TLS, usually port 465), "starttls" or "none"
+    security: str = 'ssl'
+    workers: int = 2
+    batch_size: int = 20
+    max_attempts: int = 5
+    # Seconds before the first retry, doubled for every retry after it
+    retry_backoff: float = 2.0
+    max_pending: int = 10000
+
+    @classmethod
+    def from_settings(cls) -> 'MailConfig':
+        return cls(
+            host=settings.MAIL_SERVER,
+            port=int(settings.MAIL_PORT),
+            from_addr=settings.MAIL_FROM,
+            username=settings.MAIL_USERNAME,
+            password=settings.MAIL_PASSWORD,
+            security=settings.MAIL_SECURITY,
+            workers=settings.MAIL_WORKERS,
+            batch_size=settings.MAIL_BATCH_SIZE,
+            max_attempts=settings.MAIL_MAX_ATTEMPTS,
+            retry_backoff=settings.MAIL_RETRY_BACKOFF,
+            max_pending=settings.MAIL_QUEUE_MAX_PENDING,
+        )
+
+
+@dataclass
+class MailMessage:
+    to: str
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+class SMTPConnection:
+    '''A persistent SMTP connection, opened on first use and reopened after it drops.
+
+    Each queue worker owns one, so the workers form a small connection pool.
+    '''
+
+    def __init__(self, config: MailConfig):
+        self.config = config
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def get(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            config = self.config
+            if config.security == 'ssl':
+                smtp = smtplib.SMTP_SSL(config.host, config.port, timeout=30)
+            else:
+                smtp = smtplib.SMTP(config.host, config.port, timeout=30)
+                if config.security == 'starttls':
+                    smtp.starttls()
+            if config.username:
+                smtp.login(user=config.username, password=config.password)
+            self._smtp = smtp
+        return self._smtp
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class MailQueue:
+    '''Delivers outbound email from asyncio worker tasks started in the app's lifespan.
+
+    Requests only enqueue messages. Workers send them in batches over their
+    persistent connections, retry failures with exponential backoff, and move
+    messages that keep failing, or are refused outright, to the
+    mail_dead_letters table.
+    '''
+
+    def __init__(self, config: Optional[MailConfig] = None, dead_letter: Optional[Callable[[List[Tuple[MailMessage, str]]], Awaitable[None]]] = None):
+        self.config = config
+        self.dead_letter = dead_letter or save_dead_letters
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        # Messages waiting out their backoff, keyed by id(message)
+        self._retries: Dict[int, Tuple[asyncio.TimerHandle, MailMessage]] = {}
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self.config is None:
+            self.config = MailConfig.from_settings()
+
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._work(SMTPConnection(self.config))) for _ in range(self.config.workers)
+        ]
+
+    async def stop(self, timeout: float = 10):
+        '''Waits up to timeout seconds for queued mail to go out, then stops the
+        workers and dead-letters whatever is still queued or waiting to retry'''
+
+        if self._queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+        leftovers = []
+        for handle, message in self._retries.values():
+            handle.cancel()
+            leftovers.append((message, 'Not delivered before shutdown'))
+        while not self._queue.empty():
+            leftovers.append((self._queue.get_nowait(), 'Not delivered before shutdown'))
+
+        if leftovers:
+            await self.dead_letter(leftovers)
+
+        self._queue, self._loop, self._workers, self._retries = None, None, [], {}
+
+    def check_capacity(self):
+        '''Raises a 503 if the queue is full, so callers can shed load before
+        making a change whose email could not be queued'''
+
+        if self._queue is not None and self._queue.qsize() >= self.config.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail='Server is busy, please try again shortly',
+                headers={'Retry-After': '1'}
+            )
+
+    def enqueue(self, to: str, subject: str, body: str, shed: bool = True):
+        '''Queues an email for delivery and returns straight away.
+
+        Safe to call from the event loop and from the threadpool that runs
+        sync routes. With shed=False the email is queued even past
+        max_pending, for emails about changes that are already committed.
+        '''
+
+        if self._queue is None:
+            logger.error(f'Mail queue is not running, email to {to} was not sent')
+            return
+
+        if shed:
+            self.check_capacity()
+
+        message = MailMessage(to=to, subject=subject, body=body)
+
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+
+        if in_loop:
+            self._queue.put_nowait(message)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+
+    def build_message(self, message: MailMessage) -> EmailMessage:
+        email = EmailMessage()
+        email['From'] = self.config.from_addr
+        email['To'] = message.to
+        email['Subject'] = message.subject
+        email.set_content(message.body)
+        return email
+
+    def _send_batch(self, connection: SMTPConnection, messages: List[MailMessage]) -> List[Tuple[MailMessage, Exception]]:
+        '''Sends a batch over one connection (runs in a thread) and returns the failures'''
+
+        failures = []
+        for message in messages:
+            try:
+                connection.get().send_message(self.build_message(message))
+            except smtplib.SMTPRecipientsRefused as exc:
+                failures.append((message, exc))
+            except (smtplib.SMTPException, OSError) as exc:
+                # The connection may be unusable now; the next message reconnects
+                connection.close()
+                failures.append((message, exc))
+        return failures
+
+    async def _work(self, connection: SMTPConnection):
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while len(batch) < self.config.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                try:
+                    failures = await asyncio.to_thread(self._send_batch, connection, batch)
+                    await self._handle_failures(failures)
+                except Exception:
+                    logger.exception('Mail queue worker failed to process a batch')
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            await asyncio.to_thread(connection.close)
+
+    async def _handle_failures(self, failures: List[Tuple[MailMessage, Exception]]):
+        dead = []
+
+        for message, exc in failures:
+            message.attempts += 1
+            # A refused recipient will be refused again, so it isn't retried
+            if isinstance(exc, smtplib.SMTPRecipientsRefused) or message.attempts >= self.config.max_attempts:
+                dead.append((message, f'{type(exc).__name__}: {exc}'))
+            else:
+                delay = self.config.retry_backoff * 2 ** (message.attempts - 1)
+                handle = self._loop.call_later(delay, self._requeue, message)
+                self._retries[id(message)] = (handle, message)
+
+        if dead:
+            await self.dead_letter(dead)
+
+    def _requeue(self, message: MailMessage):
+        self._retries.pop(id(message), None)
+        self._queue.put_nowait(message)
+
+
+async def save_dead_letters(failures: List[Tuple[MailMessage, str]]):
+    '''Records undeliverable emails in the mail_dead_letters table'''
+
+    logger.error(f'{len(failures)} email(s) could not be delivered and were dead-lettered')
+
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        db.add_all([
+            MailDeadLetter(to_address=message.to, subject=message.subject, body=message.body, error=error, attempts=message.attempts)
+            for message, error in failures
+        ])
+        await db.commit()
 
 
 class MailService:
     '''Class to send different emails for different services'''
 
-    def send_mail(self, to: str, subject: str, body: str):
-        '''Function to send email to a user either as a regular test or as html file'''
+    def check_capacity(self):
+        '''Function to fail with a 503 up front when no more email can be queued'''
+
+        mail_queue.check_capacity()
 
-        # try:
-        #     with smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT) as conn:
-        #         conn.starttls()
-        #         conn.login(user=settings.MAIL_USERNAME, password=settings.MAIL_PASSWORD) 
-        #         conn.sendmail(
-        #             from_addr=settings.MAIL_FROM,
-        #             to_addrs=to,
-        #             msg=f"Subject:{subject}\n\n{body}"
-        #         )
+    def send_mail(self, to: str, subject: str, body: str, shed: bool = True):
+        '''Function to queue an email to a user; delivery happens in the background.
 
-        # except smtplib.SMTPException as smtp_error:
-        #     raise HTTPException(500, f'SMTP ERROR- {smtp_error}')
+        Pass shed=False after committing the change the email reports, so a
+        full queue cannot fail a request whose work is already done.
+        '''
 
-        print('Email sent successfully')
+        mail_queue.enqueue(to=to, subject=subject, body=body, shed=shed)
 
 
+mail_queue = MailQueue()
 mail_service = MailService()
@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from api.utils.settings import LazyObject, settings
+
+
+@lru_cache
+def get_crypt_context(rounds: int) -> CryptContext:
+    '''Returns a bcrypt context that hashes with, and expects, the given work factor'''
+
+    return CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=rounds)
+
+
+def _warm_up(rounds: int):
+    get_crypt_context(rounds)
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    return get_crypt_context(rounds).hash(secret=password)
+
+
+def _verify_and_update(password: str, hash: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return get_crypt_context(rounds).verify_and_update(secret=password, hash=hash)
+
+
+class PasswordHasher:
+    '''Runs bcrypt in a dedicated process pool so it never ties up the event
+    loop or the threadpool that serves sync routes'''
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def start(self):
+        '''Start the worker processes up front, before the server is busy,
+        rather than on the first login'''
+
+        for future in [self.executor.submit(_warm_up, self.rounds) for _ in range(self.workers)]:
+            future.result()
+
+    async def _submit(self, func, *args):
+        '''Run func in the pool, shedding load once too many calls are queued'''
+
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail='Server is busy, please try again shortly',
+                headers={'Retry-After': '1'}
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        '''Function to hash a password with the configured work factor'''
+
+        return await self._submit(_hash_password, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hash: str) -> Tuple[bool, Optional[str]]:
+        '''Function to verify a password, returning a new hash if the stored one uses another work factor'''
+
+        return await self._submit(_verify_and_update, password, hash, self.rounds)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = LazyObject(lambda: PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.BCRYPT_ROUNDS
+))
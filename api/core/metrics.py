@@ -0,0 +1,101 @@
+from api.core.dependencies.email import mail_queue
+from api.core.dependencies.hashing import password_hasher
+from api.db.database import get_engines
+from api.db.pool import get_pool_stats
+from api.utils.metrics import MetricsRegistry, histogram_samples
+from api.utils.settings import LazyObject
+from api.v1.services.permission import permission_cache, principal_state_cache
+from api.v1.services.refresh_token import revoked_families
+from api.v1.services.user import token_cache, user_cache
+
+
+registry = MetricsRegistry()
+
+# Recorded by RequestTimingMiddleware, labelled with the route template
+# rather than the raw path so ids don't explode the number of series
+http_requests = registry.counter(
+    'http_requests', 'Requests served', ('method', 'route', 'status')
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time to serve a request', ('method', 'route')
+)
+http_requests_in_flight = registry.gauge(
+    'http_requests_in_flight', 'Requests currently being served'
+)
+http_request_db_time = registry.counter(
+    'http_request_db_seconds', 'Time spent running statements for requests', ('method', 'route')
+)
+http_request_db_statements = registry.counter(
+    'http_request_db_statements', 'Statements run for requests', ('method', 'route')
+)
+http_request_db_rows = registry.counter(
+    'http_request_db_rows', 'Rows returned or changed by statements run for requests', ('method', 'route')
+)
+
+CACHES = {
+    'user': user_cache,
+    'token': token_cache,
+    'permission': permission_cache,
+    'principal_state': principal_state_cache,
+    'revoked_session': LazyObject(lambda: revoked_families.confirmed),
+}
+
+
+@registry.collector
+def collect_pool_metrics():
+    '''Connection pool utilisation for whichever engines have been created'''
+
+    gauges = {
+        'size': 'Connections the pool keeps open',
+        'checked_out': 'Connections in use',
+        'checked_in': 'Idle connections in the pool',
+        'overflow': 'Connections open beyond the pool size',
+    }
+    pools = {name: get_pool_stats(engine) for name, engine in get_engines().items()}
+
+    for stat, help in gauges.items():
+        samples = [('', {'engine': name}, stats[stat]) for name, stats in pools.items() if stat in stats]
+        yield f'db_pool_{stat}', 'gauge', help, samples
+
+    waits = {name: stats['wait_time'] for name, stats in pools.items() if 'wait_time' in stats}
+
+    samples = []
+    for name, wait in waits.items():
+        buckets = [float(bound) for bound in wait['buckets']]
+        samples.extend(histogram_samples({'engine': name}, buckets, wait['buckets'].values(), wait['sum'], cumulative=True))
+    yield 'db_pool_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection', samples
+
+    yield 'db_pool_timeouts', 'counter', 'Checkouts that gave up waiting for a connection', [
+        ('_total', {'engine': name}, wait['timeouts']) for name, wait in waits.items()
+    ]
+
+
+@registry.collector
+def collect_queue_metrics():
+    yield 'password_hash_pending', 'gauge', 'Password hashes queued or running in the bcrypt pool', [
+        ('', {}, password_hasher.pending)
+    ]
+    yield 'password_hash_max_pending', 'gauge', 'Queued hashes beyond which requests get a 503', [
+        ('', {}, password_hasher.max_pending)
+    ]
+    yield 'mail_queue_pending', 'gauge', 'Emails waiting for a mail queue worker', [
+        ('', {}, mail_queue.pending)
+    ]
+
+
+@registry.collector
+def collect_cache_metrics():
+    stats = {name: cache.stats() for name, cache in CACHES.items()}
+
+    yield 'cache_hits', 'counter', 'Cache lookups that found a live entry', [
+        ('_total', {'cache': name}, cache['hits']) for name, cache in stats.items()
+    ]
+    yield 'cache_misses', 'counter', 'Cache lookups that found nothing or an expired entry', [
+        ('_total', {'cache': name}, cache['misses']) for name, cache in stats.items()
+    ]
+    yield 'cache_hit_ratio', 'gauge', 'Share of lookups that were hits since startup', [
+        ('', {'cache': name}, cache['hit_ratio']) for name, cache in stats.items()
+    ]
+    yield 'cache_size', 'gauge', 'Entries currently cached', [
+        ('', {'cache': name}, cache['size']) for name, cache in stats.items()
+    ]
@@ -0,0 +1,98 @@
+import time
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.metrics import (
+    http_request_db_rows,
+    http_request_db_statements,
+    http_request_db_time,
+    http_request_duration,
+    http_requests,
+    http_requests_in_flight,
+)
+from api.db.instrumentation import RequestStats, install_query_hooks, request_stats, shorten
+from api.utils.logger import logger
+from api.utils.settings import settings
+
+
+class RequestTimingMiddleware:
+    '''Times every request and the statements it runs.
+
+    Adds a Server-Timing header (total time, and database time with the
+    statement count), records per-route metrics for /metrics, and logs
+    slow requests and statements repeated more than n_plus_one_threshold
+    times in one request, the usual sign of an N+1 query.
+
+    Time spent streaming a response body after its headers are sent is
+    counted in the metrics but can't be in the header.
+    '''
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        slow_request_ms: Optional[float] = None,
+        slow_query_ms: Optional[float] = None,
+        n_plus_one_threshold: Optional[int] = None,
+    ):
+        self.app = app
+        # Starlette builds the middleware stack on the first request, so these
+        # settings are still read lazily
+        self.slow_request_ms = settings.SLOW_REQUEST_MS if slow_request_ms is None else slow_request_ms
+        self.n_plus_one_threshold = settings.N_PLUS_ONE_THRESHOLD if n_plus_one_threshold is None else n_plus_one_threshold
+        install_query_hooks(settings.SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started_at = time.perf_counter()
+        # Reported when the app fails before it starts a response
+        status = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                elapsed = time.perf_counter() - started_at
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'Server-Timing',
+                    f'app;dur={elapsed * 1000:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries"'
+                )
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            http_requests_in_flight.dec()
+            request_stats.reset(token)
+            self.record(scope, status, time.perf_counter() - started_at, stats)
+
+    def record(self, scope: Scope, status: int, seconds: float, stats: RequestStats):
+        # The route template, not the raw path, keeps ids out of the keys
+        route = scope.get('route')
+        path = getattr(route, 'path', '<unmatched>')
+        method = scope['method']
+
+        http_requests.inc(method, path, str(status))
+        http_request_duration.observe(seconds, method, path)
+        http_request_db_time.inc(method, path, amount=stats.db_time)
+        http_request_db_statements.inc(method, path, amount=stats.statements)
+        http_request_db_rows.inc(method, path, amount=stats.rows)
+
+        if self.slow_request_ms and seconds * 1000 >= self.slow_request_ms:
+            logger.warning(
+                f'Slow request {method} {path}: {seconds * 1000:.1f}ms, '
+                f'{stats.statements} queries in {stats.db_time * 1000:.1f}ms, {stats.rows} rows'
+            )
+
+        if not self.n_plus_one_threshold:
+            return
+
+        for statement, count in stats.repeated_statements(self.n_plus_one_threshold):
+            logger.warning(f'Possible N+1 in {method} {path}: statement ran {count} times: {shorten(statement)}')
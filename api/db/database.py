@@ -2,20 +2,30 @@
 """ The database module
 """
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, make_url
+from api.db.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from api.db.soft_delete import SoftDeleteSession
 from api.utils.settings import settings, BASE_DIR
 
 
-DB_HOST = settings.DB_HOST
-DB_PORT = settings.DB_PORT
-DB_USER = settings.DB_USER
-DB_PASSWORD = settings.DB_PASSWORD
-DB_NAME = settings.DB_NAME
-DB_TYPE = settings.DB_TYPE
+def get_pool_options(poolclass) -> dict:
+    '''Pool sizing and health options shared by the sync and async engines'''
+
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
 
 
 def get_db_engine(test_mode: bool = False):
+    DB_HOST, DB_PORT, DB_NAME = settings.DB_HOST, settings.DB_PORT, settings.DB_NAME
+    DB_USER, DB_PASSWORD, DB_TYPE = settings.DB_USER, settings.DB_PASSWORD, settings.DB_TYPE
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     
     if DB_TYPE == "sqlite" or test_mode:
@@ -30,23 +40,144 @@ def get_db_engine(test_mode: bool = False):
             )
     elif DB_TYPE == "postgresql":
         DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    if settings.DATABASE_URL:
+        DATABASE_URL = settings.DATABASE_URL
+
+    connect_args = {}
+    if DATABASE_URL.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    if DATABASE_URL.startswith("postgresql") and settings.DB_STATEMENT_TIMEOUT:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"
         
-    return create_engine(DATABASE_URL)
+    return create_engine(DATABASE_URL, connect_args=connect_args, **get_pool_options(InstrumentedQueuePool))
+
+
+def get_async_url(url: str) -> str:
+    '''Swaps a sync database URL's driver for its asyncio counterpart'''
+
+    url = make_url(url)
+    drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    return url.set(drivername=drivers.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+
+def get_async_db_engine(test_mode: bool = False):
+    '''Async counterpart of get_db_engine (asyncpg for postgres, aiosqlite for sqlite)'''
+
+    DB_HOST, DB_PORT, DB_NAME = settings.DB_HOST, settings.DB_PORT, settings.DB_NAME
+    DB_USER, DB_PASSWORD, DB_TYPE = settings.DB_USER, settings.DB_PASSWORD, settings.DB_TYPE
+    DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    if DB_TYPE == "sqlite" or test_mode:
+        BASE_PATH = f"sqlite+aiosqlite:///{BASE_DIR}"
+        DATABASE_URL = BASE_PATH + "/"
+
+        if test_mode:
+            DATABASE_URL = BASE_PATH + "test.db"
+
+    if settings.DATABASE_URL:
+        DATABASE_URL = get_async_url(settings.DATABASE_URL)
+
+    connect_args = {}
+    if DATABASE_URL.startswith("postgresql") and settings.DB_STATEMENT_TIMEOUT:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)}
+
+    return create_async_engine(DATABASE_URL, connect_args=connect_args, **get_pool_options(InstrumentedAsyncQueuePool))
         
-engine = get_db_engine()
+_engine = None
+_async_engine = None
+
+# Bound to their engines when those are first created (see get_engine); both
+# leave soft deleted rows out of their queries (see api/db/soft_delete.py)
+SessionLocal = sessionmaker(class_=SoftDeleteSession, autocommit=False, autoflush=False)
+
+# expire_on_commit is disabled so attributes stay readable after commit
+# without triggering an implicit (and, under asyncio, illegal) lazy load
+AsyncSessionLocal = async_sessionmaker(sync_session_class=SoftDeleteSession, autoflush=False, expire_on_commit=False)
+
+
+def get_engine():
+    '''Returns the sync engine, creating it on first use rather than at import'''
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    global _engine
+    if _engine is None:
+        _engine = get_db_engine()
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_async_engine():
+    '''Returns the async engine, creating it on first use rather than at import'''
+
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = get_async_db_engine()
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+def get_engines() -> dict:
+    '''Returns the engines created so far by name, without creating any'''
+
+    engines = {}
+    if _engine is not None:
+        engines["sync"] = _engine
+    if _async_engine is not None:
+        engines["async"] = _async_engine.sync_engine
+    return engines
+
+
+def init_db():
+    '''Creates both engines up front; called from the app's lifespan'''
+
+    get_engine()
+    get_async_engine()
+
+
+async def dispose_db():
+    '''Closes every pooled connection; called when the app shuts down'''
+
+    global _engine, _async_engine
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def __getattr__(name: str):
+    # Keeps `from api.db.database import engine` working without creating
+    # the engines at import
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-db_session = scoped_session(SessionLocal)
 
 Base = declarative_base()
 
 def create_database():
-    return Base.metadata.create_all(bind=engine)
+    return Base.metadata.create_all(bind=get_engine())
 
 def get_db():
-    db = db_session()
+    # A plain session per request: a thread-keyed scoped_session would be
+    # shared by every request that lands on the same threadpool worker
+    db = SessionLocal(bind=get_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_db_including_deleted():
+    # For admin tooling that has to see soft deleted rows
+    db = SessionLocal(bind=get_engine(), info={"include_deleted": True})
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
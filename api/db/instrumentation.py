@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+""" Per-request query instrumentation
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+# Longest statement/parameter text written to the log
+MAX_LOGGED_LENGTH = 1000
+
+
+class RequestStats:
+    """ Statements run on behalf of one request.
+
+    Routes run by the threadpool and async sessions (through their greenlets)
+    see the object set by the middleware, so it is mutated in place rather
+    than replaced.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.statement_counts: Counter = Counter()
+
+    def observe(self, statement: str, seconds: float, rowcount: int):
+        self.statements += 1
+        self.db_time += seconds
+        # rowcount is -1 when the driver doesn't report it, e.g. for some selects
+        if rowcount > 0:
+            self.rows += rowcount
+        self.statement_counts[statement] += 1
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """ returns statements run more than threshold times, most repeated first
+        """
+        return [(statement, count) for statement, count in self.statement_counts.most_common() if count > threshold]
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def shorten(text: str) -> str:
+    return text if len(text) <= MAX_LOGGED_LENGTH else text[:MAX_LOGGED_LENGTH] + "..."
+
+
+class QueryHooks:
+    """ before/after_cursor_execute listeners that time every statement.
+
+    They are attached to the Engine class, so they cover the sync engine,
+    the async engine (whose statements run on its sync_engine) and any
+    engine built in tests or scripts.
+    """
+
+    def __init__(self, slow_query_ms: float = 200):
+        self.slow_query_ms = slow_query_ms
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context._query_started_at
+
+        stats = request_stats.get()
+        if stats is not None:
+            stats.observe(statement, seconds, cursor.rowcount)
+
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            logger.warning(
+                f"Slow query ({seconds * 1000:.1f}ms): {shorten(statement)} "
+                f"parameters: {shorten(repr(parameters))}"
+            )
+
+
+query_hooks = QueryHooks()
+
+
+def install_query_hooks(slow_query_ms: Optional[float] = None):
+    """ attaches the query hooks to every engine; safe to call more than once
+    """
+    if slow_query_ms is not None:
+        query_hooks.slow_query_ms = slow_query_ms
+
+    for name in ("before_cursor_execute", "after_cursor_execute"):
+        listener = getattr(query_hooks, name)
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+""" Named eager loading plans, and the serialiser that goes with them
+"""
+from typing import Callable, Mapping
+
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.orm import raiseload
+
+
+def serialize_columns(obj) -> dict:
+    """ returns the instance's column values; relationships are never
+    touched, so serialising can not trigger a lazy load
+    """
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+class LoaderProfile:
+    """ The relationships to eager load for one use of a model, each with its
+    loader strategy (selectinload, joinedload...).
+
+    Every other relationship raises when touched instead of lazy loading, so
+    loading a page of N rows costs the same few queries whatever N is.
+    """
+
+    def __init__(self, **relationships: Callable):
+        self.relationships = relationships
+
+    def options(self, model) -> list:
+        """ returns the loader options to pass to a query of model
+        """
+        options = [loader(getattr(model, name)) for name, loader in self.relationships.items()]
+        return options + [raiseload("*")]
+
+    def serialize(self, obj) -> dict:
+        """ returns obj.to_dict() plus the profile's relationships, each
+        serialised the same way
+        """
+        data = obj.to_dict()
+
+        for name in self.relationships:
+            related = getattr(obj, name)
+            if isinstance(related, list):
+                data[name] = [item.to_dict() for item in related]
+            else:
+                data[name] = related.to_dict() if related is not None else None
+
+        return data
+
+
+def get_loader_profile(profiles: Mapping[str, LoaderProfile], name: str) -> LoaderProfile:
+    """ returns the profile registered under name, or a 400 naming the valid ones
+    """
+    if name not in profiles:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{name}', expected one of {', '.join(profiles)}")
+
+    return profiles[name]
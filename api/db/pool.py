@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+""" Connection pool instrumentation
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolWaitHistogram:
+    """ Histogram of the time spent waiting for a pooled connection
+    """
+    # upper bounds in seconds, the last bucket catches everything else
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+
+    def observe(self, seconds: float):
+        index = bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def observe_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def to_dict(self):
+        """ returns the histogram with cumulative bucket counts
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count, total, timeouts = self.count, self.total, self.timeouts
+
+        buckets, cumulative = {}, 0
+        for bound, bucket_count in zip(self.BUCKETS, counts):
+            cumulative += bucket_count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+
+        return {
+            "count": count,
+            "sum": total,
+            "timeouts": timeouts,
+            "buckets": buckets,
+        }
+
+
+class _WaitTimingMixin:
+    """ Times every checkout that has to go through the pool queue.
+
+    The histogram lives on the class rather than the instance because
+    SQLAlchemy rebuilds the pool object on dispose()/recreate().
+    """
+    wait_histogram: PoolWaitHistogram
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.wait_histogram.observe_timeout()
+            raise
+        finally:
+            self.wait_histogram.observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    wait_histogram = PoolWaitHistogram()
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    wait_histogram = PoolWaitHistogram()
+
+
+def get_pool_stats(engine) -> dict:
+    """ returns live utilisation figures for an engine's pool
+    """
+    pool = engine.pool
+    stats = {"pool_class": pool.__class__.__name__}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+
+    if isinstance(pool, _WaitTimingMixin):
+        stats["wait_time"] = pool.wait_histogram.to_dict()
+
+    return stats
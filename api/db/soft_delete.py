@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Soft delete: flagged rows stay in their tables but are left out of the
+ORM queries run through the app's sessions
+"""
+from sqlalchemy import Boolean, Column, event, false, text
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+
+class SoftDeleteMixin:
+    """ Gives a model an is_deleted column that hides its rows once set;
+    partial indexes on such tables should use `is_deleted = false`, the
+    predicate added to every query
+    """
+    is_deleted = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+
+
+class SoftDeleteSession(Session):
+    """ A session whose SELECTs leave out soft deleted rows, unless the
+    statement is run with the include_deleted execution option or the
+    session was made with info={"include_deleted": True}
+    """
+
+
+@event.listens_for(SoftDeleteSession, "do_orm_execute")
+def exclude_deleted(execute_state: ORMExecuteState):
+    # Lazy and column loads inherit the criteria from the query that loaded
+    # their parent, so only top level statements need it
+    if (
+        not execute_state.is_select
+        or execute_state.is_column_load
+        or execute_state.is_relationship_load
+        or execute_state.execution_options.get("include_deleted", False)
+        or execute_state.session.info.get("include_deleted", False)
+    ):
+        return
+
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(SoftDeleteMixin, lambda cls: cls.is_deleted == false(), include_aliases=True)
+    )
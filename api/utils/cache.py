@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+""" In-process caching helpers
+"""
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from hashlib import blake2b
+from typing import Any, Hashable, Iterable, Optional
+
+
+class TTLCache:
+    """ A bounded, thread-safe LRU cache whose entries expire.
+
+    Every entry expires ``ttl`` seconds after it was stored unless an
+    explicit ``expires_at`` (a ``time.time()`` timestamp) is given.
+    Being in-process, it is only ever as fresh as its TTL across workers.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """ returns the size and hit/miss counters of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class BloomFilter:
+    """ A fixed-size set of strings that may report false positives but
+    never false negatives.
+
+    Sized for ``capacity`` members at ``error_rate``; past capacity the
+    false positive rate climbs, so callers should rebuild it from their
+    source of truth now and then. Members cannot be removed.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001, members: Iterable[str] = ()):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = Lock()
+        self.count = 0
+
+        for member in members:
+            self.add(member)
+
+    def _positions(self, member: str):
+        # Two halves of one digest give every position (Kirsch-Mitzenmacher)
+        digest = blake2b(member.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, member: str):
+        positions = self._positions(member)
+
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, member: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(member))
+
+    def __len__(self):
+        return self.count
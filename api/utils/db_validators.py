@@ -1,13 +1,38 @@
+from typing import Sequence
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-def check_model_existence(db: Session, model, id):
-    '''Checks if a model exists by its id'''
+def check_model_existence(db: Session, model, id, options: Sequence = ()):
+    '''Checks if a model exists by its id, loading it with the given loader options'''
 
     # obj = db.query(model).filter(model.id == id).first()
-    obj = db.get(model, ident=id)
+    obj = db.get(model, ident=id, options=options)
 
     if not obj:
         raise HTTPException(status_code=404, detail=f'{model.__name__} does not exist')
     
     return obj
+
+
+async def async_check_model_existence(db: AsyncSession, model, id, options: Sequence = ()):
+    '''Checks if a model exists by its id using an async session'''
+
+    obj = await db.get(model, ident=id, options=options)
+
+    if not obj:
+        raise HTTPException(status_code=404, detail=f'{model.__name__} does not exist')
+
+    return obj
+
+
+def is_unique_violation(exc: IntegrityError) -> bool:
+    '''Checks if an IntegrityError was raised by a unique constraint'''
+
+    # psycopg2 and asyncpg both expose the SQLSTATE as pgcode, sqlite only has the message
+    pgcode = getattr(exc.orig, 'pgcode', None)
+    if pgcode is not None:
+        return pgcode == '23505'
+
+    return 'UNIQUE constraint failed' in str(exc.orig)
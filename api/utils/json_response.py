@@ -1,14 +1,41 @@
 #!/usr/bin/env python3
 """ This module contains the Json response class
 """
+from decimal import Decimal
 from enum import Enum
 from json import dumps
+from typing import Any
+
+import orjson
 from fastapi import status
 from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+
+def default(obj: Any):
+    """serialize the types orjson does not handle natively
+    (datetime, date, UUID, Enum and dataclasses are handled by orjson)
+    """
+    if isinstance(obj, Decimal):
+        # same convention as fastapi's jsonable_encoder
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    """ JSON response rendered with orjson, used as the app's default
+    response class
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
 
 
-class JsonResponseDict(JSONResponse):
+class JsonResponseDict(ORJSONResponse):
 
     def __init__(self, message: str, data: dict | None = None, error: str = "", status_code=200):
         """initialize your response"""
@@ -16,7 +43,7 @@ class JsonResponseDict(JSONResponse):
         self.data = data
         self.error = error
         self.status_code = status_code
-        super().__init__(content=jsonable_encoder(self.response()), status_code=status_code)
+        super().__init__(content=self.response(), status_code=status_code)
 
     def __repr__(self):
         return {
@@ -37,7 +64,6 @@ class JsonResponseDict(JSONResponse):
 
     def response(self):
         """return a json response dictionary"""
-        print(f"response: {format(self)}")
         if self.status_code < 300:
             return {
                 "message": self.message,
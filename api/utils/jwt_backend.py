@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+""" Interchangeable JWT signing backends
+"""
+from abc import ABC, abstractmethod
+
+import jwt as pyjwt
+from jose import jwt as jose_jwt, JWTError
+from api.utils.settings import LazyObject, settings
+
+
+class TokenDecodeError(Exception):
+    """ Raised by every backend when a token is malformed, expired or
+    carries a bad signature
+    """
+
+
+class JWTBackend(ABC):
+    """ Encodes and decodes signed tokens with the configured key
+    """
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, payload: dict) -> str:
+        pass
+
+    @abstractmethod
+    def decode(self, token: str) -> dict:
+        pass
+
+
+class JoseBackend(JWTBackend):
+    """ python-jose implementation
+    """
+
+    def encode(self, payload: dict) -> str:
+        return jose_jwt.encode(payload, self.secret_key, self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jose_jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError as exc:
+            raise TokenDecodeError(str(exc)) from exc
+
+
+class PyJWTBackend(JWTBackend):
+    """ PyJWT implementation
+    """
+
+    def encode(self, payload: dict) -> str:
+        return pyjwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return pyjwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except pyjwt.PyJWTError as exc:
+            raise TokenDecodeError(str(exc)) from exc
+
+
+JWT_BACKENDS = {
+    "jose": JoseBackend,
+    "pyjwt": PyJWTBackend,
+}
+
+
+def get_jwt_backend(name: str, secret_key: str = None, algorithm: str = None) -> JWTBackend:
+    """ returns the backend registered under name
+    """
+    if name not in JWT_BACKENDS:
+        raise ValueError(f"Unknown JWT backend '{name}', expected one of {', '.join(JWT_BACKENDS)}")
+
+    return JWT_BACKENDS[name](secret_key or settings.SECRET_KEY, algorithm or settings.ALGORITHM)
+
+
+jwt_backend = LazyObject(lambda: get_jwt_backend(settings.JWT_BACKEND))
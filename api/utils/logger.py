@@ -1,13 +1,27 @@
 import logging
 
-# Configure the logging
-logging.basicConfig(
-    level=logging.ERROR, 
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("error.log"),
-        logging.StreamHandler()
-    ]
-)
-
-logger = logging.getLogger(__name__)
\ No newline at end of file
+from api.utils.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging():
+    '''Attaches the error.log and console handlers to the root logger.
+
+    Called from the app's lifespan, so importing the app (in tests, scripts or
+    each worker before it serves) doesn't open error.log. The console logs at
+    LOG_LEVEL, which lets slow request and query warnings through by default.
+    '''
+
+    file_handler = logging.FileHandler("error.log")
+    file_handler.setLevel(logging.ERROR)
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL.upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            file_handler,
+            logging.StreamHandler()
+        ]
+    )
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+""" Prometheus-style metrics with lock-free updates
+
+Every thread writes to its own shard, so recording a value never waits on a
+lock and never loses an update; a scrape sums the shards. The lock is only
+taken the first time a thread records anything, to register its shard.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# (name suffix, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+# (name, type, help, samples)
+MetricFamily = Tuple[str, str, str, List[Sample]]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class _Sharded:
+    """ Base for metrics whose state is split into one dict per thread
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshots(self) -> List[list]:
+        # Copying a dict's items is atomic under the GIL, so a writer
+        # adding a label set mid-scrape can't break the iteration
+        with self._lock:
+            shards = list(self._shards)
+        return [list(shard.items()) for shard in shards]
+
+    def _labels(self, values: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        totals: Dict[tuple, float] = {}
+        for items in self._snapshots():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def collect(self) -> MetricFamily:
+        suffix = "_total" if self.type == "counter" else ""
+        samples = [(suffix, self._labels(labels), value) for labels, value in self.values().items()]
+        return self.name, self.type, self.help, samples
+
+
+class Gauge(Counter):
+    """ A counter that can go down, e.g. requests in flight. A thread may
+    decrement what another incremented, since only the sum is reported.
+    """
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != float("inf"):
+            self.buckets += (float("inf"),)
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # per-bucket counts followed by the sum
+            state = shard[labels] = [0] * len(self.buckets) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def values(self) -> Dict[tuple, list]:
+        totals: Dict[tuple, list] = {}
+        for items in self._snapshots():
+            for labels, state in items:
+                total = totals.setdefault(labels, [0] * len(state))
+                for index, value in enumerate(list(state)):
+                    total[index] += value
+        return totals
+
+    def collect(self) -> MetricFamily:
+        samples = []
+        for labels, state in self.values().items():
+            label_dict = self._labels(labels)
+            samples.extend(histogram_samples(label_dict, self.buckets, state[:-1], state[-1]))
+        return self.name, self.type, self.help, samples
+
+
+def histogram_samples(labels: Dict[str, str], buckets: Iterable[float], counts: Iterable[int], total: float, cumulative: bool = False) -> List[Sample]:
+    """ returns the _bucket, _sum and _count samples of one histogram series
+    """
+    samples, running = [], 0
+    for bound, count in zip(buckets, counts):
+        running = count if cumulative else running + count
+        samples.append(("_bucket", {**labels, "le": format_bound(bound)}, running))
+    samples.append(("_sum", labels, total))
+    samples.append(("_count", labels, running))
+    return samples
+
+
+def format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """ Metrics plus collectors, callables that report values read at scrape
+    time (pool sizes, queue depths and the like) as MetricFamily tuples
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, func: Callable[[], Iterable[MetricFamily]]):
+        self._collectors.append(func)
+        return func
+
+    def collect(self) -> Iterable[MetricFamily]:
+        for metric in self._metrics:
+            yield metric.collect()
+        for collector in self._collectors:
+            yield from collector()
+
+    def render(self) -> str:
+        """ returns every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for name, type, help, samples in self.collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+                series = f"{name}{suffix}{{{label_text}}}" if label_text else f"{name}{suffix}"
+                lines.append(f"{series} {format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,65 @@
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    '''Keeps a requested page size between 1 and MAX_PAGE_SIZE'''
+
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def apply_search_filters(query, model, filterable_columns: Iterable[str], query_params: Dict[str, Any]):
+    '''Adds a substring match for every whitelisted column present in query_params.
+
+    Works on both legacy Query objects and select() statements.
+    '''
+
+    for column, value in query_params.items():
+        if column not in filterable_columns:
+            raise HTTPException(status_code=400, detail=f'Cannot filter by {column}')
+
+        if value:
+            query = query.where(getattr(model, column).ilike(f'%{value}%'))
+
+    return query
+
+
+def apply_keyset(query, column, cursor: Optional[str], limit: int):
+    '''Restricts a query to the page after cursor, ordered by column.
+
+    Cursors are row ids, so anything that is not a UUID is rejected, and the
+    rest are compared in the lowercase form the ids are stored in. One extra
+    row is fetched so get_page can tell whether a next page exists.
+    '''
+
+    if cursor:
+        try:
+            cursor = str(UUID(cursor))
+        except ValueError:
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+
+        query = query.where(column > cursor)
+
+    return query.order_by(column).limit(limit + 1)
+
+
+def get_page(rows: Sequence, limit: int, key: Callable[[Any], Any] = lambda row: row.id) -> dict:
+    '''Splits the rows fetched by apply_keyset into a page and the next cursor'''
+
+    items = list(rows[:limit])
+    next_cursor = key(items[-1]) if len(rows) > limit else None
+
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'limit': limit,
+    }
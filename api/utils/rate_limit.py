@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+""" Token bucket rate limiting with interchangeable storage backends
+"""
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from api.utils.settings import settings
+
+
+@dataclass(frozen=True)
+class Limit:
+    """ Allows a burst of `requests`, refilled steadily over `period` seconds
+    """
+    requests: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.period
+
+
+class RateLimitBackend(ABC):
+    """ Stores token buckets and takes tokens from them atomically
+    """
+
+    @abstractmethod
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        """ takes cost tokens from the bucket at key if it holds enough, and
+        returns whether it did and, if not, the seconds until it would
+        """
+
+    async def close(self):
+        pass
+
+
+def refill(tokens: float, elapsed: float, limit: Limit, cost: float) -> Tuple[float, bool, float]:
+    """ token bucket step shared by the in-process backends: returns the
+    tokens left, whether cost was taken, and the wait before it could be
+    """
+    tokens = min(limit.requests, tokens + max(0.0, elapsed) * limit.rate)
+
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / limit.rate
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """ Buckets held by this process, so each worker limits on its own.
+
+    Only the max_keys most recently used buckets are kept; an evicted
+    bucket comes back full, as it would have been after a quiet period.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (limit.requests, now))
+            tokens, allowed, retry_after = refill(tokens, now - updated_at, limit, cost)
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+
+# Runs atomically in Redis, timed by the server's clock so that workers on
+# hosts whose clocks disagree still share one refill schedule
+TOKEN_BUCKET_SCRIPT = """
+local requests = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or requests
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(requests, tokens + math.max(0, now - updated_at) * rate)
+
+local allowed, retry_after = 0, 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(requests / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """ Buckets shared by every worker through Redis.
+
+    Takes any client with redis-py's asyncio register_script interface;
+    from_url builds a real one, which needs the redis package installed.
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimitBackend":
+        try:
+            from redis.asyncio import Redis
+        except ImportError as exc:
+            raise RuntimeError('RATE_LIMIT_BACKEND "redis" needs the redis package installed') from exc
+
+        return cls(Redis.from_url(url))
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(keys=[self.prefix + key], args=[limit.requests, limit.rate, cost])
+        return bool(int(allowed)), float(retry_after)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+RATE_LIMIT_BACKENDS = {
+    "memory": lambda: MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS),
+    "redis": lambda: RedisRateLimitBackend.from_url(settings.RATE_LIMIT_REDIS_URL),
+}
+
+
+def get_rate_limit_backend(name: str) -> RateLimitBackend:
+    """ returns a new backend of the kind registered under name
+    """
+    if name not in RATE_LIMIT_BACKENDS:
+        raise ValueError(f"Unknown rate limit backend '{name}', expected one of {', '.join(RATE_LIMIT_BACKENDS)}")
+
+    return RATE_LIMIT_BACKENDS[name]()
+
+
+class RateLimiter:
+    """ Checks requests against token buckets in the configured backend,
+    which is only created on first use
+    """
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None):
+        self._backend = backend
+
+    @property
+    def backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = get_rate_limit_backend(settings.RATE_LIMIT_BACKEND)
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: RateLimitBackend):
+        self._backend = backend
+
+    async def hit(self, key: str, limit: Limit):
+        """ takes a token for key, raising a 429 with Retry-After when the
+        bucket is empty
+        """
+        allowed, retry_after = await self.backend.take(key, limit)
+
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    async def close(self):
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+
+def client_ip(request: Request) -> str:
+    """ returns the caller's address, taken from X-Forwarded-For only when
+    the app is configured to sit behind RATE_LIMIT_TRUSTED_PROXIES proxies.
+
+    Each proxy appends the address it was connected from, so the entry the
+    outermost trusted proxy added is the last but (hops - 1); anything to its
+    left came from the client and is ignored.
+    """
+    hops = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",")]
+        if len(forwarded) >= hops and forwarded[-hops]:
+            return forwarded[-hops]
+
+    return request.client.host if request.client else "unknown"
+
+
+rate_limiter = RateLimiter()
@@ -1,3 +1,7 @@
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Callable
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from decouple import config
 from pathlib import Path
@@ -7,29 +11,162 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 
 
+def env(name: str, **kwargs):
+    """ A field read with decouple when Settings is instantiated rather than
+    when this module is imported
+    """
+    return Field(default_factory=lambda: config(name, **kwargs))
+
+
 class Settings(BaseSettings):
     """ Class to hold application's config values."""
 
     # API_V1_STR: str = "/api/v1"
     # APP_NAME: str = "TicketHub"
-    SECRET_KEY: str = config("SECRET_KEY")
-    ALGORITHM: str = config("ALGORITHM")
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES")
-    JWT_REFRESH_EXPIRY: int = config("JWT_REFRESH_EXPIRY")
+    SECRET_KEY: str = env("SECRET_KEY")
+    ALGORITHM: str = env("ALGORITHM")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = env("ACCESS_TOKEN_EXPIRE_MINUTES")
+    JWT_REFRESH_EXPIRY: int = env("JWT_REFRESH_EXPIRY")
+    # Also how long another worker may act on a user's old roles, admin flag or active flag
+    USER_CACHE_TTL: int = env("USER_CACHE_TTL", default=30, cast=int)
+    USER_CACHE_MAXSIZE: int = env("USER_CACHE_MAXSIZE", default=10000, cast=int)
+    TOKEN_CACHE_MAXSIZE: int = env("TOKEN_CACHE_MAXSIZE", default=10000, cast=int)
+    PERMISSION_CACHE_MAXSIZE: int = env("PERMISSION_CACHE_MAXSIZE", default=10000, cast=int)
+    PLAN_CATALOGUE_TTL: int = env("PLAN_CATALOGUE_TTL", default=60, cast=int)
+    # Console log level; error.log only ever receives errors
+    LOG_LEVEL: str = env("LOG_LEVEL", default="WARNING")
+
+    # Request instrumentation, 0 disables a check
+    SLOW_REQUEST_MS: float = env("SLOW_REQUEST_MS", default=1000, cast=float)
+    SLOW_QUERY_MS: float = env("SLOW_QUERY_MS", default=200, cast=float)
+    # Log a possible N+1 when one statement runs more than this many times in a request
+    N_PLUS_ONE_THRESHOLD: int = env("N_PLUS_ONE_THRESHOLD", default=10, cast=int)
+
+    # Signing library for JWTs, either "jose" (python-jose) or "pyjwt"
+    JWT_BACKEND: str = env("JWT_BACKEND", default="jose")
+
+    # Revoked refresh token families, checked against a per-worker bloom filter
+    # that picks up other workers' revocations every REVOCATION_SYNC_SECONDS
+    REVOCATION_FILTER_CAPACITY: int = env("REVOCATION_FILTER_CAPACITY", default=100000, cast=int)
+    REVOCATION_FILTER_ERROR_RATE: float = env("REVOCATION_FILTER_ERROR_RATE", default=0.001, cast=float)
+    REVOCATION_SYNC_SECONDS: int = env("REVOCATION_SYNC_SECONDS", default=10, cast=int)
+    # Rebuilds the filter and deletes expired refresh tokens
+    REVOCATION_REBUILD_SECONDS: int = env("REVOCATION_REBUILD_SECONDS", default=3600, cast=int)
+
+    # Rate limiting: "memory" keeps buckets per worker, "redis" shares them
+    RATE_LIMIT_BACKEND: str = env("RATE_LIMIT_BACKEND", default="memory")
+    RATE_LIMIT_REDIS_URL: str = env("RATE_LIMIT_REDIS_URL", default="redis://localhost:6379/0")
+    RATE_LIMIT_MAX_KEYS: int = env("RATE_LIMIT_MAX_KEYS", default=100000, cast=int)
+    # How many proxies in front of the app append to X-Forwarded-For; the client IP
+    # is the entry the outermost of them added. 0 ignores the header, which clients can forge
+    RATE_LIMIT_TRUSTED_PROXIES: int = env("RATE_LIMIT_TRUSTED_PROXIES", default=0, cast=int)
+    # Seconds for an emptied bucket to refill; the limits below are bursts per period, 0 disables one
+    RATE_LIMIT_PERIOD: int = env("RATE_LIMIT_PERIOD", default=60, cast=int)
+    LOGIN_RATE_LIMIT_IP: int = env("LOGIN_RATE_LIMIT_IP", default=20, cast=int)
+    LOGIN_RATE_LIMIT_USERNAME: int = env("LOGIN_RATE_LIMIT_USERNAME", default=5, cast=int)
+    REGISTER_RATE_LIMIT_IP: int = env("REGISTER_RATE_LIMIT_IP", default=10, cast=int)
+    REGISTER_RATE_LIMIT_USERNAME: int = env("REGISTER_RATE_LIMIT_USERNAME", default=3, cast=int)
+
+    # Password hashing configurations
+    BCRYPT_ROUNDS: int = env("BCRYPT_ROUNDS", default=12, cast=int)
+    PASSWORD_HASH_WORKERS: int = env("PASSWORD_HASH_WORKERS", default=2, cast=int)
+    PASSWORD_HASH_MAX_PENDING: int = env("PASSWORD_HASH_MAX_PENDING", default=64, cast=int)
 
     # Database configurations
-    DB_HOST: str = config("DB_HOST")
-    DB_PORT: int = config("DB_PORT", cast=int)
-    DB_USER: str = config("DB_USER")
-    DB_PASSWORD: str = config("DB_PASSWORD")
-    DB_NAME: str = config("DB_NAME")
-    DB_TYPE: str = config("DB_TYPE")
+    DB_HOST: str = env("DB_HOST")
+    DB_PORT: int = env("DB_PORT", cast=int)
+    DB_USER: str = env("DB_USER")
+    DB_PASSWORD: str = env("DB_PASSWORD")
+    DB_NAME: str = env("DB_NAME")
+    DB_TYPE: str = env("DB_TYPE")
+    # A full SQLAlchemy URL, e.g. sqlite:///bench.db; overrides the DB_* values above when set
+    DATABASE_URL: str = env("DATABASE_URL", default="")
+
+    # Connection pool configurations
+    DB_POOL_SIZE: int = env("DB_POOL_SIZE", default=5, cast=int)
+    DB_MAX_OVERFLOW: int = env("DB_MAX_OVERFLOW", default=10, cast=int)
+    DB_POOL_TIMEOUT: int = env("DB_POOL_TIMEOUT", default=30, cast=int)
+    DB_POOL_RECYCLE: int = env("DB_POOL_RECYCLE", default=1800, cast=int)
+    DB_POOL_PRE_PING: bool = env("DB_POOL_PRE_PING", default=True, cast=bool)
+    # Per-statement timeout in milliseconds (postgres only), 0 disables it
+    DB_STATEMENT_TIMEOUT: int = env("DB_STATEMENT_TIMEOUT", default=0, cast=int)
+
+    MAIL_USERNAME: str = env("MAIL_USERNAME")
+    MAIL_PASSWORD: str = env('MAIL_PASSWORD')
+    MAIL_FROM: str = env('MAIL_FROM')
+    MAIL_PORT: int = env('MAIL_PORT')
+    MAIL_SERVER: str = env('MAIL_SERVER')
+    # "ssl" (implicit TLS), "starttls" or "none"
+    MAIL_SECURITY: str = env('MAIL_SECURITY', default='ssl')
+
+    # Background mail queue configurations
+    MAIL_WORKERS: int = env('MAIL_WORKERS', default=2, cast=int)
+    MAIL_BATCH_SIZE: int = env('MAIL_BATCH_SIZE', default=20, cast=int)
+    MAIL_MAX_ATTEMPTS: int = env('MAIL_MAX_ATTEMPTS', default=5, cast=int)
+    MAIL_RETRY_BACKOFF: float = env('MAIL_RETRY_BACKOFF', default=2.0, cast=float)
+    MAIL_QUEUE_MAX_PENDING: int = env('MAIL_QUEUE_MAX_PENDING', default=10000, cast=int)
+
+    # Newsletter broadcast configurations
+    BROADCAST_CHUNK_SIZE: int = env('BROADCAST_CHUNK_SIZE', default=500, cast=int)
+    BROADCAST_CONCURRENCY: int = env('BROADCAST_CONCURRENCY', default=4, cast=int)
+    # Messages per second across all connections, 0 disables the limit
+    BROADCAST_RATE_LIMIT: float = env('BROADCAST_RATE_LIMIT', default=50, cast=float)
+    BROADCAST_LEASE_SECONDS: int = env('BROADCAST_LEASE_SECONDS', default=120, cast=int)
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class LazySettings:
+    """ Stands in for the Settings instance, which is only built (and the
+    environment only read) on first attribute access
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+class LazyObject:
+    """ Stands in for a module-level singleton built from settings, so that
+    importing its module does not read the environment. factory is called
+    once, on first use, and every attribute access is passed through to
+    what it returns.
+
+    usage:
+
+    user_cache = LazyObject(lambda: TTLCache(maxsize=settings.USER_CACHE_MAXSIZE))
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_wrapped", None)
+        object.__setattr__(self, "_lock", Lock())
+
+    def resolve(self) -> Any:
+        """ builds the object now if it has not been yet, and returns it
+        """
+        if self._wrapped is None:
+            with self._lock:
+                if self._wrapped is None:
+                    object.__setattr__(self, "_wrapped", self._factory())
+        return self._wrapped
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.resolve(), name, value)
+
+    def __delattr__(self, name: str):
+        delattr(self.resolve(), name)
+
+    def __len__(self):
+        return len(self.resolve())
 
-    MAIL_USERNAME: str = config("MAIL_USERNAME")
-    MAIL_PASSWORD: str = config('MAIL_PASSWORD')
-    MAIL_FROM: str = config('MAIL_FROM')
-    MAIL_PORT: int = config('MAIL_PORT')
-    MAIL_SERVER: str = config('MAIL_SERVER')
+    def __contains__(self, item: Any) -> bool:
+        return item in self.resolve()
 
 
-settings = Settings()
\ No newline at end of file
+settings = LazySettings()
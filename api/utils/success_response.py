@@ -1,5 +1,5 @@
 from typing import Optional
-from fastapi.responses import JSONResponse
+from api.utils.json_response import ORJSONResponse
 
 
 def success_response(status_code: int, message: str, data: Optional[dict] = None):
@@ -14,7 +14,7 @@ def success_response(status_code: int, message: str, data: Optional[dict] = None
     if data:
         response_data['data'] = data
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
         content=response_data
     )
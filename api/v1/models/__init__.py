@@ -8,4 +8,6 @@ from api.v1.models.job import Job
 from api.v1.models.invitation import Invitation
 from api.v1.models.role import Role
 from api.v1.models.permission import Permission
-from api.v1.models.newsletter import Newsletter
+from api.v1.models.newsletter import Newsletter, NewsletterBroadcast
+from api.v1.models.mail import MailDeadLetter
+from api.v1.models.refresh_token import RefreshToken
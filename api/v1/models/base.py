@@ -4,6 +4,7 @@
 from sqlalchemy import (
         Column,
         ForeignKey,
+        Index,
         String,
         Table,
     )
@@ -13,7 +14,9 @@ from api.db.database import Base
 
 user_organization_association = Table('user_organization', Base.metadata,
 	Column('user_id', String, ForeignKey('users.id',  ondelete='CASCADE'), primary_key=True),
-	Column('organization_id', String, ForeignKey('organizations.id',  ondelete='CASCADE'), primary_key=True)
+	Column('organization_id', String, ForeignKey('organizations.id',  ondelete='CASCADE'), primary_key=True),
+	# The primary key serves a user's organizations; this serves an organization's members in user_id order
+	Index('ix_user_organization_organization_id_user_id', 'organization_id', 'user_id')
 )
 
 user_role_association = Table('user_role', Base.metadata,
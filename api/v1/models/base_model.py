@@ -5,6 +5,7 @@ from uuid_extensions import uuid7
 from fastapi import Depends
 from sqlalchemy.dialects.postgresql import UUID
 from api.v1.models.base import Base
+from api.db.loader_profiles import serialize_columns
 from sqlalchemy import (
         Column,
         String,
@@ -22,16 +23,10 @@ class BaseTableModel(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     def to_dict(self):
-        """ returns a dictionary representation of the instance
+        """ returns a dictionary of the instance's columns; relationships
+        are left out, see api/db/loader_profiles.py to include them
         """
-        obj_dict = self.__dict__.copy()
-        del obj_dict["_sa_instance_state"]
-        obj_dict['id'] = self.id
-        if self.created_at:
-            obj_dict["created_at"] = self.created_at.isoformat()
-        if self.updated_at:
-            obj_dict["updated_at"] = self.updated_at.isoformat()
-        return obj_dict
+        return serialize_columns(self)
 
     @classmethod
     def get_all(cls):
@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 """The Blog Post Model."""
 
-from sqlalchemy import Column, String, Text, ForeignKey, Boolean
+from sqlalchemy import Column, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 # from api.v1.models.base import Base
 from api.v1.models.base_model import BaseTableModel
+from api.db.soft_delete import SoftDeleteMixin
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from uuid_extensions import uuid7
 
 
-class Blog(BaseTableModel):
+class Blog(SoftDeleteMixin, BaseTableModel):
     __tablename__ = "blogs"
 
     author_id = Column(
@@ -22,7 +23,6 @@ class Blog(BaseTableModel):
     content = Column(Text)
     image_url = Column(String(100), nullable=True)
     tags = Column(ARRAY(String(20)), nullable=True)
-    is_deleted = Column(Boolean, default=False, nullable=False)
     excerpt = Column(String(500), nullable=True)
 
     author = relationship("User", backref="blogs")
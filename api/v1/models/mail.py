@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+""" The Mail Dead Letter Model
+"""
+from sqlalchemy import (
+        Column,
+        Integer,
+        String,
+        Text,
+        )
+from api.v1.models.base_model import BaseTableModel
+
+
+class MailDeadLetter(BaseTableModel):
+    """ Outbound emails that could not be delivered after every retry
+    """
+    __tablename__ = 'mail_dead_letters'
+
+    to_address = Column(String(255), nullable=False, index=True)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, DateTime, Integer, String, Text
 from uuid import uuid4
 from datetime import datetime
 from api.db.database import Base
@@ -12,4 +12,26 @@ class Newsletter(BaseTableModel):
     __tablename__ = 'newsletters'
 
     email = Column(String(150), unique=True, nullable=False)
- 
\ No newline at end of file
+ 
+
+
+class NewsletterBroadcast(BaseTableModel):
+    """
+    A newsletter issue sent to every subscriber, with the checkpoint
+    (last subscriber id sent) the send resumes from
+    """
+    __tablename__ = 'newsletter_broadcasts'
+
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    # pending, running, completed or failed
+    status = Column(String(20), nullable=False, default='pending', index=True)
+    last_sent_id = Column(String, nullable=True)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    # Refreshed at every checkpoint; a running broadcast whose heartbeat is older
+    # than BROADCAST_LEASE_SECONDS is picked up again by any worker
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    # Set afresh by every claim; checkpoints and heartbeats only land while it is still theirs
+    lease_token = Column(String, nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -12,21 +12,3 @@ class Permission(BaseTableModel):
     name = Column(String, index=True, nullable=False)
 
     roles = relationship('Role', secondary=role_permission_association, back_populates='permissions')
-
-
-def get_user_permissions(self):
-    """Get all permissions assigned to a user."""
-    permissions = set()
-    for role in self.roles:
-        for permission in role.permissions:
-            permissions.add(permission.name)
-    return permissions
-
-def user_has_permission(self, permission) -> bool:
-    """Check if a user has a specific permission."""
-    perms = self.get_user_permissions()
-    if permission in perms:
-            return True
-    else:
-            return False
-
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+""" The Refresh Token Model
+"""
+from sqlalchemy import (
+        Column,
+        DateTime,
+        ForeignKey,
+        String,
+        )
+from api.v1.models.base_model import BaseTableModel
+
+
+class RefreshToken(BaseTableModel):
+    """ One issued refresh token; the id is the token's jti.
+
+    Every login starts a family, and each rotation adds the next token to
+    it and marks the presented one used. Presenting a used token again
+    revokes the whole family.
+    """
+    __tablename__ = 'refresh_tokens'
+
+    user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    family_id = Column(String, nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Table, Boolean, DateTime, func
+from sqlalchemy import Column, String, Integer, ForeignKey, Table, Boolean, DateTime, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from api.v1.models.base import Base
 from api.v1.models.base_model import BaseTableModel
@@ -8,6 +8,10 @@ from sqlalchemy.dialects.postgresql import UUID
 
 class Role(BaseTableModel):
     __tablename__ = 'roles'
+    # Role names are scoped to their organization, so every tenant can have its own "Admin"
+    __table_args__ = (
+        UniqueConstraint('organization_id', 'role_name', name='uq_roles_organization_id_role_name'),
+    )
 
     role_name = Column(String, index=True, nullable=False)
     organization_id = Column(String, ForeignKey('organizations.id',  ondelete='CASCADE'), nullable=False)
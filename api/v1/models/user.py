@@ -14,26 +14,37 @@ from sqlalchemy import (
         DateTime,
         func,
         Table,
-        Boolean
+        Boolean,
+        Index
         )
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from api.v1.models.base import Base, user_organization_association, user_role_association
 from api.v1.models.base_model import BaseTableModel
+from api.db.soft_delete import SoftDeleteMixin
 from sqlalchemy.dialects.postgresql import UUID
 
 
-class User(BaseTableModel, Base):
+class User(SoftDeleteMixin, BaseTableModel, Base):
     __tablename__ = 'users'
+    # Unique among live users only, so a deleted account's email and username
+    # can be taken again and lookups never wade through deleted rows
+    __table_args__ = (
+        Index('ix_users_live_email', 'email', unique=True,
+              postgresql_where=text('is_deleted = false'), sqlite_where=text('is_deleted = 0')),
+        Index('ix_users_live_username', 'username', unique=True,
+              postgresql_where=text('is_deleted = false'), sqlite_where=text('is_deleted = 0')),
+    )
 
-    username = Column(String(50), unique=True, nullable=False)
-    email = Column(String(100), unique=True, nullable=False)
+    username = Column(String(50), nullable=False)
+    email = Column(String(100), nullable=False)
     password = Column(String(255), nullable=False)
     first_name = Column(String(50))
     last_name = Column(String(50))
     is_active = Column(Boolean, server_default=text('true'))
     is_admin = Column(Boolean, server_default=text('false'))
-    is_deleted = Column(Boolean, server_default=text('false'))
+    # Bumped whenever the user's roles change so stale access tokens can be spotted
+    permission_version = Column(Integer, nullable=False, default=0, server_default=text('0'))
 
     profile = relationship("Profile", uselist=False, back_populates="user", cascade="all, delete-orphan")
     organizations = relationship("Organization", secondary=user_organization_association, back_populates="users")
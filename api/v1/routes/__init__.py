@@ -4,6 +4,9 @@ from api.v1.routes.roles import role
 from api.v1.routes.plans import plans
 from api.v1.routes.newsletter import newsletter
 from api.v1.routes.user import user
+from api.v1.routes.health import health
+from api.v1.routes.export import export
+from api.v1.routes.organization import organization
 
 api_version_one = APIRouter(prefix="/api/v1")
 
@@ -12,3 +15,6 @@ api_version_one.include_router(role)
 api_version_one.include_router(newsletter)
 api_version_one.include_router(plans)
 api_version_one.include_router(user)
+api_version_one.include_router(health)
+api_version_one.include_router(export)
+api_version_one.include_router(organization)
@@ -1,31 +1,33 @@
 from fastapi import Depends, status, APIRouter, Response, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from api.utils.success_response import success_response
 from api.v1.models import User
 from typing import Annotated
 from datetime import timedelta
 from api.v1.schemas.user import UserCreate
-from api.db.database import get_db
-from api.utils.dependencies import get_current_admin
-from api.v1.services.user import user_service
+from api.db.database import get_db, get_async_db
+from api.utils.dependencies import get_current_admin, rate_limit
+from api.v1.services.user import oauth2_scheme, user_service, async_user_service
 
 auth = APIRouter(prefix="/auth", tags=["Authentication"])
 
-@auth.post("/login", status_code=status.HTTP_200_OK)
-def login(login_request: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@auth.post("/login", status_code=status.HTTP_200_OK, dependencies=[
+    Depends(rate_limit("login", "LOGIN_RATE_LIMIT_IP", "LOGIN_RATE_LIMIT_USERNAME"))
+])
+async def login(login_request: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     '''Endpoint to log in a user'''
 
     # Authenticate the user
-    user = user_service.authenticate_user(
+    user = await async_user_service.authenticate_user(
         db=db,
         username=login_request.username,
         password=login_request.password
     )
 
     # Generate access and refresh tokens
-    access_token = user_service.create_access_token(user_id=user.id)
-    refresh_token = user_service.create_refresh_token(user_id=user.id)
+    access_token, refresh_token = await async_user_service.start_session(db=db, user=user)
 
     response = success_response(
         status_code=200,
@@ -50,16 +52,17 @@ def login(login_request: OAuth2PasswordRequestForm = Depends(), db: Session = De
 
 
   
-@auth.post("/register", status_code=status.HTTP_201_CREATED)
-def register(response: Response, user_schema: UserCreate, db: Session = Depends(get_db)):
+@auth.post("/register", status_code=status.HTTP_201_CREATED, dependencies=[
+    Depends(rate_limit("register", "REGISTER_RATE_LIMIT_IP", "REGISTER_RATE_LIMIT_USERNAME"))
+])
+async def register(response: Response, user_schema: UserCreate, db: AsyncSession = Depends(get_async_db)):
     '''Endpoint for a user to register their account'''
 
     # Create user account
-    user = user_service.create(db=db, schema=user_schema)
+    user = await async_user_service.create(db=db, schema=user_schema)
 
     # Create access and refresh tokens
-    access_token = user_service.create_access_token(user_id=user.id)
-    refresh_token = user_service.create_refresh_token(user_id=user.id)
+    access_token, refresh_token = await async_user_service.start_session(db=db, user=user)
 
     response = success_response(
         status_code=201,
@@ -85,9 +88,12 @@ def register(response: Response, user_schema: UserCreate, db: Session = Depends(
 
 
 @auth.post("/logout", status_code=status.HTTP_200_OK)
-def logout(response: Response, db: Session = Depends(get_db), current_user: User = Depends(user_service.get_current_user)):
+def logout(request: Request, response: Response, db: Session = Depends(get_db), access_token: str = Depends(oauth2_scheme)):
     '''Endpoint to log a user out of their account'''
 
+    # Revoke the session, ending its access token and every refresh token
+    user_service.logout(db=db, access_token=access_token, refresh_token=request.cookies.get('refresh_token'))
+
     response = success_response(
         status_code=200,
         message='User logged put successfully'
@@ -107,7 +113,7 @@ def refresh_access_token(request: Request, response: Response, db: Session = Dep
     current_refresh_token = request.cookies.get('refresh_token')
 
     # Create new access and refresh tokens
-    access_token, refresh_token = user_service.refresh_access_token(current_refresh_token=current_refresh_token)
+    access_token, refresh_token = user_service.refresh_access_token(current_refresh_token=current_refresh_token, db=db)
 
     response = success_response(
         status_code=200,
@@ -0,0 +1,32 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from api.utils.dependencies import get_current_admin
+from api.v1.schemas.user import TokenData
+from api.v1.services.export import export_service
+
+
+export = APIRouter(prefix="/exports", tags=["Exports"])
+
+
+@export.get("/{resource}")
+def export_resource(
+    resource: str,
+    current_admin: Annotated[TokenData, Depends(get_current_admin)],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+):
+    '''Endpoint to stream a full export of users, newsletters, waitlist-users or products'''
+
+    stream = export_service.stream(resource=resource, format=format, gzip=gzip)
+
+    filename = f"{resource}.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else export_service.FORMATS[format]
+
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
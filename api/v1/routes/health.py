@@ -0,0 +1,33 @@
+from fastapi import APIRouter, status
+
+from api.db.database import get_engine, get_async_engine
+from api.db.pool import get_pool_stats
+from api.utils.success_response import success_response
+
+
+health = APIRouter(prefix="/health", tags=["Health"])
+
+
+@health.get("/db-pool", status_code=status.HTTP_200_OK)
+async def db_pool_stats():
+    '''Endpoint to get live connection pool utilisation.
+
+    Deliberately unauthenticated: resolving a user would need a pooled
+    connection, which is exactly what is scarce when this gets checked.
+    '''
+
+    sync_stats = get_pool_stats(get_engine())
+    async_stats = get_pool_stats(get_async_engine().sync_engine)
+
+    return success_response(
+        status_code=200,
+        message='Pool stats retrieved successfully',
+        data={
+            'sync': sync_stats,
+            'async': async_stats,
+            # Upper bound on server connections one worker process can open
+            'max_connections_per_worker': sum(
+                stats.get('size', 0) + stats.get('max_overflow', 0) for stats in (sync_stats, async_stats)
+            ),
+        }
+    )
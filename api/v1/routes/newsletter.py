@@ -6,10 +6,17 @@ from fastapi import (
     status
     )
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from api.v1.models.newsletter import Newsletter
-from api.v1.schemas.newsletter import EMAILSCHEMA
-from api.db.database import get_db, Base, engine
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.v1.models.newsletter import Newsletter, NewsletterBroadcast
+from api.v1.schemas.newsletter import EMAILSCHEMA, BroadcastCreate, BroadcastResponse
+from api.db.database import get_async_db
+from api.utils.db_validators import async_check_model_existence, is_unique_violation
+from api.utils.dependencies import get_current_admin
+from api.utils.success_response import success_response
+from api.v1.schemas.user import TokenData
+from api.v1.services.newsletter import newsletter_broadcaster, newsletter_service
 
 
 class CustomException(HTTPException):
@@ -35,14 +42,19 @@ async def custom_exception_handler(request: Request, exc: CustomException):
 newsletter = APIRouter(prefix='/pages', tags=['Newsletter'])
 
 @newsletter.post('/newsletter')
-async def sub_newsletter(request: EMAILSCHEMA, db: Session = Depends(get_db)):
+async def sub_newsletter(request: EMAILSCHEMA, db: AsyncSession = Depends(get_async_db)):
     """
     Newsletter subscription endpoint
     """
 
-    # check for duplicate email
-    existing_subscriber = db.query(Newsletter).filter(Newsletter.email==request.email).first()
-    if existing_subscriber:
+    # A single INSERT; the unique constraint on email rejects existing subscribers
+    try:
+        await db.execute(insert(Newsletter).values(email=request.email))
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if not is_unique_violation(exc):
+            raise
         raise CustomException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail={
@@ -52,13 +64,67 @@ async def sub_newsletter(request: EMAILSCHEMA, db: Session = Depends(get_db)):
             }
         )
 
-    # Save user to the database
-    new_subscriber = Newsletter(email=request.email)
-    db.add(new_subscriber)
-    db.commit()
-
     return {
         "message": "Thank you for subscribing to our newsletter.",
         "success": True,
         "status": status.HTTP_201_CREATED
     }
+
+
+@newsletter.post('/newsletter/import')
+async def import_newsletter_subscribers(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(get_current_admin)
+):
+    """
+    Bulk subscription endpoint, accepts a streamed CSV (with an email header)
+    or NDJSON ({"email": ...} per line) upload
+    """
+
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    counts = await newsletter_service.bulk_subscribe(db, request.stream(), content_type)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message='Newsletter subscribers imported successfully',
+        data=counts
+    )
+
+
+@newsletter.post('/newsletter/broadcasts')
+async def create_newsletter_broadcast(
+    schema: BroadcastCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(get_current_admin)
+):
+    """
+    Starts sending an issue to every subscriber in the background
+    """
+
+    broadcast = await newsletter_broadcaster.create(db, subject=schema.subject, body=schema.body)
+
+    return success_response(
+        status_code=status.HTTP_202_ACCEPTED,
+        message='Newsletter broadcast started',
+        data=BroadcastResponse.model_validate(broadcast, from_attributes=True).model_dump()
+    )
+
+
+@newsletter.get('/newsletter/broadcasts/{broadcast_id}')
+async def get_newsletter_broadcast(
+    broadcast_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(get_current_admin)
+):
+    """
+    Progress of a broadcast
+    """
+
+    broadcast = await async_check_model_existence(db, NewsletterBroadcast, broadcast_id)
+
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        message='Newsletter broadcast retrieved successfully',
+        data=BroadcastResponse.model_validate(broadcast, from_attributes=True).model_dump()
+    )
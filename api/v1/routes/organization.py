@@ -0,0 +1,129 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from api.db.database import get_db
+from api.utils.dependencies import require_permission
+from api.utils.pagination import DEFAULT_PAGE_SIZE
+from api.utils.success_response import success_response
+from api.v1.schemas.organization import MembersUpdate, OrganizationCreate, OrganizationUpdate
+from api.v1.schemas.user import TokenData
+from api.v1.services.organization import organization_service
+from api.v1.services.user import user_service
+
+
+organization = APIRouter(prefix='/organizations', tags=['Organizations'])
+
+
+@organization.post('', status_code=status.HTTP_201_CREATED)
+def create_organization(schema: OrganizationCreate, db: Session = Depends(get_db), principal: TokenData = Depends(user_service.get_current_principal)):
+    '''Endpoint to create an organization, with the current user as its first member and owner'''
+
+    new_organization = organization_service.create(db=db, schema=schema, creator_id=principal.id)
+
+    return success_response(
+        status_code=201,
+        message='Organization created successfully',
+        data=new_organization.to_dict()
+    )
+
+
+@organization.get('', status_code=status.HTTP_200_OK)
+def get_my_organizations(cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, db: Session = Depends(get_db), principal: TokenData = Depends(user_service.get_current_principal)):
+    '''Endpoint to list the organizations the current user belongs to'''
+
+    page = organization_service.fetch_all(db=db, user_id=principal.id, cursor=cursor, limit=limit)
+    page['items'] = [item.to_dict() for item in page['items']]
+
+    return success_response(
+        status_code=200,
+        message='Organizations retrieved successfully',
+        data=page
+    )
+
+
+@organization.get('/{org_id}', status_code=status.HTTP_200_OK)
+def get_organization(org_id: str, db: Session = Depends(get_db), principal: TokenData = Depends(user_service.get_current_principal)):
+    '''Endpoint for a member to get an organization'''
+
+    current_organization = organization_service.fetch_for_member(db=db, id=org_id, principal=principal)
+
+    return success_response(
+        status_code=200,
+        message='Organization retrieved successfully',
+        data=current_organization.to_dict()
+    )
+
+
+@organization.patch('/{org_id}', status_code=status.HTTP_200_OK, dependencies=[Depends(require_permission('organization:update'))])
+def update_organization(org_id: str, schema: OrganizationUpdate, db: Session = Depends(get_db)):
+    '''Endpoint to update an organization'''
+
+    updated_organization = organization_service.update(db=db, id=org_id, schema=schema)
+
+    return success_response(
+        status_code=200,
+        message='Organization updated successfully',
+        data=updated_organization.to_dict()
+    )
+
+
+@organization.delete('/{org_id}', status_code=status.HTTP_200_OK, dependencies=[Depends(require_permission('organization:delete'))])
+def delete_organization(org_id: str, db: Session = Depends(get_db)):
+    '''Endpoint to delete an organization'''
+
+    organization_service.delete(db=db, id=org_id)
+
+    return success_response(
+        status_code=200,
+        message='Organization deleted successfully'
+    )
+
+
+@organization.get('/{org_id}/members', status_code=status.HTTP_200_OK)
+def get_organization_members(
+    org_id: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    profile: str = 'summary',
+    db: Session = Depends(get_db),
+    principal: TokenData = Depends(user_service.get_current_principal)
+):
+    '''Endpoint for a member to page through an organization's members, loaded
+    with one of the user loader profiles'''
+
+    organization_service.fetch_for_member(db=db, id=org_id, principal=principal)
+    page = organization_service.fetch_members(db=db, id=org_id, cursor=cursor, limit=limit, profile=profile)
+    page['items'] = [user_service.serialize(member, profile) for member in page['items']]
+
+    return success_response(
+        status_code=200,
+        message='Members retrieved successfully',
+        data=page
+    )
+
+
+@organization.post('/{org_id}/members', status_code=status.HTTP_200_OK, dependencies=[Depends(require_permission('organization:manage_members'))])
+def add_organization_members(org_id: str, schema: MembersUpdate, db: Session = Depends(get_db)):
+    '''Endpoint to add users to an organization in bulk'''
+
+    result = organization_service.add_members(db=db, id=org_id, user_ids=schema.user_ids)
+
+    return success_response(
+        status_code=200,
+        message='Members added successfully',
+        data=result
+    )
+
+
+@organization.post('/{org_id}/members/remove', status_code=status.HTTP_200_OK, dependencies=[Depends(require_permission('organization:manage_members'))])
+def remove_organization_members(org_id: str, schema: MembersUpdate, db: Session = Depends(get_db)):
+    '''Endpoint to remove users from an organization in bulk'''
+
+    result = organization_service.remove_members(db=db, id=org_id, user_ids=schema.user_ids)
+
+    return success_response(
+        status_code=200,
+        message='Members removed successfully',
+        data=result
+    )
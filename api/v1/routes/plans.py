@@ -1,11 +1,12 @@
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
+from fastapi import FastAPI, Depends, Header, HTTPException, Response, status, APIRouter
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Optional
 from api.v1.models.plans import SubscriptionPlan
 from api.v1.schemas.plans import CreateSubscriptionPlan, SubscriptionPlanResponse
 from api.db.database import get_db
 from api.utils.dependencies import get_current_admin
 from api.v1.models.user import User
+from api.v1.services.plans import etag_matches, plan_catalogue
 
 
 plans = APIRouter(tags=["Plans"])
@@ -23,4 +24,21 @@ def create_subscription_plan(plan: CreateSubscriptionPlan, db: Annotated[Session
     db.add(db_plan)
     db.commit()
     db.refresh(db_plan)
-    return db_plan
\ No newline at end of file
+
+    plan_catalogue.rebuild(db)
+    return db_plan
+
+
+@plans.get("/plans", status_code=status.HTTP_200_OK)
+def get_subscription_plans(db: Annotated[Session, Depends(get_db)], if_none_match: Annotated[Optional[str], Header()] = None):
+    # Served from the pre-rendered snapshot; a matching ETag gets a 304 without touching the body
+    snapshot = plan_catalogue.get(db)
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"public, max-age={plan_catalogue.ttl}, must-revalidate",
+    }
+
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
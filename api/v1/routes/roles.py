@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Annotated
 from sqlalchemy.orm import Session
-from api.v1.schemas.role import RoleCreate, ResponseModel
+from api.v1.schemas.role import RoleCreate, ResponseModel, RoleBatchCreate, RoleBatchResponse
 from api.db.database import get_db
 from api.v1.models import User, Organization, Role, Permission
 from api.utils.dependencies import get_current_admin
+from api.v1.services.role import role_service
 
 
 role = APIRouter(prefix="/roles", tags=["Roles"])
@@ -12,7 +13,7 @@ role = APIRouter(prefix="/roles", tags=["Roles"])
 
 @role.post("/", response_model=ResponseModel, status_code=status.HTTP_201_CREATED)
 def create_role(current_admin: Annotated[User, Depends(get_current_admin)], role: RoleCreate, db: Session = Depends(get_db)):
-    db_role = db.query(Role).filter(Role.role_name == role.role_name).first()
+    db_role = db.query(Role).filter(Role.organization_id == role.organization_id, Role.role_name == role.role_name).first()
     if db_role:
         raise HTTPException(status_code=400, message="Role already exists")
 
@@ -34,3 +35,17 @@ def create_role(current_admin: Annotated[User, Depends(get_current_admin)], role
     db.refresh(new_role)
 
     return ResponseModel(message="Role created successfully", status_code=201)
+
+
+@role.post("/batch", response_model=RoleBatchResponse, status_code=status.HTTP_200_OK)
+def create_roles_batch(current_admin: Annotated[User, Depends(get_current_admin)], batch: RoleBatchCreate, db: Session = Depends(get_db)):
+    results = role_service.create_batch(db, batch.roles)
+    failed = sum(1 for result in results if result.error)
+
+    return RoleBatchResponse(
+        message="Roles created successfully" if not failed else "Some roles could not be created",
+        status_code=200,
+        created=len(results) - failed,
+        failed=failed,
+        results=results
+    )
@@ -1,8 +1,29 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
 
 
 class EMAILSCHEMA(BaseModel):
     """
     pydantic model for data validation and serialization
     """
-    email: EmailStr
\ No newline at end of file
+    email: EmailStr
+
+
+class BroadcastCreate(BaseModel):
+    """
+    A newsletter issue to send to every subscriber
+    """
+    subject: str = Field(min_length=1, max_length=255)
+    body: str = Field(min_length=1)
+
+
+class BroadcastResponse(BaseModel):
+    id: str
+    subject: str
+    status: str
+    last_sent_id: Optional[str] = None
+    sent_count: int
+    failed_count: int
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
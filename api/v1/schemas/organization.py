@@ -0,0 +1,33 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+
+
+# Members added or removed per request; each batch is one multi-row statement
+MAX_MEMBERS_PER_REQUEST = 1000
+
+
+class OrganizationCreate(BaseModel):
+    '''Schema to create an organization'''
+
+    name: str = Field(min_length=1, max_length=50)
+    description: Optional[str] = None
+
+
+class OrganizationUpdate(BaseModel):
+    '''Schema to update an organization; only the fields sent are changed'''
+
+    name: Optional[str] = Field(default=None, min_length=1, max_length=50)
+    description: Optional[str] = None
+
+    @field_validator('name')
+    def name_validator(cls, value):
+        # Leaving name out keeps it; an explicit null would break its NOT NULL column
+        if value is None:
+            raise ValueError('Organization name cannot be null')
+        return value
+
+
+class MembersUpdate(BaseModel):
+    '''Users to add to or remove from an organization'''
+
+    user_ids: List[str] = Field(min_length=1, max_length=MAX_MEMBERS_PER_REQUEST)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class RoleCreate(BaseModel):
@@ -8,4 +8,20 @@ class RoleCreate(BaseModel):
 
 class ResponseModel(BaseModel):
     message: str
-    status_code: int
\ No newline at end of file
+    status_code: int
+
+class RoleBatchCreate(BaseModel):
+    roles: List[RoleCreate] = Field(min_length=1, max_length=500)
+
+class RoleBatchItemResult(BaseModel):
+    index: int
+    role_name: str
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class RoleBatchResponse(BaseModel):
+    message: str
+    status_code: int
+    created: int
+    failed: int
+    results: List[RoleBatchItemResult]
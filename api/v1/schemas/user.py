@@ -53,6 +53,14 @@ class TokenData(BaseModel):
     '''Schema to structure token data'''
     
     id: Optional[Any]
+    # The user's current state, filled in by get_current_principal rather than
+    # taken from the token, so a demotion or deactivation applies to live tokens
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+    permission_version: Optional[int] = None
+    # Refresh token id, and the login session (token family) a token belongs to
+    jti: Optional[str] = None
+    family_id: Optional[str] = None
 
 
 
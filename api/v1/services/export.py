@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from api.db.database import SessionLocal, get_engine
+from api.v1.models.newsletter import Newsletter
+from api.v1.models.product import Product
+from api.v1.models.user import User, WaitlistUser
+
+
+# Rows pulled from the server-side cursor, and encoded, per chunk
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportService:
+    '''Streams whole tables out as NDJSON or CSV in constant memory'''
+
+    # Exportable resources and the columns exported for each; passwords never leave the database
+    RESOURCES = {
+        'users': (User, ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_admin', 'is_deleted', 'created_at', 'updated_at')),
+        'newsletters': (Newsletter, ('id', 'email', 'created_at', 'updated_at')),
+        'waitlist-users': (WaitlistUser, ('id', 'email', 'full_name', 'created_at', 'updated_at')),
+        'products': (Product, ('id', 'name', 'description', 'price', 'created_at', 'updated_at')),
+    }
+
+    FORMATS = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def get_columns(self, resource: str):
+        '''Returns the model and column names exported for a resource'''
+
+        if resource not in self.RESOURCES:
+            raise HTTPException(status_code=404, detail=f'Cannot export {resource}')
+
+        return self.RESOURCES[resource]
+
+
+    def iter_batches(self, resource: str) -> Iterator[list]:
+        '''Yields lists of rows read through a server-side cursor.
+
+        The session is opened here rather than injected because the
+        response body is streamed after request dependencies are closed.
+        '''
+
+        model, columns = self.get_columns(resource)
+        query = select(*(getattr(model, column) for column in columns)).order_by(model.id)
+
+        with SessionLocal(bind=get_engine()) as db:
+            # Exports are admin tooling and carry is_deleted, so deleted rows are kept
+            result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE, include_deleted=True))
+
+            for partition in result.partitions():
+                yield partition
+
+
+    def encode_ndjson(self, columns, batches) -> Iterator[bytes]:
+        for rows in batches:
+            yield ''.join(
+                json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows
+            ).encode()
+
+
+    def encode_csv(self, columns, batches) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        for rows in batches:
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+        # Only the header was written when the table is empty
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+
+    def gzip_chunks(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        '''Compresses chunks on the fly into a single gzip stream'''
+
+        compressor = zlib.compressobj(wbits=31)
+
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+
+        yield compressor.flush()
+
+
+    def stream(self, resource: str, format: str = 'ndjson', gzip: bool = False) -> Iterator[bytes]:
+        '''Returns an iterator over the encoded export of a resource'''
+
+        _, columns = self.get_columns(resource)
+        encode = self.encode_csv if format == 'csv' else self.encode_ndjson
+        chunks = encode(columns, self.iter_batches(resource))
+
+        return self.gzip_chunks(chunks) if gzip else chunks
+
+
+export_service = ExportService()
@@ -0,0 +1,469 @@
+import asyncio
+import codecs
+import copy
+import csv
+import datetime as dt
+import json
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid_extensions import uuid7
+
+from api.core.dependencies.email import MailConfig, MailMessage, SMTPConnection, save_dead_letters
+from api.db.database import AsyncSessionLocal, get_async_engine
+from api.utils.logger import logger
+from api.utils.settings import settings
+from api.v1.models.newsletter import Newsletter, NewsletterBroadcast
+from api.v1.schemas.newsletter import EMAILSCHEMA
+
+
+# Addresses validated, and sent to the database in one multi-row INSERT, per chunk
+IMPORT_BATCH_SIZE = 1000
+
+IMPORT_FORMATS = ('text/csv', 'application/x-ndjson')
+
+
+class NewsletterService:
+    '''Newsletter subscription service'''
+
+    async def iter_lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        '''Splits a streamed request body into lines without buffering it whole'''
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        remainder = ''
+
+        async for chunk in chunks:
+            remainder += decoder.decode(chunk)
+            *lines, remainder = remainder.split('\n')
+            for line in lines:
+                yield line
+
+        remainder += decoder.decode(b'', final=True)
+        if remainder:
+            yield remainder
+
+
+    def parse_csv_line(self, line: str, email_index: int) -> Optional[str]:
+        row = next(csv.reader([line]), [])
+        return row[email_index] if len(row) > email_index else None
+
+
+    def parse_ndjson_line(self, line: str) -> Optional[str]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+
+        return record.get('email') if isinstance(record, dict) else None
+
+
+    async def iter_emails(self, chunks: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Optional[str]]:
+        '''Yields the raw email of every row in the upload, or None for rows
+        that cannot be parsed.
+
+        CSV uploads must have a header row with an email column.
+        '''
+
+        if content_type not in IMPORT_FORMATS:
+            raise HTTPException(
+                status_code=415,
+                detail=f'Upload must be one of {", ".join(IMPORT_FORMATS)}'
+            )
+
+        email_index = None
+
+        async for line in self.iter_lines(chunks):
+            line = line.strip()
+            if not line:
+                continue
+
+            if content_type == 'application/x-ndjson':
+                yield self.parse_ndjson_line(line)
+            elif email_index is None:
+                header = [column.strip().lower() for column in next(csv.reader([line]))]
+                if 'email' not in header:
+                    raise HTTPException(status_code=400, detail='CSV header must include an email column')
+                email_index = header.index('email')
+            else:
+                yield self.parse_csv_line(line, email_index)
+
+
+    def validate_batch(self, emails: List[Optional[str]]) -> Iterator[str]:
+        '''Yields the addresses that pass EMAILSCHEMA, skipping the rest'''
+
+        for email in emails:
+            if email is None:
+                continue
+            try:
+                yield EMAILSCHEMA(email=email.strip()).email
+            except ValidationError:
+                continue
+
+
+    async def insert_batch(self, db: AsyncSession, emails: List[str]) -> int:
+        '''Inserts a chunk of addresses in one statement, skipping any that are
+        already subscribed, and returns how many rows were inserted'''
+
+        if not emails:
+            return 0
+
+        dialect = postgresql if db.bind.dialect.name == 'postgresql' else sqlite
+        query = (
+            dialect.insert(Newsletter)
+            .values([{'id': str(uuid7()), 'email': email} for email in emails])
+            .on_conflict_do_nothing(index_elements=[Newsletter.email])
+            .returning(Newsletter.id)
+        )
+
+        result = await db.execute(query)
+        inserted = len(result.all())
+        await db.commit()
+
+        return inserted
+
+
+    async def bulk_subscribe(self, db: AsyncSession, chunks: AsyncIterator[bytes], content_type: str) -> dict:
+        '''Imports a streamed CSV/NDJSON upload of subscribers in chunks.
+
+        Each chunk is committed on its own, so an interrupted upload keeps
+        the chunks before it and can simply be sent again.
+        '''
+
+        counts = {'inserted': 0, 'duplicate': 0, 'invalid': 0}
+
+        async def flush(batch: List[Optional[str]]):
+            valid = list(self.validate_batch(batch))
+            # dict.fromkeys drops repeats within the chunk but keeps the upload order
+            inserted = await self.insert_batch(db, list(dict.fromkeys(valid)))
+
+            counts['inserted'] += inserted
+            counts['duplicate'] += len(valid) - inserted
+            counts['invalid'] += len(batch) - len(valid)
+
+        batch = []
+        async for email in self.iter_emails(chunks, content_type):
+            batch.append(email)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+
+        if batch:
+            await flush(batch)
+
+        return counts
+
+
+class LeaseLost(Exception):
+    '''Another worker has claimed the broadcast this one was sending'''
+
+
+class NewsletterBroadcaster:
+    '''Sends a newsletter issue to every subscriber.
+
+    Subscribers are read in keyset-ordered chunks, each in its own short
+    session, and the issue is rendered once. Every chunk is fanned out over
+    a pool of SMTP connections at no more than rate_limit messages per second,
+    and addresses that fail for a transient reason are retried with backoff
+    before they are dead-lettered.
+
+    After each chunk the broadcast's last_sent_id checkpoint is committed, so a
+    restarted or crashed send resumes after the last completed chunk. Each
+    claim writes a fresh lease token, and every checkpoint and heartbeat only
+    applies while the row still holds it; a worker whose lease was taken over
+    stops sending, so at most the chunk in flight may be sent twice.
+    '''
+
+    def __init__(
+        self,
+        mail_config: Optional[MailConfig] = None,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        lease_seconds: Optional[int] = None,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
+        self.mail_config = mail_config
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.lease_seconds = lease_seconds
+        self.session_factory = session_factory or (lambda: AsyncSessionLocal(bind=get_async_engine()))
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Lease token of every broadcast this worker is sending
+        self._leases: Dict[str, str] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+
+    def configure(self):
+        '''Fills in anything not passed to the constructor from settings'''
+
+        self.mail_config = self.mail_config or MailConfig.from_settings()
+        self.chunk_size = self.chunk_size or settings.BROADCAST_CHUNK_SIZE
+        self.concurrency = self.concurrency or settings.BROADCAST_CONCURRENCY
+        self.rate_limit = settings.BROADCAST_RATE_LIMIT if self.rate_limit is None else self.rate_limit
+        self.lease_seconds = self.lease_seconds or settings.BROADCAST_LEASE_SECONDS
+
+
+    async def start(self):
+        '''Resumes abandoned broadcasts now and whenever another worker's lease runs out'''
+
+        self.configure()
+        self._watcher = asyncio.create_task(self._watch())
+
+
+    async def _watch(self):
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    broadcast_ids = (await db.scalars(select(NewsletterBroadcast.id).where(*self.claimable()))).all()
+                for broadcast_id in broadcast_ids:
+                    self.launch(broadcast_id)
+            except Exception as exc:
+                logger.exception(f'Could not look for newsletter broadcasts to resume; {exc}')
+
+            await asyncio.sleep(self.lease_seconds)
+
+
+    async def stop(self):
+        '''Stops sending and releases the leases so a new worker resumes straight away'''
+
+        leases = list(self._leases.values())
+        tasks = list(self._tasks.values())
+        if self._watcher is not None:
+            tasks.append(self._watcher)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if leases:
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(NewsletterBroadcast)
+                    .where(NewsletterBroadcast.lease_token.in_(leases), NewsletterBroadcast.status == 'running')
+                    .values(heartbeat_at=None)
+                )
+                await db.commit()
+
+        self._tasks, self._leases, self._watcher = {}, {}, None
+
+
+    async def create(self, db: AsyncSession, subject: str, body: str) -> NewsletterBroadcast:
+        '''Records a broadcast and starts sending it in the background'''
+
+        broadcast = NewsletterBroadcast(subject=subject, body=body, status='pending', sent_count=0, failed_count=0)
+        db.add(broadcast)
+        await db.commit()
+
+        self.launch(broadcast.id)
+        return broadcast
+
+
+    def launch(self, broadcast_id: str):
+        if broadcast_id in self._tasks:
+            return
+
+        task = asyncio.create_task(self.run(broadcast_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+
+    def claimable(self):
+        '''Pending broadcasts, and running ones whose worker stopped heartbeating'''
+
+        stale = func.now() - dt.timedelta(seconds=self.lease_seconds)
+        return (
+            NewsletterBroadcast.status.in_(('pending', 'running')),
+            or_(NewsletterBroadcast.heartbeat_at.is_(None), NewsletterBroadcast.heartbeat_at < stale),
+        )
+
+
+    async def claim(self, broadcast_id: str) -> Optional[NewsletterBroadcast]:
+        '''Atomically takes the lease on a broadcast under a new lease token, or
+        returns None if another worker holds it'''
+
+        async with self.session_factory() as db:
+            broadcast = await db.scalar(
+                update(NewsletterBroadcast)
+                .where(NewsletterBroadcast.id == broadcast_id, *self.claimable())
+                .values(status='running', heartbeat_at=func.now(), lease_token=str(uuid7()))
+                .returning(NewsletterBroadcast)
+            )
+            await db.commit()
+
+        return broadcast
+
+
+    async def run(self, broadcast_id: str):
+        broadcast = await self.claim(broadcast_id)
+        if broadcast is None:
+            return
+
+        lease = self._leases[broadcast_id] = broadcast.lease_token
+        last_sent_id = broadcast.last_sent_id
+        connections = []
+
+        try:
+            message = self.render(broadcast)
+            connections = [SMTPConnection(self.mail_config) for _ in range(self.concurrency)]
+
+            while True:
+                async with self.session_factory() as db:
+                    query = select(Newsletter.id, Newsletter.email).order_by(Newsletter.id).limit(self.chunk_size)
+                    if last_sent_id is not None:
+                        query = query.where(Newsletter.id > last_sent_id)
+                    recipients = (await db.execute(query)).all()
+
+                if not recipients:
+                    await self.checkpoint(broadcast_id, lease, status='completed', completed_at=func.now())
+                    break
+
+                failures = await self.send_leased_chunk(broadcast_id, lease, connections, message, recipients)
+                if failures:
+                    await save_dead_letters([
+                        (MailMessage(to=email, subject=broadcast.subject, body=broadcast.body, attempts=attempts), error)
+                        for email, error, attempts in failures
+                    ])
+
+                last_sent_id = recipients[-1].id
+                await self.checkpoint(
+                    broadcast_id,
+                    lease,
+                    last_sent_id=last_sent_id,
+                    sent_count=NewsletterBroadcast.sent_count + len(recipients) - len(failures),
+                    failed_count=NewsletterBroadcast.failed_count + len(failures),
+                )
+        except asyncio.CancelledError:
+            raise
+        except LeaseLost:
+            logger.warning(f'Newsletter broadcast {broadcast_id} was taken over by another worker, stopped sending')
+        except Exception as exc:
+            logger.exception(f'Newsletter broadcast {broadcast_id} failed; {exc}')
+            try:
+                await self.checkpoint(broadcast_id, lease, status='failed')
+            except LeaseLost:
+                pass
+        finally:
+            self._leases.pop(broadcast_id, None)
+            for connection in connections:
+                await asyncio.to_thread(connection.close)
+
+
+    async def checkpoint(self, broadcast_id: str, lease: str, **values):
+        '''Renews the heartbeat, and saves any values given, while the lease is
+        still ours; raises LeaseLost once another worker has claimed it'''
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(NewsletterBroadcast)
+                .where(NewsletterBroadcast.id == broadcast_id, NewsletterBroadcast.lease_token == lease)
+                .values(heartbeat_at=func.now(), **values)
+            )
+            await db.commit()
+
+        if result.rowcount == 0:
+            raise LeaseLost(broadcast_id)
+
+
+    async def send_leased_chunk(self, broadcast_id: str, lease: str, connections: List[SMTPConnection], message: EmailMessage, recipients) -> List[Tuple[str, str, int]]:
+        '''Sends a chunk while heartbeating a few times per lease period, so a slow
+        chunk keeps its lease. If the lease is lost, or the run is cancelled,
+        the sending threads stop before their next address.'''
+
+        stop = threading.Event()
+        sending = asyncio.ensure_future(self.send_chunk(connections, message, recipients, stop))
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({sending}, timeout=self.lease_seconds / 3)
+                if done:
+                    return sending.result()
+                await self.checkpoint(broadcast_id, lease)
+        finally:
+            if not sending.done():
+                stop.set()
+                await asyncio.gather(sending, return_exceptions=True)
+
+
+    def render(self, broadcast: NewsletterBroadcast) -> EmailMessage:
+        '''Builds the message once; only the To header changes per recipient'''
+
+        message = EmailMessage()
+        message['From'] = self.mail_config.from_addr
+        message['To'] = self.mail_config.from_addr
+        message['Subject'] = broadcast.subject
+        message.set_content(broadcast.body)
+        return message
+
+
+    async def send_chunk(self, connections: List[SMTPConnection], message: EmailMessage, recipients, stop: threading.Event) -> List[Tuple[str, str, int]]:
+        '''Splits a chunk across the connections and sends the slices concurrently,
+        returning the (email, error, attempts) of every address that failed'''
+
+        slices = [recipients[index::len(connections)] for index in range(len(connections))]
+        results = await asyncio.gather(*(
+            asyncio.to_thread(self._send_slice, connection, message, [recipient.email for recipient in recipients_slice], stop)
+            for connection, recipients_slice in zip(connections, slices) if recipients_slice
+        ))
+
+        return [failure for failures in results for failure in failures]
+
+
+    def _send_slice(self, connection: SMTPConnection, message: EmailMessage, emails: List[str], stop: threading.Event) -> List[Tuple[str, str, int]]:
+        '''Sends to each address over one connection (runs in a thread), paced so
+        all connections together stay under rate_limit'''
+
+        interval = self.concurrency / self.rate_limit if self.rate_limit else 0
+        message = copy.deepcopy(message)
+        failures = []
+        next_send = time.monotonic()
+
+        for email in emails:
+            if interval:
+                delay = next_send - time.monotonic()
+                if delay > 0 and stop.wait(delay):
+                    break
+                next_send = max(next_send, time.monotonic()) + interval
+
+            if stop.is_set():
+                break
+
+            message.replace_header('To', email)
+            failure = self._send_with_retries(connection, message, stop)
+            if failure is not None:
+                failures.append((email, *failure))
+
+        return failures
+
+
+    def _send_with_retries(self, connection: SMTPConnection, message: EmailMessage, stop: threading.Event) -> Optional[Tuple[str, int]]:
+        '''Sends one message, retrying transient failures with the mail queue's
+        backoff, and returns the last error and attempts made if it never went out'''
+
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                connection.get().send_message(message)
+                return None
+            except smtplib.SMTPRecipientsRefused as exc:
+                # A refused recipient will be refused again, so it isn't retried
+                return f'{type(exc).__name__}: {exc}', attempts
+            except (smtplib.SMTPException, OSError) as exc:
+                # The connection may be unusable now; the next attempt reconnects
+                connection.close()
+                delay = self.mail_config.retry_backoff * 2 ** (attempts - 1)
+                if attempts >= self.mail_config.max_attempts or stop.wait(delay):
+                    return f'{type(exc).__name__}: {exc}', attempts
+
+
+newsletter_service = NewsletterService()
+newsletter_broadcaster = NewsletterBroadcaster()
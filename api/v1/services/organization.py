@@ -0,0 +1,199 @@
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from api.core.base.services import Service
+from api.utils.db_validators import check_model_existence
+from api.utils.pagination import DEFAULT_PAGE_SIZE, apply_keyset, clamp_page_size, get_page
+from api.v1.models.base import user_organization_association as memberships, user_role_association
+from api.v1.models.org import Organization
+from api.v1.models.permission import Permission
+from api.v1.models.role import Role
+from api.v1.models.user import User
+from api.v1.schemas.organization import OrganizationCreate, OrganizationUpdate
+from api.v1.schemas.user import TokenData
+from api.v1.services.permission import permission_service
+from api.v1.services.user import user_service
+
+
+class OrganizationService(Service):
+    '''Organization and membership service.
+
+    Members are paged straight off user_organization by keyset and each
+    page's users are loaded with one IN-query, so a page costs the same two
+    queries whatever the size of the organization. Members are added and
+    removed in bulk, one multi-row statement per table.
+    '''
+
+    # Granted to the creator of an organization, so it can be managed without an admin
+    OWNER_ROLE = 'owner'
+    OWNER_PERMISSIONS = ('organization:update', 'organization:delete', 'organization:manage_members')
+
+    def create(self, db: Session, schema: OrganizationCreate, creator_id: str) -> Organization:
+        '''Creates an organization with its creator as the first member, holding
+        the organization's owner role'''
+
+        organization = Organization(**schema.model_dump())
+
+        permissions = list(db.scalars(select(Permission).where(Permission.name.in_(self.OWNER_PERMISSIONS))))
+        found = {permission.name for permission in permissions}
+        permissions += [Permission(name=name) for name in self.OWNER_PERMISSIONS if name not in found]
+
+        owner = Role(role_name=self.OWNER_ROLE, organization=organization, permissions=permissions)
+        db.add_all([organization, owner])
+        db.flush()
+
+        db.execute(insert(memberships).values(user_id=creator_id, organization_id=organization.id))
+        db.execute(insert(user_role_association).values(user_id=creator_id, role_id=owner.id))
+        permission_service.bump_permission_version(db, user_ids=[creator_id])
+        db.commit()
+        db.refresh(organization)
+
+        return organization
+
+
+    def fetch_all(self, db: Session, user_id: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+        '''Fetch a page of the organizations a user belongs to, ordered by id'''
+
+        limit = clamp_page_size(limit)
+
+        # Keyed on the membership's organization_id so the (user_id, organization_id)
+        # primary key serves both the filter and the order
+        query = (
+            select(Organization)
+            .join(memberships, memberships.c.organization_id == Organization.id)
+            .where(memberships.c.user_id == user_id)
+        )
+        organizations = db.scalars(apply_keyset(query, memberships.c.organization_id, cursor, limit)).all()
+
+        return get_page(organizations, limit)
+
+
+    def fetch(self, db: Session, id: str) -> Organization:
+        '''Fetches an organization by its id'''
+
+        organization = check_model_existence(db, Organization, id)
+        return organization
+
+
+    def is_member(self, db: Session, id: str, user_id: str) -> bool:
+        '''Checks if a user belongs to an organization'''
+
+        return db.scalar(select(exists().where(
+            memberships.c.organization_id == id,
+            memberships.c.user_id == user_id,
+        )))
+
+
+    def fetch_for_member(self, db: Session, id: str, principal: TokenData) -> Organization:
+        '''Fetches an organization for one of its members, or an admin'''
+
+        organization = self.fetch(db, id)
+
+        if not principal.is_admin and not self.is_member(db, id, principal.id):
+            raise HTTPException(status_code=403, detail='You are not a member of this organization')
+
+        return organization
+
+
+    def update(self, db: Session, id: str, schema: OrganizationUpdate) -> Organization:
+        '''Updates an organization'''
+
+        organization = self.fetch(db, id)
+
+        # Update the fields with the provided schema data
+        for key, value in schema.model_dump(exclude_unset=True).items():
+            setattr(organization, key, value)
+
+        db.commit()
+        db.refresh(organization)
+        return organization
+
+
+    def delete(self, db: Session, id: str):
+        '''Deletes an organization; its memberships and roles go with it'''
+
+        self.fetch(db, id)
+
+        # Holders of the organization's roles lose their permissions with them
+        role_ids = db.scalars(select(Role.id).where(Role.organization_id == id)).all()
+        permission_service.bump_permission_version(db, role_ids=role_ids)
+
+        # A bulk DELETE so the database cascades, rather than the ORM loading
+        # every membership and role first
+        db.execute(delete(Organization).where(Organization.id == id))
+        db.commit()
+
+
+    def fetch_members(self, db: Session, id: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, profile: str = 'summary'):
+        '''Fetch a page of an organization's members ordered by user id, loaded
+        with the given user loader profile.
+
+        Deleted users keep their memberships but are left out of the page, so
+        a page can hold fewer than limit users and still have a next cursor.
+        '''
+
+        limit = clamp_page_size(limit)
+        options = user_service.get_loader_options(profile)
+
+        query = select(memberships.c.user_id).where(memberships.c.organization_id == id)
+        user_ids = db.scalars(apply_keyset(query, memberships.c.user_id, cursor, limit)).all()
+        page = get_page(user_ids, limit, key=lambda user_id: user_id)
+
+        if page['items']:
+            page['items'] = db.scalars(
+                select(User).where(User.id.in_(page['items'])).options(*options).order_by(User.id)
+            ).all()
+
+        return page
+
+
+    def add_members(self, db: Session, id: str, user_ids: List[str]) -> dict:
+        '''Adds users to an organization, skipping existing members and unknown users'''
+
+        self.fetch(db, id)
+
+        # dict.fromkeys drops repeats but keeps the request order
+        user_ids = list(dict.fromkeys(user_ids))
+        found = set(db.scalars(select(User.id).where(User.id.in_(user_ids))))
+        rows = [{'user_id': user_id, 'organization_id': id} for user_id in user_ids if user_id in found]
+
+        added = 0
+        if rows:
+            dialect = postgresql if db.bind.dialect.name == 'postgresql' else sqlite
+            query = dialect.insert(memberships).on_conflict_do_nothing().returning(memberships.c.user_id)
+            added = len(db.execute(query, rows).all())
+            db.commit()
+
+        return {
+            'added': added,
+            'already_members': len(rows) - added,
+            'missing_user_ids': [user_id for user_id in user_ids if user_id not in found],
+        }
+
+
+    def remove_members(self, db: Session, id: str, user_ids: List[str]) -> dict:
+        '''Removes users from an organization, along with the roles they held in it'''
+
+        self.fetch(db, id)
+
+        organization_roles = select(Role.id).where(Role.organization_id == id)
+        unassigned = db.scalars(
+            delete(user_role_association)
+            .where(user_role_association.c.user_id.in_(user_ids), user_role_association.c.role_id.in_(organization_roles))
+            .returning(user_role_association.c.user_id)
+        ).all()
+        permission_service.bump_permission_version(db, user_ids=set(unassigned))
+
+        removed = db.execute(
+            delete(memberships).where(memberships.c.organization_id == id, memberships.c.user_id.in_(user_ids))
+        ).rowcount
+        db.commit()
+
+        return {'removed': removed}
+
+
+organization_service = OrganizationService()
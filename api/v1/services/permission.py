@@ -0,0 +1,139 @@
+from typing import FrozenSet, Iterable, NamedTuple, Optional
+
+from sqlalchemy import event, false, select, update
+from sqlalchemy.orm import Session
+
+from api.utils.cache import TTLCache
+from api.utils.settings import LazyObject, settings
+from api.v1.models.base import role_permission_association, user_role_association
+from api.v1.models.permission import Permission
+from api.v1.models.role import Role
+from api.v1.models.user import User
+
+# Effective permission names keyed by (user id, organization id), stored with the
+# permission_version they were resolved at
+permission_cache = LazyObject(lambda: TTLCache(maxsize=settings.PERMISSION_CACHE_MAXSIZE, ttl=None))
+
+# Current PrincipalState per user id. Changes made through this worker drop the
+# entry once committed; the TTL bounds how long another worker can keep acting on
+# a user's old roles, admin flag or active flag, or on a deleted user
+principal_state_cache = LazyObject(lambda: TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL))
+
+
+class PrincipalState(NamedTuple):
+    '''The columns of a users row that decide what its access tokens may do'''
+
+    is_active: bool
+    is_admin: bool
+    permission_version: int
+
+
+class PermissionService:
+    '''Resolves and caches the permissions a user gets through their roles'''
+
+    def get_principal_state(self, db: Session, user_id: str) -> Optional[PrincipalState]:
+        '''Returns the user's current PrincipalState, or None if they are deleted or gone'''
+
+        state = principal_state_cache.get(user_id)
+
+        if state is None:
+            row = db.execute(
+                select(User.is_active, User.is_admin, User.permission_version)
+                .where(User.id == user_id, User.is_deleted == false())
+            ).first()
+            if row is None:
+                return None
+
+            state = PrincipalState(bool(row.is_active), bool(row.is_admin), row.permission_version or 0)
+            principal_state_cache.set(user_id, state)
+
+        return state
+
+
+    def forget_principal_state(self, user_id: str):
+        '''Drops the cached state of a user; call it after committing a change to it'''
+
+        principal_state_cache.invalidate(user_id)
+
+
+    def get_permission_version(self, db: Session, user_id: str) -> int:
+        '''Returns the user's current permission_version'''
+
+        state = self.get_principal_state(db, user_id)
+        return state.permission_version if state is not None else 0
+
+
+    def load_permissions(self, db: Session, user_id: str, organization_id: Optional[str] = None) -> FrozenSet[str]:
+        '''Loads the names of every permission granted by the user's active roles in one query.
+
+        Without an organization, roles from every organization count.
+        '''
+
+        query = (
+            select(Permission.name)
+            .join(role_permission_association, role_permission_association.c.permission_id == Permission.id)
+            .join(Role, Role.id == role_permission_association.c.role_id)
+            .join(user_role_association, user_role_association.c.role_id == Role.id)
+            .where(user_role_association.c.user_id == user_id, Role.is_active.isnot(False))
+            .distinct()
+        )
+
+        if organization_id is not None:
+            query = query.where(Role.organization_id == organization_id)
+
+        return frozenset(db.scalars(query))
+
+
+    def get_permissions(self, db: Session, user_id: str, organization_id: Optional[str] = None) -> FrozenSet[str]:
+        '''Returns the user's effective permissions, reloading them only when
+        their permission_version has moved on'''
+
+        version = self.get_permission_version(db, user_id)
+        cached = permission_cache.get((user_id, organization_id))
+
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        permissions = self.load_permissions(db, user_id, organization_id)
+        permission_cache.set((user_id, organization_id), (version, permissions))
+
+        return permissions
+
+
+    def has_permission(self, db: Session, user_id: str, permission: str, organization_id: Optional[str] = None) -> bool:
+        '''Checks if a user has a permission, optionally within one organization'''
+
+        return permission in self.get_permissions(db, user_id, organization_id)
+
+
+    def bump_permission_version(self, db: Session, user_ids: Iterable[str] = (), role_ids: Iterable[str] = ()):
+        '''Invalidates the cached permissions of the given users, and of every
+        holder of the given roles, by bumping their permission_version.
+
+        Call it in the same transaction that changes role assignments or a
+        role's permissions. The caller commits, and the cached versions are
+        only dropped once that commit succeeds.
+        '''
+
+        user_ids, role_ids = list(user_ids), list(role_ids)
+        if not user_ids and not role_ids:
+            return
+
+        holders = select(user_role_association.c.user_id).where(user_role_association.c.role_id.in_(role_ids))
+        query = (
+            update(User)
+            .where(User.id.in_(user_ids) | User.id.in_(holders))
+            .values(permission_version=User.permission_version + 1)
+            .returning(User.id)
+        )
+
+        bumped = db.scalars(query).all()
+
+        def invalidate(session):
+            for user_id in bumped:
+                self.forget_principal_state(user_id)
+
+        event.listen(db, 'after_commit', invalidate, once=True)
+
+
+permission_service = PermissionService()
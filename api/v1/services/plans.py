@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from api.utils.json_response import ORJSONResponse
+from api.utils.settings import LazyObject, settings
+from api.v1.models.plans import SubscriptionPlan
+from api.v1.schemas.plans import SubscriptionPlanResponse
+
+
+class CatalogueSnapshot(NamedTuple):
+    body: bytes
+    etag: str
+    built_at: float
+
+
+class PlanCatalogue:
+    '''Serves the subscription plan catalogue from a pre-rendered, in-process snapshot.
+
+    The snapshot is rebuilt whenever a plan is created through this worker, and
+    at least every PLAN_CATALOGUE_TTL seconds so other workers pick up changes.
+    '''
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._lock = threading.Lock()
+
+    def build(self, db: Session) -> CatalogueSnapshot:
+        plans = db.scalars(select(SubscriptionPlan).order_by(SubscriptionPlan.price, SubscriptionPlan.id)).all()
+
+        body = ORJSONResponse(content={
+            'status_code': 200,
+            'success': True,
+            'message': 'Subscription plans retrieved successfully',
+            'data': [SubscriptionPlanResponse.model_validate(plan, from_attributes=True) for plan in plans]
+        }).body
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        return CatalogueSnapshot(body=body, etag=etag, built_at=time.monotonic())
+
+    def get(self, db: Session) -> CatalogueSnapshot:
+        '''Returns the current snapshot, building it only if it is missing or expired'''
+
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.ttl:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have rebuilt it while this one waited
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.built_at >= self.ttl:
+                snapshot = self._snapshot = self.build(db)
+
+        return snapshot
+
+    def rebuild(self, db: Session) -> CatalogueSnapshot:
+        with self._lock:
+            self._snapshot = self.build(db)
+        return self._snapshot
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    '''Checks an If-None-Match header against an ETag, using the weak comparison
+    RFC 9110 prescribes for If-None-Match'''
+
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    candidates = (candidate.strip() for candidate in if_none_match.split(','))
+    return any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+
+plan_catalogue = LazyObject(lambda: PlanCatalogue(ttl=settings.PLAN_CATALOGUE_TTL))
@@ -3,12 +3,16 @@ from sqlalchemy.orm import Session
 
 from api.core.base.services import Service
 from api.utils.db_validators import check_model_existence
+from api.utils.pagination import DEFAULT_PAGE_SIZE, apply_keyset, apply_search_filters, clamp_page_size, get_page
 from api.v1.models.product import Product
 
 
 class ProductService(Service):
     '''Product service functionality'''
 
+    # Columns that can be searched, each backed by a trigram index (see migration b2d4f6a8c0e1)
+    FILTERABLE_COLUMNS = ('name', 'description')
+
     def create(self, db: Session,  schema):
         '''Create a new product'''
 
@@ -20,18 +24,16 @@ class ProductService(Service):
         return new_product
     
 
-    def fetch_all(self, db: Session, **query_params: Optional[Any]):
-        '''Fetch all products with option tto search using query parameters'''
+    def fetch_all(self, db: Session, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **query_params: Optional[Any]):
+        '''Fetch a page of products ordered by id, with option to search using query parameters'''
 
-        query = db.query(Product)
+        limit = clamp_page_size(limit)
 
         # Enable filter by query parameter
-        if query_params:
-            for column, value in query_params.items():
-                if hasattr(Product, column) and value:
-                    query = query.filter(getattr(Product, column).ilike(f'%{value}%'))
+        query = apply_search_filters(db.query(Product), Product, self.FILTERABLE_COLUMNS, query_params)
+        products = apply_keyset(query, Product.id, cursor, limit).all()
 
-        return query.all()
+        return get_page(products, limit)
 
     
     def fetch(self, db: Session, id: str):
@@ -62,4 +64,4 @@ class ProductService(Service):
         product = self.fetch(id=id)
         db.delete(product)
         db.commit()
-    
\ No newline at end of file
+
@@ -0,0 +1,264 @@
+import asyncio
+import datetime as dt
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event, exists, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from uuid_extensions import uuid7
+
+from api.db.database import AsyncSessionLocal, SessionLocal, get_async_engine, get_engine
+from api.utils.cache import BloomFilter, TTLCache
+from api.utils.logger import logger
+from api.utils.settings import LazyObject, settings
+from api.v1.models.refresh_token import RefreshToken
+from api.v1.schemas.user import TokenData
+
+
+# Revocations read again on every sync, for transactions that committed late
+# or workers whose clocks run behind
+SYNC_OVERLAP = dt.timedelta(seconds=60)
+
+
+def utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+class RevokedFamilies:
+    '''The refresh token families (login sessions) revoked so far, as known to this worker.
+
+    A bloom filter answers first, so a session that was never revoked is
+    cleared in microseconds without a query. Only the filter's positives are
+    confirmed against refresh_tokens, and the answer is cached; async code
+    confirms them with async_is_revoked so the event loop is never blocked. Revocations
+    made here are added on commit; a background task reads in those made by
+    other workers every sync_seconds, and rebuilds the filter from the
+    unexpired revocations every rebuild_seconds.
+    '''
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        sync_seconds: Optional[float] = None,
+        rebuild_seconds: Optional[float] = None,
+    ):
+        self.capacity = capacity or settings.REVOCATION_FILTER_CAPACITY
+        self.error_rate = error_rate or settings.REVOCATION_FILTER_ERROR_RATE
+        self.sync_seconds = sync_seconds or settings.REVOCATION_SYNC_SECONDS
+        self.rebuild_seconds = rebuild_seconds or settings.REVOCATION_REBUILD_SECONDS
+        self.filter = BloomFilter(self.capacity, self.error_rate)
+        # Confirmed answers for the filter's positives; a family's False can
+        # only turn True through add, which overwrites it
+        self.confirmed = TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=None)
+        self._watcher: Optional[asyncio.Task] = None
+
+
+    def add(self, family_id: str):
+        self.filter.add(family_id)
+        self.confirmed.set(family_id, True)
+
+
+    def confirm_query(self, family_id: str):
+        return select(exists().where(
+            RefreshToken.family_id == family_id,
+            RefreshToken.revoked_at.is_not(None),
+        ))
+
+
+    def is_revoked(self, family_id: str, db: Optional[Session] = None) -> bool:
+        '''Checks a family, confirming a filter positive with db, or a session of
+        its own when none is given'''
+
+        if family_id not in self.filter:
+            return False
+
+        revoked = self.confirmed.get(family_id)
+        if revoked is None:
+            if db is not None:
+                revoked = db.scalar(self.confirm_query(family_id))
+            else:
+                with SessionLocal(bind=get_engine()) as db:
+                    revoked = db.scalar(self.confirm_query(family_id))
+            self.confirmed.set(family_id, revoked)
+
+        return revoked
+
+
+    async def async_is_revoked(self, family_id: str, db: Optional[AsyncSession] = None) -> bool:
+        '''Same as is_revoked, confirming filter positives with an async session'''
+
+        if family_id not in self.filter:
+            return False
+
+        revoked = self.confirmed.get(family_id)
+        if revoked is None:
+            if db is not None:
+                revoked = await db.scalar(self.confirm_query(family_id))
+            else:
+                async with AsyncSessionLocal(bind=get_async_engine()) as db:
+                    revoked = await db.scalar(self.confirm_query(family_id))
+            self.confirmed.set(family_id, revoked)
+
+        return revoked
+
+
+    async def sync(self, db: AsyncSession, since: Optional[dt.datetime] = None) -> Optional[dt.datetime]:
+        '''Adds the families revoked after since, or rebuilds the filter from every
+        unexpired revocation when since is None. Returns the next since.'''
+
+        query = (
+            select(RefreshToken.family_id, func.max(RefreshToken.revoked_at))
+            .where(RefreshToken.revoked_at.is_not(None))
+            .group_by(RefreshToken.family_id)
+        )
+        if since is None:
+            query = query.where(RefreshToken.expires_at > utcnow())
+        else:
+            query = query.where(RefreshToken.revoked_at > since - SYNC_OVERLAP)
+
+        rows = (await db.execute(query)).all()
+
+        if since is None:
+            self.filter = BloomFilter(self.capacity, self.error_rate, (family_id for family_id, _ in rows))
+            self.confirmed.clear()
+        else:
+            for family_id, _ in rows:
+                self.add(family_id)
+
+        return max((revoked_at for _, revoked_at in rows), default=since or utcnow())
+
+
+    async def start(self):
+        self._watcher = asyncio.create_task(self._watch())
+
+
+    async def _watch(self):
+        since, rebuilt_at = None, time.monotonic()
+
+        while True:
+            try:
+                async with AsyncSessionLocal(bind=get_async_engine()) as db:
+                    if time.monotonic() - rebuilt_at >= self.rebuild_seconds:
+                        await async_refresh_token_service.purge_expired(db)
+                        since, rebuilt_at = None, time.monotonic()
+                    since = await self.sync(db, since)
+            except Exception as exc:
+                logger.exception(f'Could not sync revoked refresh tokens; {exc}')
+
+            await asyncio.sleep(self.sync_seconds)
+
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+
+revoked_families = LazyObject(RevokedFamilies)
+
+
+class RefreshTokenService:
+    '''Issues, rotates and revokes refresh tokens.
+
+    Each login starts a family, and every refresh marks the presented token
+    used and issues the next one in the same family. A token presented a
+    second time has been replayed by someone, so its whole family is revoked,
+    signing out the thief and the user alike.
+    '''
+
+    def values(self, user_id: str, family_id: Optional[str] = None) -> dict:
+        '''Returns the row of a new refresh token, starting a family unless one is given'''
+
+        return {
+            'id': str(uuid7()),
+            'user_id': user_id,
+            'family_id': family_id or str(uuid7()),
+            'expires_at': utcnow() + dt.timedelta(days=settings.JWT_REFRESH_EXPIRY),
+        }
+
+
+    def issue(self, db: Session, user_id: str, family_id: Optional[str] = None) -> dict:
+        values = self.values(user_id, family_id)
+        db.execute(insert(RefreshToken).values(**values))
+        db.commit()
+
+        return values
+
+
+    def rotate(self, db: Session, token: TokenData) -> dict:
+        '''Marks the presented token used and issues its successor. The single
+        conditional UPDATE makes concurrent refreshes with one token race safely:
+        only one of them gets a row back.'''
+
+        now = utcnow()
+        rotated = db.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.id == token.jti,
+                RefreshToken.used_at.is_(None),
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > now,
+            )
+            .values(used_at=now)
+            .returning(RefreshToken.id)
+        ).first()
+
+        if rotated is None:
+            self.revoke_family(db, token.family_id)
+            db.commit()
+            logger.warning(f'Refresh token {token.jti} of user {token.id} was presented again; revoked its session')
+            raise HTTPException(status_code=401, detail='Refresh token has already been used')
+
+        return self.issue(db, token.id, token.family_id)
+
+
+    def revoke_family(self, db: Session, family_id: str):
+        '''Revokes every token of the family; the caller commits'''
+
+        db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=utcnow())
+        )
+
+        event.listen(db, 'after_commit', lambda session: revoked_families.add(family_id), once=True)
+
+
+refresh_token_service = RefreshTokenService()
+
+
+class AsyncRefreshTokenService(RefreshTokenService):
+    '''Refresh token service for AsyncSession'''
+
+    async def issue(self, db: AsyncSession, user_id: str, family_id: Optional[str] = None) -> dict:
+        values = self.values(user_id, family_id)
+        await db.execute(insert(RefreshToken).values(**values))
+        await db.commit()
+
+        return values
+
+
+    async def revoke_family(self, db: AsyncSession, family_id: str):
+        '''Revokes every token of the family; the caller commits'''
+
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=utcnow())
+        )
+
+        event.listen(db.sync_session, 'after_commit', lambda session: revoked_families.add(family_id), once=True)
+
+
+    async def purge_expired(self, db: AsyncSession):
+        '''Deletes tokens past their expiry, which their JWTs already reject'''
+
+        await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= utcnow()))
+        await db.commit()
+
+
+async_refresh_token_service = AsyncRefreshTokenService()
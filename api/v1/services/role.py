@@ -0,0 +1,84 @@
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from uuid_extensions import uuid7
+
+from api.utils.db_validators import is_unique_violation
+from api.v1.models.base import role_permission_association
+from api.v1.models.org import Organization
+from api.v1.models.permission import Permission
+from api.v1.models.role import Role
+from api.v1.schemas.role import RoleBatchItemResult, RoleCreate
+
+
+class RoleService:
+    '''Role service functionality'''
+
+    def create_batch(self, db: Session, roles: List[RoleCreate]) -> List[RoleBatchItemResult]:
+        '''Creates many roles and their permission links in one transaction.
+
+        Every organization, permission and existing role name the batch refers
+        to is looked up with one IN-query each, and the valid roles and
+        role_permission rows are inserted with executemany. Invalid items are
+        reported back and do not stop the rest of the batch. A concurrent batch
+        that wins the race for a name, or removes a referenced row, is a 409.
+        '''
+
+        names = {item.role_name for item in roles}
+        organization_ids = {item.organization_id for item in roles}
+        permission_ids = {permission_id for item in roles for permission_id in item.permission_ids}
+
+        # Role names only have to be unique within their organization
+        existing_roles = set(db.execute(
+            select(Role.organization_id, Role.role_name)
+            .where(Role.organization_id.in_(organization_ids), Role.role_name.in_(names))
+        ).tuples())
+        existing_organizations = set(db.scalars(select(Organization.id).where(Organization.id.in_(organization_ids))))
+        existing_permissions = set(db.scalars(select(Permission.id).where(Permission.id.in_(permission_ids))))
+
+        results, role_rows, permission_rows = [], [], []
+
+        for index, item in enumerate(roles):
+            result = RoleBatchItemResult(index=index, role_name=item.role_name)
+            results.append(result)
+
+            key = (item.organization_id, item.role_name)
+
+            if key in existing_roles:
+                result.error = 'Role already exists'
+            elif item.organization_id not in existing_organizations:
+                result.error = 'Organization does not exist'
+            elif not existing_permissions.issuperset(item.permission_ids):
+                result.error = 'Some permissions do not exist'
+
+            if result.error:
+                continue
+
+            # Later items with the same name in the same organization are duplicates of this one
+            existing_roles.add(key)
+
+            result.id = str(uuid7())
+            role_rows.append({'id': result.id, 'role_name': item.role_name, 'organization_id': item.organization_id, 'is_active': True})
+            permission_rows.extend(
+                {'role_id': result.id, 'permission_id': permission_id} for permission_id in set(item.permission_ids)
+            )
+
+        try:
+            if role_rows:
+                db.execute(insert(Role), role_rows)
+            if permission_rows:
+                db.execute(insert(role_permission_association), permission_rows)
+            db.commit()
+        except IntegrityError as exc:
+            db.rollback()
+            if is_unique_violation(exc):
+                raise HTTPException(status_code=409, detail='Role already exists')
+            raise HTTPException(status_code=409, detail='Organization or permission no longer exists')
+
+        return results
+
+
+role_service = RoleService()
@@ -1,42 +1,87 @@
 from typing import Any, Optional
-import bcrypt, datetime as dt
+import bcrypt, datetime as dt, hashlib
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.core.base.services import Service
-from api.db.database import get_db
-from api.utils.settings import settings
-from api.utils.db_validators import check_model_existence
+from api.core.dependencies.email import mail_service
+from api.core.dependencies.hashing import get_crypt_context, password_hasher
+from api.db.database import get_db, get_async_db
+from api.db.loader_profiles import LoaderProfile, get_loader_profile
+from api.utils.cache import TTLCache
+from api.utils.jwt_backend import TokenDecodeError, jwt_backend
+from api.utils.settings import LazyObject, settings
+from api.utils.db_validators import check_model_existence, async_check_model_existence, is_unique_violation
+from api.utils.pagination import DEFAULT_PAGE_SIZE, apply_keyset, apply_search_filters, clamp_page_size, get_page
 from api.v1.models.user import User
+from api.v1.services.permission import permission_service
+from api.v1.services.refresh_token import async_refresh_token_service, refresh_token_service, revoked_families
 from api.v1.schemas import user
 
 oauth2_scheme = OAuth2PasswordBearer('/api/v1/auth/login')
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+pwd_context = LazyObject(lambda: get_crypt_context(settings.BCRYPT_ROUNDS))
+
+# Short-lived snapshots of user rows, keyed by user id
+user_cache = LazyObject(lambda: TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL))
+
+# Verified TokenData keyed by (token type, sha256 of the token), kept until the token's exp
+token_cache = LazyObject(lambda: TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=None))
+
+
+# Relationships loaded with users for each use; serialising a page of users with
+# one of these costs one query, plus one per selectinload, whatever the page size
+USER_LOADER_PROFILES = {
+    'summary': LoaderProfile(),
+    'with_profile': LoaderProfile(profile=joinedload),
+    'with_orgs_and_roles': LoaderProfile(organizations=selectinload, roles=selectinload),
+}
+
+
+def get_token_digest(token: str) -> bytes:
+    '''Returns the cache key digest of a raw token'''
+
+    return hashlib.sha256(token.encode()).digest()
 
 class UserService(Service):
     '''User service'''
 
-    def fetch_all(self, db: Session, **query_params: Optional[Any]):
-        '''Fetch all users'''
+    # Columns that can be searched, each backed by a trigram index (see migration b2d4f6a8c0e1)
+    FILTERABLE_COLUMNS = ('first_name', 'last_name', 'username', 'email')
+
+    def get_loader_options(self, profile: Optional[str]) -> list:
+        '''Returns the loader options of a profile in USER_LOADER_PROFILES, or none
+        (and so default lazy loading) without one'''
+
+        return get_loader_profile(USER_LOADER_PROFILES, profile).options(User) if profile else []
+
+
+    def serialize(self, user: User, profile: str = 'summary') -> dict:
+        '''Serialises a user fetched with profile, along with the relationships it loaded'''
+
+        return get_loader_profile(USER_LOADER_PROFILES, profile).serialize(user)
+
+
+    def fetch_all(self, db: Session, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, profile: Optional[str] = None, **query_params: Optional[Any]):
+        '''Fetch a page of users ordered by id, starting after cursor, eager loading
+        the relationships of the given loader profile'''
 
-        query = db.query(User)
+        limit = clamp_page_size(limit)
 
         # Enable filter by query parameter
-        if query_params:
-            for column, value in query_params.items():
-                if hasattr(User, column) and value:
-                    query = query.filter(getattr(User, column).ilike(f'%{value}%'))
+        query = apply_search_filters(db.query(User), User, self.FILTERABLE_COLUMNS, query_params)
+        users = apply_keyset(query.options(*self.get_loader_options(profile)), User.id, cursor, limit).all()
 
-        return query.all()
+        return get_page(users, limit)
 
     
-    def fetch(self, db: Session, id):
-        '''Fetches a user by their id'''
+    def fetch(self, db: Session, id, profile: Optional[str] = None):
+        '''Fetches a user by their id, eager loading the relationships of the given loader profile'''
 
-        user = check_model_existence(db, User, id)
+        user = check_model_existence(db, User, id, options=self.get_loader_options(profile))
         return user
     
     
@@ -60,24 +105,36 @@ class UserService(Service):
             raise HTTPException(status_code=404, detail='User not found')
         
         return user
+
+
+    def fetch_cached(self, db: Session, id) -> user.UserBase:
+        '''Fetches a read-only snapshot of a user, served from the in-process cache when possible'''
+
+        snapshot = user_cache.get(id)
+
+        if snapshot is None:
+            snapshot = user.UserBase.model_validate(self.fetch(db=db, id=id), from_attributes=True)
+            user_cache.set(id, snapshot)
+
+        return snapshot
     
     
     def create(self, db: Session, schema: user.UserCreate):
         '''Creates a new user'''
 
-        if db.query(User).filter(User.email == schema.email).first() or db.query(User).filter(User.username == schema.username).first():
-            raise HTTPException(status_code=400, detail='User with this email or username already exists')
-
-        print(f'PASSWORD: -- {schema.password}')
-
         # Hash password
         schema.password = self.hash_password(password=schema.password)
-        
-        # Create user object with hashed password and other attributes from schema
-        user = User(**schema.model_dump())
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+
+        # A single INSERT ... RETURNING; the unique constraints on email and username
+        # reject duplicates, so there is no check-then-insert race
+        try:
+            user = db.scalar(insert(User).values(**schema.model_dump()).returning(User))
+            db.commit()
+        except IntegrityError as exc:
+            db.rollback()
+            if is_unique_violation(exc):
+                raise HTTPException(status_code=400, detail='User with this email or username already exists')
+            raise
 
         return user
     
@@ -93,6 +150,8 @@ class UserService(Service):
         user = self.get_current_user(access_token, db) if id is not None else check_model_existence(db, User, id)
         user.is_deleted = True
         db.commit()
+        user_cache.invalidate(user.id)
+        permission_service.forget_principal_state(user.id)
 
         return super().delete()
     
@@ -105,8 +164,14 @@ class UserService(Service):
         if not user:
             raise HTTPException(status_code=400, detail='Invalid user credentials')
 
-        if not self.verify_password(password, user.password):
+        is_valid, new_hash = pwd_context.verify_and_update(secret=password, hash=user.password)
+        if not is_valid:
             raise HTTPException(status_code=400, detail='Invalid user credentials')
+
+        # Transparently rehash when the stored hash uses another work factor
+        if new_hash:
+            user.password = new_hash
+            db.commit()
         
         return user
     
@@ -131,8 +196,9 @@ class UserService(Service):
         return pwd_context.verify(secret=password, hash=hash) 
     
 
-    def create_access_token(self, user_id: str) -> str:
-        '''Function to create access token'''
+    def create_access_token(self, user_id: str, family_id: Optional[str] = None) -> str:
+        '''Function to create access token, embedding the login session (refresh
+        token family) it belongs to when that is given'''
         
         expires = dt.datetime.utcnow() + dt.timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         data = {
@@ -140,13 +206,16 @@ class UserService(Service):
             'exp': expires,
             'type': 'access'
         }
+
+        if family_id is not None:
+            data['sid'] = family_id
         
-        encoded_jwt = jwt.encode(data, settings.SECRET_KEY, settings.ALGORITHM)
+        encoded_jwt = jwt_backend.encode(data)
         return encoded_jwt
 
 
-    def create_refresh_token(self, user_id: str) -> str:
-        '''Function to create access token'''
+    def create_refresh_token(self, user_id: str, refresh: Optional[dict] = None) -> str:
+        '''Function to create refresh token, for the refresh_tokens row when one is given'''
                 
         expires = dt.datetime.utcnow() + dt.timedelta(days=settings.JWT_REFRESH_EXPIRY)
         
@@ -155,28 +224,51 @@ class UserService(Service):
             'exp': expires,
             'type': 'refresh'
         }
+
+        if refresh is not None:
+            data.update(jti=refresh['id'], fid=refresh['family_id'], exp=refresh['expires_at'])
         
-        encoded_jwt = jwt.encode(data, settings.SECRET_KEY, settings.ALGORITHM)
+        encoded_jwt = jwt_backend.encode(data)
         return encoded_jwt
     
 
-    def verify_access_token(self, access_token: str, credentials_exception):
-        '''Funtcion to decode and verify access token'''
-        
-        try:
-            payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            user_id = payload.get('user_id')
-            token_type = payload.get('type')
+    def decode_access_token(self, access_token: str, credentials_exception) -> user.TokenData:
+        '''Function to decode access token, without checking its session is still live'''
+
+        if not access_token:
+            raise credentials_exception
+
+        cache_key = ('access', get_token_digest(access_token))
+        token_data = token_cache.get(cache_key)
+        if token_data is None:
+            try:
+                payload = jwt_backend.decode(access_token)
+                user_id = payload.get('user_id')
+                token_type = payload.get('type')
+                
+                if user_id is None:
+                    raise credentials_exception
+                
+                if token_type == 'refresh':
+                    raise HTTPException(detail='Refresh token not allowed', status_code=400)
+                
+                token_data = user.TokenData(id=user_id, family_id=payload.get('sid'))
             
-            if user_id is None:
+            except TokenDecodeError:
                 raise credentials_exception
-            
-            if token_type == 'refresh':
-                raise HTTPException(detail='Refresh token not allowed', status_code=400)
-            
-            token_data = user.TokenData(id=user_id)
-        
-        except JWTError:
+
+            token_cache.set(cache_key, token_data, expires_at=payload['exp'])
+
+        return token_data
+
+
+    def verify_access_token(self, access_token: str, credentials_exception, db: Optional[Session] = None):
+        '''Funtcion to decode and verify access token'''
+
+        token_data = self.decode_access_token(access_token, credentials_exception)
+
+        # Checked on every use, as the session can be logged out after caching
+        if token_data.family_id is not None and revoked_families.is_revoked(token_data.family_id, db):
             raise credentials_exception
         
         return token_data
@@ -184,9 +276,17 @@ class UserService(Service):
 
     def verify_refresh_token(self, refresh_token: str, credentials_exception):
         '''Funtcion to decode and verify refresh token'''
+
+        if not refresh_token:
+            raise credentials_exception
+
+        cache_key = ('refresh', get_token_digest(refresh_token))
+        token_data = token_cache.get(cache_key)
+        if token_data is not None:
+            return token_data
         
         try:
-            payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            payload = jwt_backend.decode(refresh_token)
             user_id = payload.get('user_id')
             token_type = payload.get('type')
             
@@ -196,15 +296,26 @@ class UserService(Service):
             if token_type == 'access':
                 raise HTTPException(detail='Access token not allowed', status_code=400)
             
-            token_data = user.TokenData(id=user_id)
+            token_data = user.TokenData(id=user_id, jti=payload.get('jti'), family_id=payload.get('fid'))
         
-        except JWTError:
+        except TokenDecodeError:
             raise credentials_exception
+
+        token_cache.set(cache_key, token_data, expires_at=payload['exp'])
     
         return token_data
         
         
-    def refresh_access_token(self, current_refresh_token: str):
+    def start_session(self, db: Session, user: User):
+        '''Function to issue the access and refresh tokens of a new login session'''
+
+        refresh = refresh_token_service.issue(db, user_id=user.id)
+
+        access = self.create_access_token(user_id=user.id, family_id=refresh['family_id'])
+        return access, self.create_refresh_token(user_id=user.id, refresh=refresh)
+
+
+    def refresh_access_token(self, current_refresh_token: str, db: Session):
         '''Function to generate new access token and rotate refresh token'''
         
         credentials_exception = HTTPException(
@@ -213,14 +324,50 @@ class UserService(Service):
         )
         
         token = self.verify_refresh_token(current_refresh_token, credentials_exception)
+
+        # Tokens issued before rotation have no row to rotate; their users log in again
+        if token.jti is None or token.family_id is None:
+            raise credentials_exception
+
+        if revoked_families.is_revoked(token.family_id, db):
+            raise credentials_exception
         
-        if token:
-            access = self.create_access_token(user_id=token.id)
-            refresh = self.create_refresh_token(user_id=token.id)
-            
-            return access, refresh
-        else:
-            pass
+        # Deleted users can not refresh their way back in
+        if permission_service.get_principal_state(db, token.id) is None:
+            raise credentials_exception
+
+        access = self.create_access_token(user_id=token.id, family_id=token.family_id)
+        refresh = refresh_token_service.rotate(db, token)
+        
+        return access, self.create_refresh_token(user_id=token.id, refresh=refresh)
+
+
+    def logout(self, db: Session, access_token: str, refresh_token: Optional[str] = None):
+        '''Function to revoke the login session of the access token, and of the refresh
+        token too when it belongs to the same user'''
+
+        credentials_exception = HTTPException(
+            status_code=401,
+            detail='Could not validate crenentials',
+            headers={'WWW-Authenticate': 'Bearer'}
+        )
+
+        principal = self.verify_access_token(access_token, credentials_exception, db)
+        family_ids = {principal.family_id}
+
+        if refresh_token:
+            try:
+                token = self.verify_refresh_token(refresh_token, credentials_exception)
+            except HTTPException:
+                token = None
+
+            if token is not None and token.id == principal.id:
+                family_ids.add(token.family_id)
+
+        family_ids.discard(None)
+        for family_id in family_ids:
+            refresh_token_service.revoke_family(db, family_id)
+        db.commit()
     
 
     def get_current_user(self, access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
@@ -232,12 +379,47 @@ class UserService(Service):
             headers={'WWW-Authenticate': 'Bearer'}
         )
         
-        token = self.verify_access_token(access_token, credentials_exception)
+        token = self.verify_access_token(access_token, credentials_exception, db)
         user =  db.query(User).filter(User.id == token.id).first()
+
+        # Deleted users are not found, their tokens notwithstanding
+        if user is None:
+            raise credentials_exception
         
         return user
+
+
+    def get_current_principal(self, access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> user.TokenData:
+        '''Function to get the current user's id and access state without loading the user.
+
+        The state is read from the users row through a short-lived cache rather
+        than from the token, so demoting, deactivating or deleting a user applies
+        to their live tokens: at once on this worker, and within USER_CACHE_TTL
+        seconds on the others.
+        '''
+
+        credentials_exception = HTTPException(
+            status_code=401,
+            detail='Could not validate crenentials',
+            headers={'WWW-Authenticate': 'Bearer'}
+        )
+
+        token = self.verify_access_token(access_token, credentials_exception, db)
+        state = permission_service.get_principal_state(db, token.id)
+
+        if state is None:
+            raise credentials_exception
+
+        if not state.is_active:
+            raise HTTPException(detail='User is not active', status_code=403)
+
+        return user.TokenData(id=token.id, family_id=token.family_id, **state._asdict())
     
 
+    def get_deactivation_mail_body(self, user: User, reactivation_link: str) -> str:
+        return f'Hello, {user.first_name},\n\nYour account has been deactivated successfully.\nTo reactivate your account if this was a mistake, please click the link below:\n{reactivation_link}\n\nThis link expires after 15 minutes.'
+
+
     def deactivate_user(self, request: Request, db: Session, schema: user.DeactivateUserSchema, user: User):
         '''Function to deactivate a user'''
 
@@ -248,13 +430,19 @@ class UserService(Service):
         token = self.create_access_token(user_id=user.id)
         reactivation_link = f'https://{request.url.hostname}/api/v1/users/accounts/reactivate?token={token}'
 
-        # mail_service.send_mail(
-        #     to=user.email, 
-        #     subject='Account deactivation', 
-        #     body=f'Hello, {user.first_name},\n\nYour account has been deactivated successfully.\nTo reactivate your account if this was a mistake, please click the link below:\n{request.url.hostname}/api/users/accounts/reactivate?token={token}\n\nThis link expires after 15 minutes.'
-        # )
-
+        # Shed load before committing; once committed, the email must not fail the request
+        mail_service.check_capacity()
         db.commit()
+        user_cache.invalidate(user.id)
+        permission_service.forget_principal_state(user.id)
+
+        # Only queued once the change is committed; delivery happens in the background mail queue
+        mail_service.send_mail(
+            to=user.email, 
+            subject='Account deactivation', 
+            body=self.get_deactivation_mail_body(user, reactivation_link),
+            shed=False
+        )
 
         return reactivation_link
 
@@ -264,13 +452,13 @@ class UserService(Service):
 
         # Validate the token
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            payload = jwt_backend.decode(token)
             user_id = payload.get('user_id')
 
             if user_id is None:
                 raise HTTPException(400, 'Invalid token')
             
-        except JWTError:
+        except TokenDecodeError:
             raise HTTPException(400, 'Invalid token')
         
         user = db.query(User).filter(User.id == user_id).first()
@@ -280,15 +468,226 @@ class UserService(Service):
 
         user.is_active = True
 
-        # Send aail to user
-        # mail_service.send_mail(
-        #     to=user.email, 
-        #     subject='Account reactivation', 
-        #     body=f'Hello, {user.first_name},\n\nYour account has been reactivated successfully'
-        # )
+        # Shed load before committing; once committed, the email must not fail the request
+        mail_service.check_capacity()
 
-        # Commit changes to deactivate the user
+        # Commit changes to reactivate the user
         db.commit()
+        user_cache.invalidate(user.id)
+        permission_service.forget_principal_state(user.id)
+
+        # Send mail to user
+        mail_service.send_mail(
+            to=user.email, 
+            subject='Account reactivation', 
+            body=f'Hello, {user.first_name},\n\nYour account has been reactivated successfully',
+            shed=False
+        )
+
+
+
+class AsyncUserService(UserService):
+    '''User service backed by an AsyncSession, for use from async routes'''
+
+    async def fetch_all(self, db: AsyncSession, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, profile: Optional[str] = None, **query_params: Optional[Any]):
+        '''Fetch a page of users ordered by id, starting after cursor, eager loading
+        the relationships of the given loader profile'''
+
+        limit = clamp_page_size(limit)
+
+        # Enable filter by query parameter
+        query = apply_search_filters(select(User), User, self.FILTERABLE_COLUMNS, query_params)
+        result = await db.execute(apply_keyset(query.options(*self.get_loader_options(profile)), User.id, cursor, limit))
+
+        return get_page(result.scalars().all(), limit)
+
+
+    async def fetch(self, db: AsyncSession, id, profile: Optional[str] = None):
+        '''Fetches a user by their id, eager loading the relationships of the given loader profile'''
+
+        user = await async_check_model_existence(db, User, id, options=self.get_loader_options(profile))
+        return user
+
+
+    async def fetch_by_email(self, db: AsyncSession, email):
+        '''Fetches a user by their email'''
+
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
+
+        if not user:
+            raise HTTPException(status_code=404, detail='User not found')
+
+        return user
+
+
+    async def fetch_by_username(self, db: AsyncSession, username):
+        '''Fetches a user by their username'''
+
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
+
+        if not user:
+            raise HTTPException(status_code=404, detail='User not found')
+
+        return user
+
+
+    async def create(self, db: AsyncSession, schema: user.UserCreate):
+        '''Creates a new user'''
+
+        # Hash password
+        schema.password = await password_hasher.hash(password=schema.password)
+
+        try:
+            user = await db.scalar(insert(User).values(**schema.model_dump()).returning(User))
+            await db.commit()
+        except IntegrityError as exc:
+            await db.rollback()
+            if is_unique_violation(exc):
+                raise HTTPException(status_code=400, detail='User with this email or username already exists')
+            raise
+
+        return user
+
+
+    async def delete(self, db: AsyncSession, id=None, access_token: str = Depends(oauth2_scheme)):
+        '''Function to soft delete a user'''
+
+        # Get user from access token if no id is provided, otherwise fetch user by id
+        user = await self.get_current_user(access_token, db) if id is None else await async_check_model_existence(db, User, id)
+        user.is_deleted = True
+        await db.commit()
+        user_cache.invalidate(user.id)
+        permission_service.forget_principal_state(user.id)
+
+
+    async def authenticate_user(self, db: AsyncSession, username: str, password: str):
+        '''Function to authenticate a user'''
+
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
+
+        if not user:
+            raise HTTPException(status_code=400, detail='Invalid user credentials')
+
+        is_valid, new_hash = await password_hasher.verify_and_update(password=password, hash=user.password)
+        if not is_valid:
+            raise HTTPException(status_code=400, detail='Invalid user credentials')
+
+        # Transparently rehash when the stored hash uses another work factor
+        if new_hash:
+            user.password = new_hash
+            await db.commit()
+
+        return user
+
+
+    async def start_session(self, db: AsyncSession, user: User):
+        '''Function to issue the access and refresh tokens of a new login session'''
+
+        refresh = await async_refresh_token_service.issue(db, user_id=user.id)
+
+        access = self.create_access_token(user_id=user.id, family_id=refresh['family_id'])
+        return access, self.create_refresh_token(user_id=user.id, refresh=refresh)
+
+
+    async def verify_access_token(self, access_token: str, credentials_exception, db: Optional[AsyncSession] = None):
+        '''Funtcion to decode and verify access token without blocking the event loop'''
+
+        token_data = self.decode_access_token(access_token, credentials_exception)
+
+        # Checked on every use, as the session can be logged out after caching
+        if token_data.family_id is not None and await revoked_families.async_is_revoked(token_data.family_id, db):
+            raise credentials_exception
+
+        return token_data
+
+
+    async def get_current_user(self, access_token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
+        '''Function to get current logged in user'''
+
+        credentials_exception = HTTPException(
+            status_code=401,
+            detail='Could not validate crenentials',
+            headers={'WWW-Authenticate': 'Bearer'}
+        )
+
+        token = await self.verify_access_token(access_token, credentials_exception, db)
+        user = await db.get(User, token.id)
+
+        # Deleted users are not found, their tokens notwithstanding
+        if user is None:
+            raise credentials_exception
+
+        return user
+
+
+    async def deactivate_user(self, request: Request, db: AsyncSession, schema: user.DeactivateUserSchema, user: User):
+        '''Function to deactivate a user'''
+
+        self.perform_user_check(user)
+        user.is_active = False
+
+        # Create reactivation token
+        token = self.create_access_token(user_id=user.id)
+        reactivation_link = f'https://{request.url.hostname}/api/v1/users/accounts/reactivate?token={token}'
+
+        # Shed load before committing; once committed, the email must not fail the request
+        mail_service.check_capacity()
+        await db.commit()
+        user_cache.invalidate(user.id)
+        permission_service.forget_principal_state(user.id)
+
+        mail_service.send_mail(
+            to=user.email, 
+            subject='Account deactivation', 
+            body=self.get_deactivation_mail_body(user, reactivation_link),
+            shed=False
+        )
+
+        return reactivation_link
+
+
+    async def reactivate_user(self, db: AsyncSession, token: str):
+        '''This function reactivates a user account'''
+
+        # Validate the token
+        try:
+            payload = jwt_backend.decode(token)
+            user_id = payload.get('user_id')
+
+            if user_id is None:
+                raise HTTPException(400, 'Invalid token')
+
+        except TokenDecodeError:
+            raise HTTPException(400, 'Invalid token')
+
+        user = await db.get(User, user_id)
+
+        if user is None:
+            raise HTTPException(400, 'Invalid token')
+
+        if user.is_active:
+            raise HTTPException(400, 'User is already active')
+
+        user.is_active = True
+
+        # Shed load before committing; once committed, the email must not fail the request
+        mail_service.check_capacity()
+
+        # Commit changes to reactivate the user
+        await db.commit()
+        user_cache.invalidate(user.id)
+        permission_service.forget_principal_state(user.id)
+
+        mail_service.send_mail(
+            to=user.email, 
+            subject='Account reactivation', 
+            body=f'Hello, {user.first_name},\n\nYour account has been reactivated successfully',
+            shed=False
+        )
 
 
 user_service = UserService()
+async_user_service = AsyncUserService()
@@ -1,27 +1,54 @@
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.requests import Request
-from api.utils.json_response import JsonResponseDict
-
-from api.utils.logger import logger
+from api.utils.json_response import JsonResponseDict, ORJSONResponse
+from api.core.dependencies.email import mail_queue
+from api.core.dependencies.hashing import password_hasher
+from api.core.metrics import registry
+from api.core.middleware import RequestTimingMiddleware
+
+from api.db.database import dispose_db, init_db
+from api.utils.logger import configure_logging, logger
+from api.utils.jwt_backend import jwt_backend
+from api.utils.rate_limit import rate_limiter
+from api.utils.settings import get_settings
 from api.v1.routes.newsletter import (
     CustomException,
     custom_exception_handler
 )
 from api.v1.routes import api_version_one
+from api.v1.services.newsletter import newsletter_broadcaster
+from api.v1.services.refresh_token import revoked_families
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Nothing below runs at import, so workers and test runs import the app quickly
+    configure_logging()
+    get_settings()
+    # Built up front so an unknown JWT_BACKEND fails startup rather than the first request
+    jwt_backend.resolve()
+    init_db()
+    password_hasher.start()
+    await mail_queue.start()
+    await newsletter_broadcaster.start()
+    await revoked_families.start()
     yield
+    await revoked_families.stop()
+    await newsletter_broadcaster.stop()
+    await mail_queue.stop()
+    password_hasher.shutdown()
+    await rate_limiter.close()
+    await dispose_db()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 origins = [
     "http://localhost:3000",
@@ -34,8 +61,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Added last so it is outermost and times everything, CORS included
+app.add_middleware(RequestTimingMiddleware)
+
 app.add_exception_handler(CustomException, custom_exception_handler) # Newsletter custom exception registration
 app.include_router(api_version_one)
 
@@ -49,6 +80,14 @@ async def get_root(request: Request) -> dict:
 	)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    '''Prometheus scrape endpoint; like the pool stats it is unauthenticated,
+    so keep it off the public ingress'''
+
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # REGISTER EXCEPTION HANDLERS
 
 @app.exception_handler(HTTPException)
@@ -59,7 +98,8 @@ async def http_exception(request: Request, exc: HTTPException):
             "success": False,
             "status_code": exc.status_code,
             "message": exc.detail
-        }
+        },
+        headers=exc.headers
     )
 
 @app.exception_handler(RequestValidationError)
@@ -70,7 +110,8 @@ async def validation_exception(request: Request, exc: RequestValidationError):
             "success": False,
             "status_code": 422,
             "message": "Invalid input",
-            "errors": exc.errors()
+            # Validator errors carry the exception raised, which plain json can't encode
+            "errors": jsonable_encoder(exc.errors())
         }
     )
 
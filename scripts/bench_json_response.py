@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Benchmarks rendering a page of users as a JSON response
+
+Compares the previous path (isoformat() in to_dict, jsonable_encoder, then
+stdlib json) against ORJSONResponse rendering to_dict() as is.
+
+usage:
+
+python -m scripts.bench_json_response --page-size 100 --iterations 2000
+"""
+import argparse
+import datetime as dt
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from uuid_extensions import uuid7
+
+from api.utils.json_response import ORJSONResponse
+from api.v1.models.user import User
+
+
+def make_users(count: int):
+    now = dt.datetime.now(dt.timezone.utc)
+    return [
+        User(
+            id=str(uuid7()),
+            username=f'user{i}',
+            email=f'user{i}@example.com',
+            password='hashed',
+            first_name='Bench',
+            last_name='User',
+            is_active=True,
+            is_admin=False,
+            is_deleted=False,
+            permission_version=0,
+            created_at=now,
+            updated_at=now
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_to_dict(user: User) -> dict:
+    obj_dict = user.to_dict()
+    obj_dict['created_at'] = user.created_at.isoformat()
+    obj_dict['updated_at'] = user.updated_at.isoformat()
+    return obj_dict
+
+
+def run(page_size: int, iterations: int):
+    users = make_users(page_size)
+
+    def before():
+        content = {'status_code': 200, 'success': True, 'data': [legacy_to_dict(user) for user in users]}
+        JSONResponse(content=jsonable_encoder(content))
+
+    def after():
+        content = {'status_code': 200, 'success': True, 'data': [user.to_dict() for user in users]}
+        ORJSONResponse(content=content)
+
+    assert JSONResponse(content=jsonable_encoder({'data': [legacy_to_dict(user) for user in users]})).body.replace(b' ', b'') \
+        == ORJSONResponse(content={'data': [user.to_dict() for user in users]}).body
+
+    results = {
+        'json + jsonable_encoder': timeit.timeit(before, number=iterations),
+        'orjson': timeit.timeit(after, number=iterations),
+    }
+
+    print(f'{"case":<28}{"ms/page":>10}{"pages/s":>12}')
+    for case, seconds in results.items():
+        per_page = seconds / iterations
+        print(f'{case:<28}{per_page * 1e3:>10.3f}{1 / per_page:>12.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark JSON rendering of a page of users')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    run(args.page_size, args.iterations)
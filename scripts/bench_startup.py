@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Benchmarks worker cold start
+
+Imports the app in fresh interpreters with -X importtime and reports the
+median self and cumulative import time per module, for the project's own
+modules and the slowest modules overall.
+
+usage:
+
+python -m scripts.bench_startup --runs 5 --top 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+def import_times(target: str) -> tuple:
+    '''Imports target in a new interpreter and returns (wall seconds, {module: (self_us, cumulative_us)})'''
+
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return wall, modules
+
+
+def run(target: str, runs: int, top: int):
+    walls = []
+    samples = defaultdict(list)
+
+    for _ in range(runs):
+        wall, modules = import_times(target)
+        walls.append(wall)
+        for name, times in modules.items():
+            samples[name].append(times)
+
+    medians = {
+        name: (statistics.median(s for s, _ in times), statistics.median(c for _, c in times))
+        for name, times in samples.items()
+    }
+
+    def report(title, names):
+        print(f'\n{title}')
+        print(f'{"module":<48}{"self ms":>10}{"cumulative ms":>16}')
+        for name in names:
+            self_us, cumulative_us = medians[name]
+            print(f'{name:<48}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}')
+
+    project = sorted(
+        (name for name in medians if name == target or name.startswith(('api.', 'main'))),
+        key=lambda name: medians[name][1], reverse=True
+    )
+    slowest = sorted(medians, key=lambda name: medians[name][0], reverse=True)[:top]
+
+    print(f'import {target}: median wall time {statistics.median(walls) * 1000:.0f} ms over {runs} runs')
+    report('project modules (by cumulative time)', project[:top])
+    report('slowest modules overall (by self time)', slowest)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark per-module import time of the app')
+    parser.add_argument('--target', default='main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    run(args.target, args.runs, args.top)
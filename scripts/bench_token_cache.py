@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Benchmarks access token verification
+
+Compares a full decode with each JWT backend against a verification
+served from the decoded-token cache.
+
+usage:
+
+python -m scripts.bench_token_cache --iterations 20000
+"""
+import argparse
+import timeit
+
+from fastapi import HTTPException
+
+from api.utils.jwt_backend import JWT_BACKENDS, get_jwt_backend
+from api.v1.services import user as user_module
+from api.v1.services.user import token_cache, user_service
+
+
+def run(iterations: int):
+    credentials_exception = HTTPException(status_code=401)
+    original_backend = user_module.jwt_backend
+    results = {}
+
+    try:
+        for name in JWT_BACKENDS:
+            backend = get_jwt_backend(name)
+            user_module.jwt_backend = backend
+            token = user_service.create_access_token(user_id='bench-user')
+
+            results[f'{name} decode'] = timeit.timeit(lambda: backend.decode(token), number=iterations)
+
+            def verify_uncached():
+                token_cache.clear()
+                user_service.verify_access_token(token, credentials_exception)
+
+            results[f'{name} verify (no cache)'] = timeit.timeit(verify_uncached, number=iterations)
+
+            token_cache.clear()
+            user_service.verify_access_token(token, credentials_exception)
+            results[f'{name} verify (cached)'] = timeit.timeit(
+                lambda: user_service.verify_access_token(token, credentials_exception), number=iterations
+            )
+    finally:
+        user_module.jwt_backend = original_backend
+        token_cache.clear()
+
+    print(f'{"case":<28}{"us/op":>10}{"ops/s":>12}')
+    for case, seconds in results.items():
+        per_op = seconds / iterations
+        print(f'{case:<28}{per_op * 1e6:>10.2f}{1 / per_op:>12.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark access token verification')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    run(args.iterations)
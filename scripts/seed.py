@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+""" Bulk seeds the database with synthetic data
+
+Generates users, organizations, memberships, roles, permissions, blogs,
+jobs and profiles in parallel processes. Everything, ids included, is
+derived from --seed and each row's index, so a given seed and scale always
+produce the same data whatever the number of workers.
+
+Rows are loaded with COPY on Postgres, each worker over its own
+connection. On SQLite the workers only generate rows and the parent
+inserts them with executemany, since SQLite allows one writer at a time.
+
+Users get one of a small pool of passwords, hashed once up front:
+user{i} logs in with password(i), i.e. Seed{i % pool}@password.
+
+Seed into an empty schema (run the migrations, or pass --create-schema).
+
+usage:
+
+python -m scripts.seed --scale 0.01
+python -m scripts.seed --scale 1000 --workers 8 --seed 42
+python -m scripts.seed --users 50000 --organizations 0 --blogs 0 --jobs 0
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import create_engine, inspect, make_url
+from sqlalchemy.exc import CompileError
+
+from api.core.dependencies.hashing import get_crypt_context
+import api.v1.models  # noqa: F401 - registers every table on Base.metadata
+from api.v1.models.base import Base
+
+# Rows generated at scale 1; --scale multiplies them
+BASE_COUNTS = {
+    'users': 1000,
+    'organizations': 50,
+    'blogs': 2000,
+    'jobs': 500,
+}
+
+FIRST_NAMES = ('Ada', 'Bola', 'Chen', 'Dayo', 'Eve', 'Femi', 'Grace', 'Hiro', 'Ife', 'Jude', 'Kemi', 'Lars')
+LAST_NAMES = ('Okafor', 'Smith', 'Nakamura', 'Adeyemi', 'Garcia', 'Ibrahim', 'Novak', 'Mensah', 'Rossi', 'Kim')
+ROLE_NAMES = ('admin', 'manager', 'member', 'viewer', 'billing', 'support')
+RESOURCES = ('user', 'organization', 'role', 'blog', 'job', 'product', 'plan', 'newsletter')
+ACTIONS = ('create', 'read', 'update', 'delete')
+PERMISSION_NAMES = tuple(f'{resource}:{action}' for resource in RESOURCES for action in ACTIONS)
+TAGS = ('python', 'fastapi', 'sqlalchemy', 'postgres', 'devops', 'career', 'design', 'news')
+JOB_TYPES = ('full-time', 'part-time', 'contract', 'internship')
+CITIES = ('Lagos', 'Nairobi', 'Berlin', 'Toronto', 'Remote', 'Accra', 'Lisbon')
+
+# Timestamp (2024-01-01) the generated uuid7 ids start from, one millisecond per row
+ID_EPOCH_MS = 1704067200000
+
+
+@dataclass
+class SeedPlan:
+    '''What to generate; the row counts are final, already scaled'''
+
+    seed: int = 0
+    users: int = 1000
+    organizations: int = 50
+    blogs: int = 2000
+    jobs: int = 500
+    profiles: bool = True
+    memberships_per_user: int = 2
+    roles_per_org: int = 3
+    permissions_per_role: int = 5
+    password_pool: int = 8
+    password_hashes: Tuple[str, ...] = field(default=(), repr=False)
+
+    @classmethod
+    def scaled(cls, scale: float, **overrides) -> 'SeedPlan':
+        counts = {name: max(1, round(count * scale)) for name, count in BASE_COUNTS.items()}
+        counts.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**counts)
+
+    def size(self, table: str) -> int:
+        '''Number of units a table is generated in; several rows per unit for association tables'''
+
+        return {
+            'users': self.users,
+            'organizations': self.organizations,
+            'permissions': len(PERMISSION_NAMES),
+            'roles': self.organizations * self.roles_per_org,
+            'profiles': self.users if self.profiles else 0,
+            'blogs': self.blogs if self.users else 0,
+            'jobs': self.jobs if self.users else 0,
+            'user_organization': self.users if self.organizations else 0,
+            'user_role': self.users if self.organizations else 0,
+            'role_permission': self.organizations * self.roles_per_org,
+        }[table]
+
+
+def make_id(seed: int, kind: str, index: int) -> str:
+    '''A uuid7 whose timestamp is the row index and whose random bits hash (seed, kind, index)'''
+
+    digest = int.from_bytes(hashlib.blake2b(f'{seed}:{kind}:{index}'.encode(), digest_size=10).digest(), 'big')
+    rand_a, rand_b = digest >> 68, digest & ((1 << 62) - 1)
+    value = ((ID_EPOCH_MS + index) << 80) | (0x7 << 76) | (rand_a << 64) | (0b10 << 62) | rand_b
+    hex = f'{value:032x}'
+    return f'{hex[:8]}-{hex[8:12]}-{hex[12:16]}-{hex[16:20]}-{hex[20:]}'
+
+
+def pick(seed: int, kind: str, index: int, count: int) -> int:
+    '''A deterministic number in range(count) for the given row'''
+
+    return int.from_bytes(hashlib.blake2b(f'{seed}:{kind}:{index}'.encode(), digest_size=8).digest(), 'big') % count
+
+
+def username(index: int) -> str:
+    return f'user{index}'
+
+
+def password(index: int, pool: int = 8) -> str:
+    return f'Seed{index % pool}@password'
+
+
+def memberships(plan: SeedPlan, user: int) -> List[Tuple[int, int]]:
+    '''The (organization, role within it) pairs a user belongs to'''
+
+    rng = random.Random(f'{plan.seed}:membership:{user}')
+    organizations = rng.sample(range(plan.organizations), min(plan.memberships_per_user, plan.organizations))
+    return [(organization, rng.randrange(plan.roles_per_org)) for organization in organizations]
+
+
+def generate(plan: SeedPlan, table: str, start: int, stop: int) -> Iterator[tuple]:
+    seed = plan.seed
+
+    if table == 'users':
+        for i in range(start, stop):
+            name = username(i)
+            yield (
+                make_id(seed, 'user', i), name, f'{name}@example.com', plan.password_hashes[i % plan.password_pool],
+                FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)],
+                True, False, False, 0,
+            )
+
+    elif table == 'organizations':
+        for i in range(start, stop):
+            yield make_id(seed, 'organization', i), f'Organization {i}', f'Synthetic organization number {i}'
+
+    elif table == 'permissions':
+        for i in range(start, stop):
+            yield make_id(seed, 'permission', i), PERMISSION_NAMES[i]
+
+    elif table == 'roles':
+        for i in range(start, stop):
+            # Every organization gets the same role names; they are only unique within one
+            organization, j = divmod(i, plan.roles_per_org)
+            name = ROLE_NAMES[j] if j < len(ROLE_NAMES) else f'role{j}'
+            yield make_id(seed, 'role', i), name, make_id(seed, 'organization', organization), True
+
+    elif table == 'profiles':
+        for i in range(start, stop):
+            yield make_id(seed, 'profile', i), make_id(seed, 'user', i), f'Bio of {username(i)}', f'+2348{i:09d}'
+
+    elif table == 'blogs':
+        for i in range(start, stop):
+            author = pick(seed, 'blog', i, plan.users)
+            tags = sorted({TAGS[pick(seed, 'tag', i * 2 + n, len(TAGS))] for n in range(2)})
+            yield (
+                make_id(seed, 'blog', i), make_id(seed, 'user', author), f'Blog post {i}',
+                f'Synthetic content for blog post {i}. ' * 5, '{' + ','.join(tags) + '}', False, f'Excerpt of post {i}',
+            )
+
+    elif table == 'jobs':
+        for i in range(start, stop):
+            poster = pick(seed, 'job', i, plan.users)
+            yield (
+                make_id(seed, 'job', i), make_id(seed, 'user', poster), f'Engineer {i}', f'Synthetic job posting {i}',
+                CITIES[i % len(CITIES)], f'{30000 + pick(seed, "salary", i, 120) * 1000}.00',
+                JOB_TYPES[i % len(JOB_TYPES)], f'Organization {pick(seed, "company", i, max(plan.organizations, 1))}',
+            )
+
+    elif table == 'user_organization':
+        for i in range(start, stop):
+            for organization, _ in memberships(plan, i):
+                yield make_id(seed, 'user', i), make_id(seed, 'organization', organization)
+
+    elif table == 'user_role':
+        for i in range(start, stop):
+            for organization, j in memberships(plan, i):
+                yield make_id(seed, 'user', i), make_id(seed, 'role', organization * plan.roles_per_org + j)
+
+    elif table == 'role_permission':
+        for i in range(start, stop):
+            rng = random.Random(f'{seed}:role_permission:{i}')
+            for permission in rng.sample(range(len(PERMISSION_NAMES)), min(plan.permissions_per_role, len(PERMISSION_NAMES))):
+                yield make_id(seed, 'role', i), make_id(seed, 'permission', permission)
+
+
+COLUMNS = {
+    'users': ('id', 'username', 'email', 'password', 'first_name', 'last_name', 'is_active', 'is_admin', 'is_deleted', 'permission_version'),
+    'organizations': ('id', 'name', 'description'),
+    'permissions': ('id', 'name'),
+    'roles': ('id', 'role_name', 'organization_id', 'is_active'),
+    'profiles': ('id', 'user_id', 'bio', 'phone_number'),
+    'blogs': ('id', 'author_id', 'title', 'content', 'tags', 'is_deleted', 'excerpt'),
+    'jobs': ('id', 'user_id', 'title', 'description', 'location', 'salary', 'job_type', 'company_name'),
+    'user_organization': ('user_id', 'organization_id'),
+    'user_role': ('user_id', 'role_id'),
+    'role_permission': ('role_id', 'permission_id'),
+}
+
+# Tables in a phase only reference tables loaded in earlier phases
+PHASES = (
+    ('users', 'organizations', 'permissions'),
+    ('roles', 'profiles', 'blogs', 'jobs', 'user_organization'),
+    ('user_role', 'role_permission'),
+)
+
+
+def hash_password(args: Tuple[str, int]) -> str:
+    secret, rounds = args
+    return get_crypt_context(rounds).hash(secret)
+
+
+# One engine per worker process, reused across its chunks
+_engines = {}
+
+
+def copy_chunk(database_url: str, plan: SeedPlan, table: str, start: int, stop: int) -> int:
+    '''Generates a chunk and streams it into Postgres with COPY; runs in a worker process'''
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = 0
+    for row in generate(plan, table, start, stop):
+        writer.writerow(row)
+        rows += 1
+    buffer.seek(0)
+
+    if database_url not in _engines:
+        _engines[database_url] = create_engine(database_url, pool_size=1)
+
+    connection = _engines[database_url].raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {table} ({", ".join(COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)', buffer)
+        connection.commit()
+    finally:
+        connection.close()
+
+    return rows
+
+
+def generate_chunk(plan: SeedPlan, table: str, start: int, stop: int) -> list:
+    '''Generates a chunk for the parent to insert; runs in a worker process'''
+
+    return list(generate(plan, table, start, stop))
+
+
+def chunks(size: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size)
+
+
+def run_bounded(pool: ProcessPoolExecutor, tasks: Iterator[tuple], limit: int) -> Iterator[tuple]:
+    '''Submits (table, func, *args) tasks keeping at most limit in flight, and
+    yields (table, result) in submission order, so generated rows never pile up'''
+
+    pending = deque()
+    for table, func, *args in tasks:
+        if len(pending) >= limit:
+            done_table, future = pending.popleft()
+            yield done_table, future.result()
+        pending.append((table, pool.submit(func, *args)))
+
+    while pending:
+        done_table, future = pending.popleft()
+        yield done_table, future.result()
+
+
+def create_schema(engine) -> List[str]:
+    '''Creates every missing table the dialect can express and returns the
+    ones it can't; SQLite has no equivalent for the postgres-only column
+    types a few tables use'''
+
+    skipped = []
+    for table in Base.metadata.sorted_tables:
+        try:
+            table.create(engine, checkfirst=True)
+        except CompileError:
+            skipped.append(table.name)
+    return skipped
+
+
+def seed(database_url: str, plan: SeedPlan, workers: Optional[int] = None, chunk_size: int = 10000, rounds: int = 12, create_tables: bool = False, quiet: bool = False) -> dict:
+    '''Loads everything in plan into the database and returns the rows written per table'''
+
+    engine = create_engine(database_url)
+    if create_tables:
+        create_schema(engine)
+    existing = set(inspect(engine).get_table_names())
+    use_copy = make_url(database_url).get_backend_name() == 'postgresql'
+    workers = workers or os.cpu_count()
+
+    written, started = {}, time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        secrets = [(password(index, plan.password_pool), rounds) for index in range(plan.password_pool)]
+        plan = replace(plan, password_hashes=tuple(pool.map(hash_password, secrets)))
+
+        for phase in PHASES:
+            tables = [table for table in phase if table in existing]
+            for table in set(phase) - existing:
+                if not quiet:
+                    print(f'Skipping {table}: the table does not exist in this database')
+
+            if use_copy:
+                tasks = (
+                    (table, copy_chunk, database_url, plan, table, start, stop)
+                    for table in tables for start, stop in chunks(plan.size(table), chunk_size)
+                )
+            else:
+                tasks = (
+                    (table, generate_chunk, plan, table, start, stop)
+                    for table in tables for start, stop in chunks(plan.size(table), chunk_size)
+                )
+
+            with engine.begin() as connection:
+                for table, result in run_bounded(pool, tasks, workers * 2):
+                    if not use_copy and result:
+                        placeholders = ', '.join('?' for _ in COLUMNS[table])
+                        connection.exec_driver_sql(
+                            f'INSERT INTO {table} ({", ".join(COLUMNS[table])}) VALUES ({placeholders})', result
+                        )
+                    written[table] = written.get(table, 0) + (result if use_copy else len(result))
+
+    engine.dispose()
+
+    if not quiet:
+        elapsed = time.perf_counter() - started
+        for table, rows in written.items():
+            print(f'{table:<20}{rows:>12,}')
+        total = sum(written.values())
+        print(f'{"total":<20}{total:>12,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)')
+
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk seed the database with synthetic data')
+    parser.add_argument('--scale', type=float, default=1, help=f'multiplies the base counts {BASE_COUNTS}')
+    parser.add_argument('--seed', type=int, default=0, help='the same seed and counts always produce the same rows')
+    for name in BASE_COUNTS:
+        parser.add_argument(f'--{name}', type=int, help=f'exact number of {name}, overriding --scale')
+    parser.add_argument('--memberships-per-user', type=int, default=2)
+    parser.add_argument('--roles-per-org', type=int, default=3)
+    parser.add_argument('--permissions-per-role', type=int, default=5)
+    parser.add_argument('--no-profiles', action='store_true', help='skip the one profile per user')
+    parser.add_argument('--password-pool', type=int, default=8, help='distinct passwords, each hashed once')
+    parser.add_argument('--bcrypt-rounds', type=int, help='defaults to BCRYPT_ROUNDS')
+    parser.add_argument('--workers', type=int, help='generator processes, defaults to the CPU count')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--database-url', help="defaults to the app's database")
+    parser.add_argument('--create-schema', action='store_true', help='create missing tables instead of relying on the migrations')
+    args = parser.parse_args()
+
+    from api.db.database import get_db_engine
+    from api.utils.settings import settings
+
+    plan = SeedPlan.scaled(args.scale, **{name: getattr(args, name) for name in BASE_COUNTS})
+    plan = replace(
+        plan,
+        seed=args.seed,
+        profiles=not args.no_profiles,
+        memberships_per_user=args.memberships_per_user,
+        roles_per_org=args.roles_per_org,
+        permissions_per_role=args.permissions_per_role,
+        password_pool=args.password_pool,
+    )
+    database_url = args.database_url or get_db_engine().url.render_as_string(hide_password=False)
+
+    seed(database_url, plan, args.workers, args.chunk_size, args.bcrypt_rounds or settings.BCRYPT_ROUNDS, args.create_schema)
@@ -0,0 +1,131 @@
+import pytest
+import csv
+import gzip
+import io
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.v1.services import export as export_module
+from api.v1.services.user import user_service
+from api.v1.models import User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+EXPORTED = 7
+
+
+def make_user(name, **fields):
+    return User(username=name, email=f'{name}@gmail.com', password='not-a-real-hash', first_name='Export', last_name='User', **fields)
+
+
+@pytest.fixture(scope="module")
+def people():
+    with TestingSessionLocal() as db:
+        db.expire_on_commit = False
+        admin, member = make_user('exportadmin', is_admin=True), make_user('exportmember')
+        users = [make_user(f'exported{index}') for index in range(EXPORTED)] + [make_user('exportdeleted', is_deleted=True)]
+        db.add_all([admin, member, *users])
+        db.commit()
+
+    return admin, member
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    # Spread the users over several server-side cursor batches
+    monkeypatch.setattr(export_module, 'EXPORT_BATCH_SIZE', 3)
+
+
+def export(admin, format='ndjson', gzip=False):
+    headers = {'Authorization': f'Bearer {user_service.create_access_token(user_id=admin.id)}'}
+    return client.get('/api/v1/exports/users', params={'format': format, 'gzip': gzip}, headers=headers)
+
+
+def exported_users(rows):
+    return {row['username']: row for row in rows if row['username'].startswith('export')}
+
+
+def test_ndjson_export(people):
+    admin, _ = people
+
+    response = export(admin)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert response.headers['content-disposition'] == 'attachment; filename="users.ndjson"'
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    users = exported_users(rows)
+
+    assert len(rows) == len({row['id'] for row in rows})
+    assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+    assert set(users) == {'exportadmin', 'exportmember', 'exportdeleted', *(f'exported{index}' for index in range(EXPORTED))}
+    assert set(users['exportmember']) == set(export_module.export_service.RESOURCES['users'][1])
+    assert 'password' not in users['exportmember']
+
+
+def test_csv_export(people):
+    admin, _ = people
+
+    response = export(admin, format='csv')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+
+    reader = csv.DictReader(io.StringIO(response.text))
+    assert tuple(reader.fieldnames) == export_module.export_service.RESOURCES['users'][1]
+
+    users = exported_users(reader)
+    assert len(users) == EXPORTED + 3
+    assert users['exportadmin']['is_admin'] == 'True'
+    assert users['exportmember']['email'] == 'exportmember@gmail.com'
+
+
+def test_export_includes_deleted_rows(people):
+    admin, _ = people
+
+    users = exported_users(json.loads(line) for line in export(admin).text.splitlines())
+    assert users['exportdeleted']['is_deleted'] is True
+    assert users['exportmember']['is_deleted'] is False
+
+
+@pytest.mark.parametrize('format', ['ndjson', 'csv'])
+def test_gzip_round_trip(people, format):
+    admin, _ = people
+
+    plain = export(admin, format=format)
+    compressed = export(admin, format=format, gzip=True)
+
+    assert compressed.headers['content-type'] == 'application/gzip'
+    assert compressed.headers['content-disposition'] == f'attachment; filename="users.{format}.gz"'
+    assert gzip.decompress(compressed.content) == plain.content
+
+
+def test_empty_table_csv_is_just_the_header():
+    chunks = export_module.export_service.encode_csv(('id', 'email'), iter([]))
+    assert b''.join(chunks) == b'id,email\r\n'
+
+
+def test_export_requires_an_admin(people):
+    admin, member = people
+
+    assert export(member).status_code == 403
+    assert client.get('/api/v1/exports/users').status_code == 401
+
+    headers = {'Authorization': f'Bearer {user_service.create_access_token(user_id=admin.id)}'}
+    assert client.get('/api/v1/exports/passwords', headers=headers).status_code == 404
@@ -0,0 +1,104 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api.v1.services.user import user_service
+from api.v1.models import User, Organization, Profile, Role
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+USERS = 30
+
+
+@pytest.fixture(scope="module", autouse=True)
+def members():
+    db = TestingSessionLocal()
+
+    organization = Organization(name='Profile Org')
+    role = Role(role_name='member', organization=organization)
+    users = [
+        User(
+            username=f'loaderuser{index}',
+            email=f'loaderuser{index}@gmail.com',
+            password='not-a-real-hash',
+            first_name='Loader',
+            last_name='User',
+            profile=Profile(bio=f'Bio {index}'),
+            organizations=[organization],
+            roles=[role],
+        )
+        for index in range(USERS)
+    ]
+    db.add_all(users)
+    db.commit()
+    db.close()
+
+
+@pytest.fixture
+def count_queries():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', count)
+
+
+@pytest.mark.parametrize('profile, queries', [('summary', 1), ('with_profile', 1), ('with_orgs_and_roles', 3)])
+def test_page_costs_a_fixed_number_of_queries(profile, queries, count_queries):
+    with TestingSessionLocal() as db:
+        page = user_service.fetch_all(db, limit=100, profile=profile, first_name='Loader')
+        serialized = [user_service.serialize(user, profile) for user in page['items']]
+
+    assert len(serialized) == USERS
+    assert len(count_queries) == queries
+
+
+def test_serialize_includes_only_the_profiles_relationships():
+    with TestingSessionLocal() as db:
+        user = user_service.fetch_all(db, profile='with_orgs_and_roles', username='loaderuser1')['items'][0]
+        data = user_service.serialize(user, 'with_orgs_and_roles')
+
+        assert 'password' not in data
+        assert 'profile' not in data
+        assert [organization['name'] for organization in data['organizations']] == ['Profile Org']
+        assert [role['role_name'] for role in data['roles']] == ['member']
+
+        # Relationships outside the profile raise rather than lazy loading
+        with pytest.raises(InvalidRequestError):
+            user.profile
+
+
+def test_fetch_with_profile():
+    with TestingSessionLocal() as db:
+        user_id = user_service.fetch_by_username(db, 'loaderuser2').id
+
+    with TestingSessionLocal() as db:
+        data = user_service.serialize(user_service.fetch(db, user_id, profile='with_profile'), 'with_profile')
+
+    assert data['profile']['bio'] == 'Bio 2'
+    assert data['username'] == 'loaderuser2'
+
+
+def test_unknown_profile():
+    with TestingSessionLocal() as db:
+        with pytest.raises(HTTPException) as exc:
+            user_service.fetch_all(db, profile='everything')
+
+    assert exc.value.status_code == 400
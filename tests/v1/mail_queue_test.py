@@ -0,0 +1,110 @@
+import asyncio
+import socket
+import pytest
+from aiosmtpd.controller import Controller
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api.core.dependencies.email import MailConfig, MailQueue
+
+
+class RecordingHandler:
+    '''aiosmtpd handler standing in for the SMTP server'''
+
+    def __init__(self, refuse: str = None):
+        self.messages = []
+        self.refuse = refuse
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == self.refuse:
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler(refuse='nobody@example.com')
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def make_queue(port, dead_letters, **options):
+    async def dead_letter(failures):
+        dead_letters.extend(failures)
+
+    config = MailConfig(host='127.0.0.1', port=port, from_addr='noreply@example.com', security='none', **options)
+    return MailQueue(config=config, dead_letter=dead_letter)
+
+
+@pytest.mark.asyncio
+async def test_messages_delivered_in_background(smtp_server):
+    controller, handler = smtp_server
+    dead_letters = []
+    queue = make_queue(controller.port, dead_letters, workers=2, batch_size=5)
+
+    await queue.start()
+    for i in range(12):
+        queue.enqueue(to=f'user{i}@example.com', subject='Hello', body=f'Message {i}')
+    await queue.stop()
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == sorted(f'user{i}@example.com' for i in range(12))
+    assert dead_letters == []
+
+
+@pytest.mark.asyncio
+async def test_refused_recipient_is_dead_lettered(smtp_server):
+    controller, handler = smtp_server
+    dead_letters = []
+    queue = make_queue(controller.port, dead_letters)
+
+    await queue.start()
+    queue.enqueue(to='nobody@example.com', subject='Hello', body='Bounce')
+    queue.enqueue(to='somebody@example.com', subject='Hello', body='Delivered')
+    await queue.stop()
+
+    assert [envelope.rcpt_tos[0] for envelope in handler.messages] == ['somebody@example.com']
+    assert [(message.to, message.attempts) for message, _ in dead_letters] == [('nobody@example.com', 1)]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_server_retries_then_dead_letters():
+    dead_letters = []
+    queue = make_queue(free_port(), dead_letters, max_attempts=3, retry_backoff=0.01)
+
+    await queue.start()
+    queue.enqueue(to='user@example.com', subject='Hello', body='Never sent')
+    await asyncio.sleep(0.5)
+    await queue.stop()
+
+    assert len(dead_letters) == 1
+    message, error = dead_letters[0]
+    assert message.attempts == 3
+    assert 'ConnectionRefusedError' in error
+
+
+@pytest.mark.asyncio
+async def test_enqueue_from_threadpool(smtp_server):
+    controller, handler = smtp_server
+    queue = make_queue(controller.port, [])
+
+    await queue.start()
+    await asyncio.to_thread(queue.enqueue, to='thread@example.com', subject='Hello', body='From a sync route')
+    await queue.stop()
+
+    assert [envelope.rcpt_tos[0] for envelope in handler.messages] == ['thread@example.com']
@@ -0,0 +1,77 @@
+import threading
+from fastapi.testclient import TestClient
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.utils.metrics import MetricsRegistry
+
+client = TestClient(app)
+
+
+def test_counter_keeps_every_update_across_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs', 'Jobs run', ('queue',))
+
+    def work():
+        for _ in range(10000):
+            counter.inc('default')
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.values() == {('default',): 80000}
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    registry.gauge('in_flight', 'Requests in flight').inc()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1))
+    histogram.observe(0.05, '/a"b')
+    histogram.observe(0.5, '/a"b')
+
+    @registry.collector
+    def queue_depth():
+        yield 'queue_depth', 'gauge', 'Queued jobs', [('', {}, 3)]
+
+    assert registry.render().splitlines() == [
+        '# HELP in_flight Requests in flight',
+        '# TYPE in_flight gauge',
+        'in_flight 1',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 2',
+        'latency_seconds_sum{route="/a\\"b"} 0.55',
+        'latency_seconds_count{route="/a\\"b"} 2',
+        '# HELP queue_depth Queued jobs',
+        '# TYPE queue_depth gauge',
+        'queue_depth 3',
+    ]
+
+
+def test_metrics_endpoint():
+    client.get('/api/v1/plans')
+    client.get('/api/v1/users/does-not-exist')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/plans"}' in body
+    assert 'http_requests_total{method="GET",route="/api/v1/plans",status="200"}' in body
+    assert 'does-not-exist' not in body
+    assert 'http_requests_in_flight 1' in body
+    assert 'password_hash_pending 0' in body
+    assert 'mail_queue_pending 0' in body
+    assert 'cache_hit_ratio{cache="user"}' in body
+    assert '# TYPE db_pool_wait_seconds histogram' in body
@@ -0,0 +1,171 @@
+import asyncio
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import create_engine, make_url, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api.core.dependencies.email import MailConfig
+from api.v1.models.newsletter import Newsletter, NewsletterBroadcast
+from api.v1.models.base import Base
+from api.v1.services.newsletter import NewsletterBroadcaster
+from tests.v1.mail_queue_test import RecordingHandler, free_port
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture(scope="module")
+def subscribers():
+    db = TestingSessionLocal()
+    db.add_all([Newsletter(email=f'broadcast{i}@example.com') for i in range(25)])
+    db.commit()
+
+    emails = [email for (email,) in db.query(Newsletter.email).order_by(Newsletter.id)]
+    yield db, emails
+    db.close()
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+class FlakyHandler(RecordingHandler):
+    '''Turns away the first attempt at every message with a temporary error'''
+
+    def __init__(self):
+        super().__init__()
+        self.attempted = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        recipient = envelope.rcpt_tos[0]
+        if recipient not in self.attempted:
+            self.attempted.add(recipient)
+            return '451 Try again later'
+        return await super().handle_DATA(server, session, envelope)
+
+
+def make_broadcaster(port, **options):
+    options = {'chunk_size': 7, 'concurrency': 3, 'rate_limit': 0, 'lease_seconds': 60, **options}
+    broadcaster = NewsletterBroadcaster(
+        mail_config=MailConfig(host='127.0.0.1', port=port, from_addr='news@example.com', security='none', retry_backoff=0.01),
+        session_factory=TestingAsyncSessionLocal,
+        **options,
+    )
+    broadcaster.configure()
+    return broadcaster
+
+
+def add_broadcast(db, **values):
+    values = {'sent_count': 0, 'failed_count': 0, **values}
+    broadcast = NewsletterBroadcast(subject='Issue 1', body='Hello readers', **values)
+    db.add(broadcast)
+    db.commit()
+    return broadcast.id
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_every_subscriber_once(subscribers, smtp_server):
+    db, emails = subscribers
+    controller, handler = smtp_server
+    broadcast_id = add_broadcast(db, status='pending')
+
+    await make_broadcaster(controller.port).run(broadcast_id)
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == sorted(emails)
+
+    db.expire_all()
+    broadcast = db.get(NewsletterBroadcast, broadcast_id)
+    assert broadcast.status == 'completed'
+    assert broadcast.sent_count == len(emails)
+    assert broadcast.last_sent_id == db.query(func.max(Newsletter.id)).scalar()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_checkpoint(subscribers, smtp_server):
+    db, emails = subscribers
+    controller, handler = smtp_server
+    ids = [id for (id,) in db.query(Newsletter.id).order_by(Newsletter.id)]
+    broadcast_id = add_broadcast(db, status='running', last_sent_id=ids[9], sent_count=10)
+
+    await make_broadcaster(controller.port).run(broadcast_id)
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == sorted(emails[10:])
+
+    db.expire_all()
+    assert db.get(NewsletterBroadcast, broadcast_id).sent_count == len(emails)
+
+
+@pytest.mark.asyncio
+async def test_leased_broadcast_is_not_claimed_twice(subscribers, smtp_server):
+    db, emails = subscribers
+    controller, handler = smtp_server
+    broadcast_id = add_broadcast(db, status='running', heartbeat_at=func.now())
+
+    await make_broadcaster(controller.port).run(broadcast_id)
+
+    assert handler.messages == []
+
+
+@pytest.mark.asyncio
+async def test_broadcast_stops_when_its_lease_is_taken_over(subscribers, smtp_server):
+    db, emails = subscribers
+    controller, handler = smtp_server
+    broadcast_id = add_broadcast(db, status='pending')
+
+    # Ten messages a second over one connection, heartbeating every 0.1s
+    broadcaster = make_broadcaster(controller.port, concurrency=1, rate_limit=10, lease_seconds=0.3)
+    running = asyncio.create_task(broadcaster.run(broadcast_id))
+
+    await asyncio.sleep(0.25)
+    db.query(NewsletterBroadcast).filter_by(id=broadcast_id).update({'lease_token': 'another-worker'})
+    db.commit()
+
+    await asyncio.wait_for(running, timeout=5)
+
+    assert 0 < len(handler.messages) < 7
+
+    db.expire_all()
+    broadcast = db.get(NewsletterBroadcast, broadcast_id)
+    assert (broadcast.status, broadcast.last_sent_id, broadcast.sent_count) == ('running', None, 0)
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried(subscribers):
+    db, emails = subscribers
+    handler = FlakyHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+
+    try:
+        broadcast_id = add_broadcast(db, status='pending')
+        await make_broadcaster(controller.port).run(broadcast_id)
+    finally:
+        controller.stop()
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == sorted(emails)
+
+    db.expire_all()
+    broadcast = db.get(NewsletterBroadcast, broadcast_id)
+    assert (broadcast.status, broadcast.sent_count, broadcast.failed_count) == ('completed', len(emails), 0)
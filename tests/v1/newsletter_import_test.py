@@ -0,0 +1,108 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.db.database import get_db, get_async_db
+from api.v1.services.user import user_service
+from api.v1.models.newsletter import Newsletter
+from api.v1.models.user import User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    db = TestingSessionLocal()
+    admin = User(
+        username="importadmin",
+        email="importadmin@gmail.com",
+        password=user_service.hash_password('Testpassword@123'),
+        first_name='Import',
+        last_name='Admin',
+        is_active=True,
+        is_admin=True
+    )
+    db.add(admin)
+    db.commit()
+    db.refresh(admin)
+
+    access_token = user_service.create_access_token(user_id=admin.id)
+    yield {'Authorization': f'Bearer {access_token}'}
+    db.close()
+
+
+def test_csv_import_counts(admin_headers):
+    '''Rows are inserted once, with repeats and bad addresses counted separately'''
+
+    upload = "name,email\n" + "".join(f"Reader,import{i}@gmail.com\n" for i in range(5))
+    upload += "Reader,not-an-email\nReader,import0@gmail.com\n"
+
+    response = client.post('/api/v1/pages/newsletter/import', content=upload.encode(),
+        headers={**admin_headers, 'Content-Type': 'text/csv'})
+
+    assert response.status_code == 200
+    assert response.json()['data'] == {'inserted': 5, 'duplicate': 1, 'invalid': 1}
+
+    db = TestingSessionLocal()
+    assert db.query(Newsletter).filter(Newsletter.email.like('import%@gmail.com')).count() == 5
+    db.close()
+
+
+def test_ndjson_import_skips_existing(admin_headers):
+    upload = '{"email": "import0@gmail.com"}\n{"email": "ndjson@gmail.com"}\nnot json\n'
+
+    response = client.post('/api/v1/pages/newsletter/import', content=upload.encode(),
+        headers={**admin_headers, 'Content-Type': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.json()['data'] == {'inserted': 1, 'duplicate': 1, 'invalid': 1}
+
+
+def test_import_rejections(admin_headers):
+    no_header = client.post('/api/v1/pages/newsletter/import', content=b"name\nReader\n",
+        headers={**admin_headers, 'Content-Type': 'text/csv'})
+    assert no_header.status_code == 400
+
+    wrong_type = client.post('/api/v1/pages/newsletter/import', content=b"x",
+        headers={**admin_headers, 'Content-Type': 'text/plain'})
+    assert wrong_type.status_code == 415
+
+    unauthorized = client.post('/api/v1/pages/newsletter/import', content=b"email\n",
+        headers={'Content-Type': 'text/csv'})
+    assert unauthorized.status_code == 401
@@ -0,0 +1,211 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.v1.services.organization import organization_service
+from api.v1.services.permission import permission_service
+from api.v1.services.user import user_service
+from api.v1.models import User, Organization, Role, Permission
+from api.v1.models.base import Base, user_role_association
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+MEMBERS = 250
+
+
+def make_user(name, **fields):
+    return User(username=name, email=f'{name}@gmail.com', password='not-a-real-hash', first_name='Org', last_name='Member', **fields)
+
+
+def auth(user):
+    return {'Authorization': f'Bearer {user_service.create_access_token(user_id=user.id)}'}
+
+
+@pytest.fixture(scope="module")
+def people():
+    db = TestingSessionLocal()
+    db.expire_on_commit = False
+
+    owner, outsider, admin = make_user('orgowner'), make_user('orgoutsider'), make_user('orgadmin', is_admin=True)
+    members = [make_user(f'orgmember{index:03}') for index in range(MEMBERS)]
+    db.add_all([owner, outsider, admin, *members])
+    db.commit()
+
+    yield db, owner, outsider, admin, members
+    db.close()
+
+
+@pytest.fixture(scope="module")
+def organization_id(people):
+    db, owner, *_ = people
+
+    response = client.post('/api/v1/organizations', json={'name': 'Big Tenant', 'description': 'Lots of members'}, headers=auth(owner))
+    assert response.status_code == 201
+    # The creator manages the organization through the owner role it is given
+    return response.json()['data']['id']
+
+
+def test_create_get_and_list_organizations(people, organization_id):
+    db, owner, outsider, admin, _ = people
+
+    response = client.get(f'/api/v1/organizations/{organization_id}', headers=auth(owner))
+    assert response.status_code == 200
+    assert response.json()['data']['name'] == 'Big Tenant'
+
+    mine = client.get('/api/v1/organizations', headers=auth(owner)).json()['data']
+    assert [item['id'] for item in mine['items']] == [organization_id]
+
+    assert client.get(f'/api/v1/organizations/{organization_id}', headers=auth(outsider)).status_code == 403
+    assert client.get(f'/api/v1/organizations/{organization_id}', headers=auth(admin)).status_code == 200
+    assert client.get('/api/v1/organizations/missing', headers=auth(owner)).status_code == 404
+
+
+def test_creator_can_manage_a_new_organization(people):
+    db, _, outsider, *_ = people
+    creator = make_user('orgcreator')
+    db.add(creator)
+    db.commit()
+
+    # Cached permissions from before the organization existed must not hide the owner role
+    assert not permission_service.has_permission(db, creator.id, 'organization:update')
+
+    response = client.post('/api/v1/organizations', json={'name': 'Self Serve', 'description': 'No admin involved'}, headers=auth(creator))
+    assert response.status_code == 201
+    organization_id = response.json()['data']['id']
+
+    owner_role = db.scalar(select(Role).where(Role.organization_id == organization_id))
+    assert owner_role.role_name == 'owner'
+    assert {permission.name for permission in owner_role.permissions} == set(organization_service.OWNER_PERMISSIONS)
+    assert [user.id for user in owner_role.users] == [creator.id]
+    assert permission_service.has_permission(db, creator.id, 'organization:update')
+
+    response = client.patch(f'/api/v1/organizations/{organization_id}', json={'name': 'Self Served'}, headers=auth(creator))
+    assert response.status_code == 200
+    assert response.json()['data']['name'] == 'Self Served'
+
+    response = client.post(f'/api/v1/organizations/{organization_id}/members', json={'user_ids': [outsider.id]}, headers=auth(creator))
+    assert response.json()['data']['added'] == 1
+
+    # Membership alone grants nothing, and owning one organization says nothing about another
+    assert client.patch(f'/api/v1/organizations/{organization_id}', json={'name': 'Taken'}, headers=auth(outsider)).status_code == 403
+    response = client.post('/api/v1/organizations', json={'name': 'Outsider Org'}, headers=auth(outsider))
+    assert client.patch(f'/api/v1/organizations/{organization_id}', json={'name': 'Taken'}, headers=auth(outsider)).status_code == 403
+    assert client.patch(f'/api/v1/organizations/{response.json()["data"]["id"]}', json={'name': 'Mine'}, headers=auth(creator)).status_code == 403
+
+    # Owner roles share the permission rows rather than adding new ones per organization
+    assert db.scalar(select(func.count()).select_from(Permission).where(Permission.name == 'organization:delete')) == 1
+
+
+def test_update_needs_permission(people, organization_id):
+    db, owner, outsider, *_ = people
+
+    response = client.patch(f'/api/v1/organizations/{organization_id}', json={'description': 'Updated'}, headers=auth(outsider))
+    assert response.status_code == 403
+
+    response = client.patch(f'/api/v1/organizations/{organization_id}', json={'description': 'Updated'}, headers=auth(owner))
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert (data['name'], data['description']) == ('Big Tenant', 'Updated')
+
+
+def test_update_rejects_null_name(people, organization_id):
+    db, owner, *_ = people
+
+    response = client.patch(f'/api/v1/organizations/{organization_id}', json={'name': None}, headers=auth(owner))
+    assert response.status_code == 422
+
+    # description is nullable, so it can still be cleared
+    response = client.patch(f'/api/v1/organizations/{organization_id}', json={'description': None}, headers=auth(owner))
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert (data['name'], data['description']) == ('Big Tenant', None)
+
+
+def test_bulk_add_members(people, organization_id):
+    db, owner, outsider, admin, members = people
+    user_ids = [member.id for member in members]
+
+    response = client.post(f'/api/v1/organizations/{organization_id}/members', json={'user_ids': user_ids}, headers=auth(outsider))
+    assert response.status_code == 403
+
+    response = client.post(f'/api/v1/organizations/{organization_id}/members', json={'user_ids': user_ids + ['missing', user_ids[0]]}, headers=auth(owner))
+    assert response.status_code == 200
+    assert response.json()['data'] == {'added': MEMBERS, 'already_members': 0, 'missing_user_ids': ['missing']}
+
+    response = client.post(f'/api/v1/organizations/{organization_id}/members', json={'user_ids': user_ids[:10]}, headers=auth(owner))
+    assert response.json()['data'] == {'added': 0, 'already_members': 10, 'missing_user_ids': []}
+
+
+def test_members_are_paged_with_two_queries_per_page(people, organization_id):
+    db, owner, outsider, admin, members = people
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+
+    with TestingSessionLocal() as session:
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            page = organization_service.fetch_members(session, organization_id, limit=100)
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+    assert len(page['items']) == 100
+    assert len(statements) == 2
+
+    seen, cursor = [], None
+    while True:
+        response = client.get(f'/api/v1/organizations/{organization_id}/members', params={'cursor': cursor, 'limit': 100}, headers=auth(owner))
+        assert response.status_code == 200
+        data = response.json()['data']
+        seen.extend(item['id'] for item in data['items'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == sorted([owner.id] + [member.id for member in members])
+    assert all('password' not in item for item in data['items'])
+
+
+def test_bulk_remove_members_drops_their_roles(people, organization_id):
+    db, owner, outsider, admin, members = people
+    leaving = members[:2]
+
+    role = Role(role_name='org reader', organization_id=organization_id, users=leaving)
+    db.add(role)
+    db.commit()
+    versions = {member.id: member.permission_version for member in leaving}
+
+    response = client.post(f'/api/v1/organizations/{organization_id}/members/remove', json={'user_ids': [member.id for member in leaving]}, headers=auth(owner))
+    assert response.status_code == 200
+    assert response.json()['data'] == {'removed': 2}
+
+    assert not db.scalars(select(user_role_association.c.user_id).where(user_role_association.c.role_id == role.id)).all()
+    for member in leaving:
+        db.refresh(member)
+        assert member.permission_version == versions[member.id] + 1
+    assert not organization_service.is_member(db, organization_id, leaving[0].id)
+
+
+def test_delete_organization(people, organization_id):
+    db, owner, outsider, admin, members = people
+
+    assert client.delete(f'/api/v1/organizations/{organization_id}', headers=auth(members[-1])).status_code == 403
+    assert client.delete(f'/api/v1/organizations/{organization_id}', headers=auth(owner)).status_code == 200
+
+    assert client.get(f'/api/v1/organizations/{organization_id}', headers=auth(admin)).status_code == 404
+    assert db.scalar(select(Organization).where(Organization.id == organization_id)) is None
@@ -0,0 +1,97 @@
+import pytest
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, clamp_page_size
+from api.v1.services.user import user_service
+from api.v1.models import User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+USERS = 5
+
+
+@pytest.fixture(scope="module")
+def user_ids():
+    db = TestingSessionLocal()
+    users = [
+        User(username=f'pageuser{index}', email=f'pageuser{index}@gmail.com', password='not-a-real-hash', first_name='Pager', last_name='User')
+        for index in range(USERS)
+    ]
+    db.add_all(users)
+    db.commit()
+
+    yield sorted(user.id for user in users)
+    db.close()
+
+
+def fetch_pager_page(cursor=None, limit=2):
+    with TestingSessionLocal() as db:
+        page = user_service.fetch_all(db, cursor=cursor, limit=limit, first_name='Pager')
+    return [user.id for user in page['items']], page['next_cursor']
+
+
+def test_pages_end_without_a_next_cursor(user_ids):
+    seen, pages, cursor = [], 0, None
+    while True:
+        ids, cursor = fetch_pager_page(cursor)
+        seen.extend(ids)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert seen == user_ids
+    assert pages == 3
+
+    # A last page that is exactly full still has no next page
+    ids, cursor = fetch_pager_page(limit=USERS)
+    assert (ids, cursor) == (user_ids, None)
+
+
+def test_tampered_cursors(user_ids):
+    for cursor in ('not-a-cursor', "' OR 1=1 --", user_ids[0] + 'x'):
+        with pytest.raises(HTTPException) as exc:
+            fetch_pager_page(cursor)
+        assert exc.value.status_code == 400
+
+    # Any spelling of an id resumes from the same place
+    assert fetch_pager_page(user_ids[1].upper())[0] == user_ids[2:4]
+    assert fetch_pager_page(UUID(user_ids[1]).hex)[0] == user_ids[2:4]
+
+    # An id after every row is simply an empty last page
+    assert fetch_pager_page('ffffffff-ffff-7fff-bfff-ffffffffffff') == ([], None)
+
+
+def test_only_whitelisted_columns_can_be_searched():
+    with TestingSessionLocal() as db:
+        with pytest.raises(HTTPException) as exc:
+            user_service.fetch_all(db, password='secret')
+
+    assert exc.value.status_code == 400
+    assert exc.value.detail == 'Cannot filter by password'
+
+
+@pytest.mark.parametrize('limit, expected', [
+    (None, DEFAULT_PAGE_SIZE),
+    (0, DEFAULT_PAGE_SIZE),
+    (-5, DEFAULT_PAGE_SIZE),
+    (1, 1),
+    (MAX_PAGE_SIZE, MAX_PAGE_SIZE),
+    (MAX_PAGE_SIZE + 1, MAX_PAGE_SIZE),
+])
+def test_clamp_page_size(limit, expected):
+    assert clamp_page_size(limit) == expected
@@ -0,0 +1,131 @@
+import pytest
+import asyncio
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.core.dependencies.hashing import PasswordHasher, get_crypt_context, password_hasher
+from api.db.database import get_async_db
+from api.utils.settings import get_settings
+from api.v1.models import User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+PASSWORD = 'Testpassword@123'
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app_sessions():
+    original = dict(app.dependency_overrides)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(original)
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_pending=4, rounds=4)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_round_trip(hasher):
+    async def run():
+        hash = await hasher.hash(PASSWORD)
+        return hash, await hasher.verify_and_update(PASSWORD, hash), await hasher.verify_and_update('wrong', hash)
+
+    hash, valid, invalid = asyncio.run(run())
+
+    assert hash.startswith('$2b$04$')
+    assert valid == (True, None)
+    assert invalid == (False, None)
+    assert hasher.pending == 0
+
+
+def test_other_work_factor_is_rehashed(hasher):
+    legacy = get_crypt_context(5).hash(PASSWORD)
+
+    is_valid, new_hash = asyncio.run(hasher.verify_and_update(PASSWORD, legacy))
+
+    assert is_valid
+    assert new_hash.startswith('$2b$04$')
+    assert get_crypt_context(4).verify(PASSWORD, new_hash)
+
+
+def test_saturated_pool_is_a_503(hasher):
+    hasher.max_pending = 1
+
+    async def run():
+        # The first call holds the only slot while it waits on the pool
+        return await asyncio.gather(hasher.hash(PASSWORD), hasher.hash(PASSWORD), return_exceptions=True)
+
+    hashed, shed = asyncio.run(run())
+
+    assert hashed.startswith('$2b$04$')
+    assert isinstance(shed, HTTPException)
+    assert shed.status_code == 503
+    assert shed.headers == {'Retry-After': '1'}
+    assert hasher.pending == 0
+
+    hasher.max_pending = 0
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(hasher.hash(PASSWORD))
+    assert exc.value.status_code == 503
+
+
+def test_login_upgrades_a_legacy_hash(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'LOGIN_RATE_LIMIT_IP', 0)
+    monkeypatch.setattr(get_settings(), 'LOGIN_RATE_LIMIT_USERNAME', 0)
+    monkeypatch.setattr(password_hasher, 'rounds', 5)
+
+    with TestingSessionLocal() as db:
+        user = User(username='legacyhash', email='legacyhash@gmail.com', password=get_crypt_context(4).hash(PASSWORD), first_name='Legacy', last_name='Hash')
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    def login(password=PASSWORD):
+        return client.post('/api/v1/auth/login', data={'username': 'legacyhash', 'password': password})
+
+    assert login('wrong').status_code == 400
+    with TestingSessionLocal() as db:
+        assert db.get(User, user_id).password.startswith('$2b$04$')
+
+    assert login().status_code == 200
+    with TestingSessionLocal() as db:
+        upgraded = db.get(User, user_id).password
+    assert upgraded.startswith('$2b$05$')
+
+    # The upgraded hash keeps working and is not rewritten again
+    assert login().status_code == 200
+    with TestingSessionLocal() as db:
+        assert db.get(User, user_id).password == upgraded
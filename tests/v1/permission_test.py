@@ -0,0 +1,153 @@
+import pytest
+from fastapi import APIRouter, Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.db.database import get_db
+from api.utils.dependencies import require_permission
+from api.v1.services.permission import permission_service
+from api.v1.services.user import user_service
+from api.v1.models import User, Organization, Role, Permission
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+protected = APIRouter()
+
+@protected.get('/permission-test/{org_id}', dependencies=[Depends(require_permission('job:create'))])
+def permission_test_route(org_id: str):
+    return {'org_id': org_id}
+
+app.include_router(protected)
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def rbac():
+    db = TestingSessionLocal()
+
+    organization = Organization(name='RBAC Org')
+    other_organization = Organization(name='Other Org')
+    create, delete = Permission(name='job:create'), Permission(name='job:delete')
+    member = User(
+        username="rbacuser",
+        email="rbacuser@gmail.com",
+        password=user_service.hash_password('Testpassword@123'),
+        first_name='Rbac',
+        last_name='User',
+        is_active=True,
+        is_admin=False
+    )
+    role = Role(role_name='recruiter', organization=organization, permissions=[create])
+    other_role = Role(role_name='other', organization=other_organization, permissions=[delete])
+    member.roles = [role, other_role]
+    db.add_all([organization, other_organization, create, delete, member, role, other_role])
+    db.commit()
+
+    yield db, member, organization, role
+    db.close()
+
+
+def count_queries(db, func):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return result, len(statements)
+
+
+def test_permissions_resolved_in_one_query_and_cached(rbac):
+    db, member, organization, role = rbac
+    member_id, organization_id = member.id, organization.id
+
+    permissions, queries = count_queries(db, lambda: permission_service.load_permissions(db, member_id))
+    assert permissions == frozenset({'job:create', 'job:delete'})
+    assert queries == 1
+
+    assert permission_service.get_permissions(db, member_id, organization_id) == frozenset({'job:create'})
+    _, queries = count_queries(db, lambda: permission_service.get_permissions(db, member_id, organization_id))
+    assert queries == 0
+
+
+def test_role_change_invalidates_cache(rbac):
+    db, member, organization, role = rbac
+
+    assert permission_service.has_permission(db, member.id, 'job:create', organization.id)
+
+    role.permissions = []
+    permission_service.bump_permission_version(db, role_ids=[role.id])
+    db.commit()
+
+    assert not permission_service.has_permission(db, member.id, 'job:create', organization.id)
+
+    role.permissions = db.query(Permission).filter(Permission.name == 'job:create').all()
+    permission_service.bump_permission_version(db, user_ids=[member.id])
+    db.commit()
+
+    assert permission_service.has_permission(db, member.id, 'job:create', organization.id)
+
+
+def test_require_permission(rbac):
+    db, member, organization, role = rbac
+    headers = {'Authorization': f'Bearer {user_service.create_access_token(user_id=member.id)}'}
+
+    allowed = client.get(f'/permission-test/{organization.id}', headers=headers)
+    assert allowed.status_code == 200
+
+    other_organization = db.query(Organization).filter(Organization.name == 'Other Org').first()
+    forbidden = client.get(f'/permission-test/{other_organization.id}', headers=headers)
+    assert forbidden.status_code == 403
+
+    unauthorized = client.get(f'/permission-test/{organization.id}')
+    assert unauthorized.status_code == 401
+
+
+def test_principal_follows_the_users_row(rbac):
+    db, *_ = rbac
+    admin = User(username='rbacadmin', email='rbacadmin@gmail.com', password='not-a-real-hash', first_name='Rbac', last_name='Admin', is_admin=True)
+    db.add(admin)
+    db.commit()
+    headers = {'Authorization': f'Bearer {user_service.create_access_token(user_id=admin.id)}'}
+
+    def change(**values):
+        # As if made by another worker once its cached state expired
+        for key, value in values.items():
+            setattr(admin, key, value)
+        db.commit()
+        permission_service.forget_principal_state(admin.id)
+        return client.get('/api/v1/auth/admin', headers=headers)
+
+    assert client.get('/api/v1/auth/admin', headers=headers).status_code == 200
+    assert change(is_admin=False).status_code == 403
+    assert change(is_admin=True).status_code == 200
+
+    response = change(is_active=False)
+    assert response.status_code == 403
+    assert response.json()['message'] == 'User is not active'
+
+    assert change(is_active=True, is_deleted=True).status_code == 401
@@ -0,0 +1,95 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.v1.services.plans import etag_matches, plan_catalogue
+from api.v1.services.user import user_service
+from api.v1.models import User
+from api.v1.models.plans import SubscriptionPlan
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+
+def plan(name, price):
+    return {'name': name, 'description': f'{name} plan', 'price': price, 'duration': 'monthly', 'features': ['support']}
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    with TestingSessionLocal() as db:
+        admin = User(username='plansadmin', email='plansadmin@gmail.com', password='not-a-real-hash', first_name='Plans', last_name='Admin', is_admin=True)
+        db.add(admin)
+        db.commit()
+        return {'Authorization': f'Bearer {user_service.create_access_token(user_id=admin.id)}'}
+
+
+def test_matching_etag_is_a_304():
+    response = client.get('/api/v1/plans')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    for if_none_match in (etag, f'W/{etag}', f'"stale", {etag}', '*'):
+        revalidated = client.get('/api/v1/plans', headers={'If-None-Match': if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b''
+        assert revalidated.headers['ETag'] == etag
+
+    assert client.get('/api/v1/plans', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_created_plan_invalidates_the_snapshot(admin_headers):
+    etag = client.get('/api/v1/plans').headers['ETag']
+
+    assert client.post('/api/v1/plans', json=plan('Etag Basic', 10), headers=admin_headers).status_code == 201
+
+    response = client.get('/api/v1/plans', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'Etag Basic' in [item['name'] for item in response.json()['data']]
+
+
+def test_other_workers_changes_show_up_after_the_ttl(monkeypatch):
+    etag = client.get('/api/v1/plans').headers['ETag']
+
+    # A plan created through another worker does not rebuild this worker's snapshot
+    with TestingSessionLocal() as db:
+        db.add(SubscriptionPlan(**plan('Etag Remote', 20)))
+        db.commit()
+
+    assert client.get('/api/v1/plans', headers={'If-None-Match': etag}).status_code == 304
+
+    monkeypatch.setattr(plan_catalogue, 'ttl', 0)
+
+    response = client.get('/api/v1/plans', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'Etag Remote' in [item['name'] for item in response.json()['data']]
+
+
+@pytest.mark.parametrize('if_none_match, matches', [
+    (None, False),
+    ('', False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz" , "abc"', True),
+    ('"xyz"', False),
+    ('abc', False),
+])
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches(if_none_match, '"abc"') is matches
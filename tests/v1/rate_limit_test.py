@@ -0,0 +1,168 @@
+import time
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.utils.rate_limit import Limit, MemoryRateLimitBackend, RedisRateLimitBackend, rate_limiter, refill
+from api.utils.settings import get_settings
+from api.v1.services.user import async_user_service
+
+client = TestClient(app)
+
+
+class FakeRedis:
+    '''Local stand-in for a shared Redis: runs the token bucket script's
+    logic in Python, against one clock for every backend using it'''
+
+    def __init__(self):
+        self.buckets = {}
+        self.scripts = []
+
+    def register_script(self, script):
+        self.scripts.append(script)
+
+        async def run(keys, args):
+            key, (requests, rate, cost) = keys[0], args
+            now = time.monotonic()
+            tokens, updated_at = self.buckets.get(key, (requests, now))
+            tokens, allowed, retry_after = refill(tokens, now - updated_at, Limit(requests, requests / rate), cost)
+            self.buckets[key] = (tokens, now)
+            return [int(allowed), str(retry_after)]
+
+        return run
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_allows_a_burst_then_refills():
+    backend = MemoryRateLimitBackend()
+    limit = Limit(requests=3, period=0.3)
+
+    assert [(await backend.take('key', limit))[0] for _ in range(4)] == [True, True, True, False]
+
+    allowed, retry_after = await backend.take('key', limit)
+    assert not allowed and 0 < retry_after <= 0.1
+
+    time.sleep(0.1)
+    assert (await backend.take('key', limit))[0]
+    assert (await backend.take('other-key', limit))[0]
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_keeps_most_recent_keys():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    limit = Limit(requests=1, period=60)
+
+    for key in ('a', 'b', 'c'):
+        await backend.take(key, limit)
+
+    assert list(backend._buckets) == ['b', 'c']
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_shares_buckets_between_workers():
+    redis = FakeRedis()
+    workers = [RedisRateLimitBackend(redis), RedisRateLimitBackend(redis)]
+    limit = Limit(requests=2, period=60)
+
+    results = [(await workers[index % 2].take('login:ip:1.2.3.4', limit))[0] for index in range(3)]
+
+    assert results == [True, True, False]
+    assert list(redis.buckets) == ['ratelimit:login:ip:1.2.3.4']
+    assert 'HMGET' in redis.scripts[0]
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    '''Fresh buckets and small limits, and a count of the logins that got through'''
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'LOGIN_RATE_LIMIT_IP', 4)
+    monkeypatch.setattr(settings, 'LOGIN_RATE_LIMIT_USERNAME', 2)
+    monkeypatch.setattr(settings, 'RATE_LIMIT_PERIOD', 60)
+
+    attempts = []
+
+    async def authenticate_user(db, username, password):
+        attempts.append(username)
+        raise HTTPException(status_code=400, detail='Invalid user credentials')
+
+    monkeypatch.setattr(async_user_service, 'authenticate_user', authenticate_user)
+
+    original = rate_limiter._backend
+    rate_limiter.backend = MemoryRateLimitBackend()
+    yield attempts
+    rate_limiter.backend = original
+
+
+def login(username):
+    return client.post('/api/v1/auth/login', data={'username': username, 'password': 'wrong'})
+
+
+def test_login_limited_per_username(limits):
+    statuses = [login('victim').status_code for _ in range(3)]
+
+    assert statuses == [400, 400, 429]
+    assert limits == ['victim', 'victim']
+
+    response = login('Victim')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json()['message'] == 'Too many requests, please try again later'
+
+
+def test_login_limited_per_ip(limits):
+    statuses = [login(f'user{index}').status_code for index in range(5)]
+
+    assert statuses == [400, 400, 400, 400, 429]
+    assert len(limits) == 4
+
+
+def test_register_limited_per_username(limits, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'REGISTER_RATE_LIMIT_USERNAME', 1)
+
+    async def create(db, schema):
+        raise HTTPException(status_code=400, detail='User with this email or username already exists')
+
+    monkeypatch.setattr(async_user_service, 'create', create)
+
+    body = {'username': 'taken', 'email': 'taken@example.com', 'password': 'Password@123', 'first_name': 'A', 'last_name': 'B'}
+    statuses = [client.post('/api/v1/auth/register', json=body).status_code for _ in range(2)]
+
+    assert statuses == [400, 429]
+
+
+def test_forwarded_for_trusts_only_the_proxy_entry(limits, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'RATE_LIMIT_TRUSTED_PROXIES', 1)
+
+    # The client makes up a new leftmost entry each time; the proxy appends the real address
+    statuses = [
+        client.post(
+            '/api/v1/auth/login',
+            data={'username': f'spoof{index}', 'password': 'wrong'},
+            headers={'X-Forwarded-For': f'10.0.0.{index}, 203.0.113.7'},
+        ).status_code
+        for index in range(5)
+    ]
+
+    assert statuses == [400, 400, 400, 400, 429]
+
+    # A different real address has its own bucket
+    response = client.post('/api/v1/auth/login', data={'username': 'other', 'password': 'wrong'}, headers={'X-Forwarded-For': '203.0.113.8'})
+    assert response.status_code == 400
+
+
+def test_register_rejects_bodies_that_are_not_objects(limits):
+    response = client.post('/api/v1/auth/register', json=['not', 'an', 'object'])
+    assert response.status_code == 422
+
+    response = client.post('/api/v1/auth/register', content=b'{"username": ', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 422
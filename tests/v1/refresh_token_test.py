@@ -0,0 +1,179 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.db.database import AsyncSessionLocal, get_async_engine
+from api.utils.cache import BloomFilter
+from api.utils.settings import get_settings
+from api.v1.services.refresh_token import RevokedFamilies, refresh_token_service
+from api.v1.services.user import user_service
+from api.v1.models import RefreshToken, User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+PASSWORD = 'Testpassword@123'
+
+
+@pytest.fixture(scope="module", autouse=True)
+def account():
+    db = TestingSessionLocal()
+    member = User(
+        username="rotateuser",
+        email="rotateuser@gmail.com",
+        password=user_service.hash_password(PASSWORD),
+        first_name='Rotate',
+        last_name='User',
+        is_active=True,
+    )
+    db.add(member)
+    db.commit()
+
+    yield member
+
+    db.delete(member)
+    db.commit()
+    db.close()
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'LOGIN_RATE_LIMIT_IP', 0)
+    monkeypatch.setattr(get_settings(), 'LOGIN_RATE_LIMIT_USERNAME', 0)
+
+
+def login():
+    response = client.post('/api/v1/auth/login', data={'username': 'rotateuser', 'password': PASSWORD})
+    assert response.status_code == 200
+    return response.json()['data']['access_token'], response.cookies['refresh_token']
+
+
+def refresh(refresh_token):
+    # The cookie is marked secure, so it has to be sent by hand over http
+    return client.post('/api/v1/auth/refresh-access-token', headers={'Cookie': f'refresh_token={refresh_token}'})
+
+
+def current_user(access_token):
+    return client.get('/api/v1/users/current-user', headers={'Authorization': f'Bearer {access_token}'})
+
+
+def test_bloom_filter_has_no_false_negatives():
+    members = [f'family-{index}' for index in range(1000)]
+    bloom = BloomFilter(capacity=1000, error_rate=0.01, members=members)
+
+    assert all(member in bloom for member in members)
+    false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+    assert false_positives < 300
+
+
+def test_refresh_rotates_the_token():
+    access_token, refresh_token = login()
+
+    response = refresh(refresh_token)
+    assert response.status_code == 200
+    rotated = response.cookies['refresh_token']
+    assert rotated != refresh_token
+
+    assert refresh(rotated).status_code == 200
+    assert current_user(response.json()['data']['access_token']).status_code == 200
+    assert current_user(access_token).status_code == 200
+
+
+def test_reused_refresh_token_revokes_the_session():
+    _, refresh_token = login()
+    other_access_token, other_refresh_token = login()
+
+    response = refresh(refresh_token)
+    rotated, access_token = response.cookies['refresh_token'], response.json()['data']['access_token']
+
+    assert refresh(refresh_token).status_code == 401
+    assert refresh(rotated).status_code == 401
+    assert current_user(access_token).status_code == 401
+
+    # Other sessions of the same user are untouched
+    assert current_user(other_access_token).status_code == 200
+    assert refresh(other_refresh_token).status_code == 200
+
+
+def test_logout_revokes_the_session():
+    access_token, refresh_token = login()
+
+    response = client.post('/api/v1/auth/logout', headers={
+        'Authorization': f'Bearer {access_token}',
+        'Cookie': f'refresh_token={refresh_token}',
+    })
+    assert response.status_code == 200
+
+    assert current_user(access_token).status_code == 401
+    assert refresh(refresh_token).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_revocations_reach_other_workers(account):
+    other_worker = RevokedFamilies(capacity=1000, error_rate=0.01)
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        since = await other_worker.sync(db)
+
+    db = TestingSessionLocal()
+    family_id = refresh_token_service.issue(db, user_id=account.id)['family_id']
+    assert not other_worker.is_revoked(family_id)
+
+    refresh_token_service.revoke_family(db, family_id)
+    db.commit()
+    db.close()
+
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        await other_worker.sync(db, since)
+    assert other_worker.is_revoked(family_id)
+
+    # A fresh filter is rebuilt with every unexpired revocation
+    rebuilt = RevokedFamilies(capacity=1000, error_rate=0.01)
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        await rebuilt.sync(db)
+    assert rebuilt.is_revoked(family_id)
+
+
+@pytest.mark.asyncio
+async def test_async_check_never_opens_a_sync_session(account, monkeypatch):
+    db = TestingSessionLocal()
+    family_id = refresh_token_service.issue(db, user_id=account.id)['family_id']
+    refresh_token_service.revoke_family(db, family_id)
+    db.commit()
+    db.close()
+
+    def blocking_session(*args, **kwargs):
+        raise AssertionError('a sync session would block the event loop')
+
+    monkeypatch.setattr('api.v1.services.refresh_token.SessionLocal', blocking_session)
+
+    # The other worker's filter flags the family; confirming that runs on the async session
+    other_worker = RevokedFamilies(capacity=1000, error_rate=0.01)
+    other_worker.filter.add(family_id)
+    async with TestingAsyncSessionLocal() as session:
+        assert await other_worker.async_is_revoked(family_id, session)
+        assert not await other_worker.async_is_revoked('never-issued', session)
+
+    # Served from the confirmed answers from now on, without a session
+    assert await other_worker.async_is_revoked(family_id)
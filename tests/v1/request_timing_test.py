@@ -0,0 +1,101 @@
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api.core.metrics import http_request_db_statements, http_request_duration, http_requests
+from api.core.middleware import RequestTimingMiddleware
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://'), poolclass=NullPool
+)
+
+app = FastAPI()
+app.add_middleware(RequestTimingMiddleware, slow_request_ms=0.001, slow_query_ms=0.001, n_plus_one_threshold=3)
+
+
+@app.get('/timing/items/{item_id}')
+def sync_route(item_id: int, repeat: int = 1):
+    with engine.connect() as connection:
+        for number in range(repeat):
+            connection.execute(text('SELECT :number'), {'number': number})
+    return {'item_id': item_id}
+
+
+@app.get('/timing/async')
+async def async_route():
+    async with async_engine.connect() as connection:
+        await connection.execute(text('SELECT 1'))
+        await connection.execute(text('SELECT 2'))
+    return {}
+
+
+client = TestClient(app)
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+def test_server_timing_counts_sync_queries():
+    for metric in (http_requests, http_request_duration, http_request_db_statements):
+        metric.reset()
+
+    response = client.get('/timing/items/7', params={'repeat': 2})
+    assert response.status_code == 200
+
+    metrics = parse_server_timing(response.headers['Server-Timing'])
+    assert float(metrics['app']['dur']) >= float(metrics['db']['dur']) > 0
+    assert metrics['db']['desc'] == '"2 queries"'
+
+    route = ('GET', '/timing/items/{item_id}')
+    assert http_requests.values()[route + ('200',)] == 1
+    assert sum(http_request_duration.values()[route][:-1]) == 1
+    assert http_request_db_statements.values()[route] == 2
+
+
+def test_server_timing_counts_async_queries():
+    response = client.get('/timing/async')
+
+    metrics = parse_server_timing(response.headers['Server-Timing'])
+    assert metrics['db']['desc'] == '"2 queries"'
+
+
+def test_requests_do_not_share_stats():
+    client.get('/timing/items/1', params={'repeat': 3})
+    response = client.get('/timing/items/2', params={'repeat': 1})
+
+    metrics = parse_server_timing(response.headers['Server-Timing'])
+    assert metrics['db']['desc'] == '"1 queries"'
+
+
+def test_slow_queries_and_n_plus_one_logged(caplog):
+    with caplog.at_level(logging.WARNING):
+        client.get('/timing/items/1', params={'repeat': 5})
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('Slow query') and 'SELECT' in message and 'number' in message for message in messages)
+    assert any(message.startswith('Slow request GET /timing/items/{item_id}') for message in messages)
+    assert any('Possible N+1 in GET /timing/items/{item_id}: statement ran 5 times' in message for message in messages)
+
+
+def test_no_n_plus_one_below_threshold(caplog):
+    with caplog.at_level(logging.WARNING):
+        client.get('/timing/items/1', params={'repeat': 3})
+
+    assert not any('Possible N+1' in record.getMessage() for record in caplog.records)
@@ -0,0 +1,144 @@
+import pytest
+import threading
+import time
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.v1.services.role import role_service
+from api.v1.services.user import user_service
+from api.v1.models import User, Organization, Role, Permission
+from api.v1.models.base import Base
+from api.v1.schemas.role import RoleCreate
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    db = TestingSessionLocal()
+    db.expire_on_commit = False
+
+    organization, neighbour = Organization(name='Role Batch Tenant'), Organization(name='Role Batch Neighbour')
+    permissions = [Permission(name=name) for name in ('batch:read', 'batch:write')]
+    admin = User(username='batchadmin', email='batchadmin@gmail.com', password='not-a-real-hash', first_name='Batch', last_name='Admin', is_admin=True)
+    db.add_all([organization, neighbour, admin, *permissions])
+    db.add_all([Role(role_name='batch existing', organization=organization), Role(role_name='batch neighbour', organization=neighbour)])
+    db.commit()
+
+    yield db, organization.id, [permission.id for permission in permissions], admin, neighbour.id
+    db.close()
+
+
+def role(name, organization_id, permission_ids):
+    return RoleCreate(role_name=name, organization_id=organization_id, permission_ids=permission_ids)
+
+
+def test_batch_reports_invalid_items_and_creates_the_rest(fixtures):
+    db, organization_id, permission_ids, _, neighbour_id = fixtures
+
+    results = role_service.create_batch(db, [
+        role('batch reader', organization_id, permission_ids[:1]),
+        role('batch orphan', 'missing-organization', permission_ids),
+        role('batch unknown', organization_id, [*permission_ids, 'missing-permission']),
+        role('batch reader', organization_id, permission_ids),
+        role('batch existing', organization_id, []),
+        role('batch writer', organization_id, permission_ids + permission_ids),
+        role('batch reader', neighbour_id, permission_ids),
+        role('batch neighbour', organization_id, []),
+        role('batch neighbour', neighbour_id, []),
+    ])
+
+    assert [result.error for result in results] == [
+        None,
+        'Organization does not exist',
+        'Some permissions do not exist',
+        'Role already exists',
+        'Role already exists',
+        None,
+        None,
+        None,
+        'Role already exists',
+    ]
+    assert all(result.id is None for result in results if result.error)
+
+    created = {role.role_name: role for role in db.scalars(select(Role).where(Role.id.in_([results[0].id, results[5].id])))}
+    assert {permission.id for permission in created['batch reader'].permissions} == set(permission_ids[:1])
+    assert {permission.id for permission in created['batch writer'].permissions} == set(permission_ids)
+    assert db.scalar(select(Role).where(Role.role_name == 'batch orphan')) is None
+
+    # Names are only unique within an organization
+    readers = db.scalars(select(Role.organization_id).where(Role.role_name == 'batch reader')).all()
+    assert sorted(readers) == sorted([organization_id, neighbour_id])
+
+
+def test_batch_route(fixtures):
+    _, organization_id, permission_ids, admin, _ = fixtures
+    headers = {'Authorization': f'Bearer {user_service.create_access_token(user_id=admin.id)}'}
+
+    response = client.post('/api/v1/roles/batch', headers=headers, json={'roles': [
+        {'role_name': 'batch route', 'organization_id': organization_id, 'permission_ids': permission_ids},
+        {'role_name': 'batch existing', 'organization_id': organization_id, 'permission_ids': []},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json()['created'] == 1
+    assert response.json()['failed'] == 1
+
+
+def test_concurrent_batch_with_the_same_name_is_a_409(fixtures):
+    _, organization_id, permission_ids, _, _ = fixtures
+
+    # The rival holds an uncommitted row for the name, so the batch's insert
+    # waits on the unique index after its own existence check has passed
+    rival = TestingSessionLocal()
+    rival.add(Role(role_name='batch racer', organization_id=organization_id))
+    rival.flush()
+
+    outcome = {}
+
+    def create():
+        db = TestingSessionLocal()
+        try:
+            role_service.create_batch(db, [role('batch racer', organization_id, permission_ids)])
+        except HTTPException as exc:
+            outcome['exc'] = exc
+        finally:
+            db.close()
+
+    thread = threading.Thread(target=create)
+    thread.start()
+
+    # pg_stat_activity is a per-transaction snapshot, so poll on fresh connections
+    blocked = text("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND query LIKE 'INSERT INTO roles%'")
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        with engine.connect() as connection:
+            if connection.execute(blocked).scalar():
+                break
+        time.sleep(0.02)
+
+    rival.commit()
+    rival.close()
+    thread.join(10)
+
+    assert outcome['exc'].status_code == 409
+    assert outcome['exc'].detail == 'Role already exists'
+
+    with TestingSessionLocal() as db:
+        assert db.query(Role).filter(Role.role_name == 'batch racer').count() == 1
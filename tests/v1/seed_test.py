@@ -0,0 +1,38 @@
+import sys, os
+import warnings
+
+from sqlalchemy import create_engine, text
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from api.core.dependencies.hashing import get_crypt_context
+from scripts.seed import ROLE_NAMES, SeedPlan, password, seed
+
+
+def test_seed_several_organizations_into_sqlite(tmp_path):
+    database_url = f'sqlite:///{tmp_path / "seed.db"}'
+    # More roles per organization than ROLE_NAMES, so generated names are used too
+    plan = SeedPlan(users=30, organizations=4, blogs=10, jobs=6, roles_per_org=len(ROLE_NAMES) + 2, password_pool=2)
+
+    written = seed(database_url, plan, workers=2, chunk_size=7, rounds=4, create_tables=True, quiet=True)
+
+    assert written['users'] == 30
+    assert written['organizations'] == 4
+    assert written['roles'] == 4 * plan.roles_per_org
+    assert written['user_organization'] == 30 * 2
+    assert written['jobs'] == 6
+
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        names = connection.execute(text('SELECT organization_id, count(DISTINCT role_name) FROM roles GROUP BY organization_id')).all()
+        assert [count for _, count in names] == [plan.roles_per_org] * 4
+
+        hash = connection.execute(text("SELECT password FROM users WHERE username = 'user3'")).scalar()
+        assert get_crypt_context(4).verify(password(3, plan.password_pool), hash)
+
+        # Memberships and roles only point at seeded rows
+        assert connection.execute(text(
+            'SELECT count(*) FROM user_role JOIN roles ON roles.id = user_role.role_id JOIN users ON users.id = user_role.user_id'
+        )).scalar() == written['user_role']
+    engine.dispose()
@@ -0,0 +1,135 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.db.database import SessionLocal, get_async_db, get_db, get_engine
+from api.db.soft_delete import SoftDeleteSession
+from api.utils.settings import get_settings
+from api.v1.services.user import user_service
+from api.v1.models import User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# A plain session, which sees soft deleted rows like the database does
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The app's own session class for requests; TestClient runs each request on
+# a fresh event loop, so pooled asyncpg connections cannot be reused
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+AppSessionLocal = sessionmaker(class_=SoftDeleteSession, autocommit=False, autoflush=False, bind=engine)
+AppAsyncSessionLocal = async_sessionmaker(bind=async_engine, sync_session_class=SoftDeleteSession, autoflush=False, expire_on_commit=False)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+PASSWORD = 'Testpassword@123'
+
+
+def make_user(name, **fields):
+    return User(
+        username=name,
+        email=f'{name}@gmail.com',
+        password=user_service.hash_password(PASSWORD),
+        first_name='Soft',
+        last_name='Delete',
+        is_active=True,
+        **fields,
+    )
+
+
+@pytest.fixture(scope="module", autouse=True)
+def accounts():
+    db = TestingSessionLocal()
+    live, deleted = make_user('liveuser'), make_user('goneuser', is_deleted=True)
+    db.add_all([live, deleted])
+    db.commit()
+
+    yield live, deleted
+
+    db.close()
+
+
+def override_get_db():
+    db = AppSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with AppAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app_sessions():
+    # Other modules swap in plain sessions, which would see deleted rows
+    original = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(original)
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(monkeypatch):
+    for name in ('LOGIN_RATE_LIMIT_IP', 'LOGIN_RATE_LIMIT_USERNAME', 'REGISTER_RATE_LIMIT_IP', 'REGISTER_RATE_LIMIT_USERNAME'):
+        monkeypatch.setattr(get_settings(), name, 0)
+
+
+def test_deleted_users_are_left_out_of_queries(accounts):
+    live, deleted = accounts
+
+    with SessionLocal(bind=get_engine()) as db:
+        assert user_service.fetch_by_username(db, 'liveuser').id == live.id
+        assert db.get(User, deleted.id) is None
+
+        with pytest.raises(HTTPException) as exc:
+            user_service.fetch_by_email(db, 'goneuser@gmail.com')
+        assert exc.value.status_code == 404
+
+        usernames = db.scalars(select(User.username).where(User.last_name == 'Delete')).all()
+        assert usernames == ['liveuser']
+
+
+def test_deleted_users_can_be_included(accounts):
+    _, deleted = accounts
+    query = select(User).where(User.username == 'goneuser')
+
+    with SessionLocal(bind=get_engine()) as db:
+        assert db.scalar(query.execution_options(include_deleted=True)).id == deleted.id
+
+    with SessionLocal(bind=get_engine(), info={'include_deleted': True}) as db:
+        assert db.get(User, deleted.id) is not None
+
+
+def test_deleted_user_cannot_log_in():
+    response = client.post('/api/v1/auth/login', data={'username': 'goneuser', 'password': PASSWORD})
+    assert response.status_code == 400
+
+    response = client.post('/api/v1/auth/login', data={'username': 'liveuser', 'password': PASSWORD})
+    assert response.status_code == 200
+
+
+def test_deleted_users_email_and_username_can_be_taken_again():
+    body = {'username': 'goneuser', 'email': 'goneuser@gmail.com', 'password': PASSWORD, 'first_name': 'New', 'last_name': 'Owner'}
+
+    assert client.post('/api/v1/auth/register', json=body).status_code == 201
+    assert client.post('/api/v1/auth/register', json=body).status_code == 400
@@ -0,0 +1,40 @@
+import subprocess
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.append(ROOT)
+
+from api.utils.settings import LazyObject
+
+
+# Run in a fresh interpreter with none of the app's variables set, so any
+# setting read during import raises
+IMPORT_MAIN = '''
+import main
+from api.utils.settings import get_settings
+from api.utils.jwt_backend import jwt_backend
+from api.v1.services.user import user_cache
+
+assert get_settings.cache_info().currsize == 0
+assert jwt_backend._wrapped is None and user_cache._wrapped is None
+'''
+
+
+def test_importing_main_does_not_read_settings():
+    env = {'PATH': os.environ.get('PATH', '')}
+    result = subprocess.run([sys.executable, '-c', IMPORT_MAIN], cwd=ROOT, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_lazy_object_builds_once_on_first_use():
+    built = []
+    cache = LazyObject(lambda: built.append(1) or {'key': 'value'})
+
+    assert built == []
+    assert cache.get('key') == 'value'
+    assert 'key' in cache and len(cache) == 1
+    assert cache.resolve() is cache.resolve()
+    assert built == [1]
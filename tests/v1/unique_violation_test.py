@@ -0,0 +1,96 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from decouple import config
+import sys, os
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from main import app
+from api.db.database import get_async_db
+from api.utils.settings import get_settings
+from api.v1.models import User
+from api.v1.models.base import Base
+
+SQLALCHEMY_DATABASE_URL = config('DB_URL')
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# TestClient runs each request on a fresh event loop, so pooled asyncpg
+# connections cannot be reused between requests
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+Base.metadata.create_all(bind=engine)
+
+client = TestClient(app)
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app_sessions():
+    original = dict(app.dependency_overrides)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(original)
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limits(monkeypatch):
+    for name in ('REGISTER_RATE_LIMIT_IP', 'REGISTER_RATE_LIMIT_USERNAME'):
+        monkeypatch.setattr(get_settings(), name, 0)
+
+
+def register(username, email):
+    return client.post('/api/v1/auth/register', json={
+        'username': username,
+        'email': email,
+        'password': 'Testpassword@123',
+        'first_name': 'Unique',
+        'last_name': 'User',
+    })
+
+
+def test_duplicate_registration_is_a_400():
+    assert register('uniqueuser', 'uniqueuser@gmail.com').status_code == 201
+
+    for username, email in (('uniqueuser', 'other@gmail.com'), ('otheruser', 'uniqueuser@gmail.com')):
+        response = register(username, email)
+        assert response.status_code == 400
+        assert response.json() == {
+            'success': False,
+            'status_code': 400,
+            'message': 'User with this email or username already exists',
+        }
+
+
+def test_concurrent_registrations_create_one_user():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: register('raceuser', 'raceuser@gmail.com'), range(4)))
+
+    assert sorted(response.status_code for response in responses) == [201, 400, 400, 400]
+
+    with TestingSessionLocal() as db:
+        assert db.query(User).filter(User.email == 'raceuser@gmail.com').count() == 1
+
+
+def test_duplicate_newsletter_signup_is_a_400():
+    assert client.post('/api/v1/pages/newsletter', json={'email': 'unique@example.com'}).status_code == 200
+
+    response = client.post('/api/v1/pages/newsletter', json={'email': 'unique@example.com'})
+    assert response.status_code == 400
+    assert response.json()['message'] == 'Email already exists'
@@ -1,7 +1,13 @@
 import pytest
+import asyncio
+from types import SimpleNamespace
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from decouple import config
 import sys, os
 import warnings
@@ -10,8 +16,10 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from main import app
-from api.db.database import Base, get_db
-from api.v1.services.user import user_service
+from api.db.database import Base, get_db, get_async_db
+from api.core.dependencies.email import MailConfig, MailMessage, mail_queue, mail_service
+from api.v1.schemas.user import DeactivateUserSchema
+from api.v1.services.user import async_user_service, user_service
 from api.v1.models.user import User
 from api.v1.models.base import Base
 
@@ -20,6 +28,13 @@ SQLALCHEMY_DATABASE_URL = config('DB_URL')
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs each request on a fresh event loop, so pooled asyncpg
+# connections cannot be reused between requests
+async_engine = create_async_engine(
+	make_url(SQLALCHEMY_DATABASE_URL).set(drivername='postgresql+asyncpg'), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base.metadata.create_all(bind=engine)
 
 def override_get_db():
@@ -29,7 +44,12 @@ def override_get_db():
 	finally:
 		db.close()
 
+async def override_get_async_db():
+	async with TestingAsyncSessionLocal() as db:
+		yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 client = TestClient(app)
 
@@ -134,6 +154,112 @@ def test_user_inactive(test_db):
     assert user_already_deactivated.json()['message'] == 'User is not active'
 	
 
+@pytest.mark.asyncio
+async def test_deactivation_mail_only_sent_after_commit(test_db, monkeypatch):
+    user = User(
+        username="testuser2",
+        email="testuser2@gmail.com",
+        password='not-a-real-hash',
+        first_name='Test',
+        last_name='User',
+        is_active=True,
+    )
+    test_db.add(user)
+    test_db.commit()
+
+    sent = []
+    monkeypatch.setattr(mail_service, 'send_mail', lambda **mail: sent.append(mail['subject']))
+    request = SimpleNamespace(url=SimpleNamespace(hostname='testserver'))
+    schema = DeactivateUserSchema(confirmation=True)
+
+    async def failing_commit():
+        raise OperationalError('COMMIT', {}, Exception('connection lost'))
+
+    async with TestingAsyncSessionLocal() as db:
+        monkeypatch.setattr(db, 'commit', failing_commit)
+        with pytest.raises(OperationalError):
+            await async_user_service.deactivate_user(request, db, schema, await db.get(User, user.id))
+
+    assert sent == []
+
+    async with TestingAsyncSessionLocal() as db:
+        await async_user_service.deactivate_user(request, db, schema, await db.get(User, user.id))
+
+    assert sent == ['Account deactivation']
+
+
+@pytest.fixture
+def full_mail_queue(monkeypatch):
+    """A mail queue, without workers, that already holds max_pending emails"""
+
+    queue = asyncio.Queue()
+    queue.put_nowait(MailMessage(to='queued@gmail.com', subject='Queued', body=''))
+    monkeypatch.setattr(mail_queue, 'config', MailConfig(host='localhost', port=25, from_addr='noreply@example.com', max_pending=1))
+    monkeypatch.setattr(mail_queue, '_queue', queue)
+    return queue
+
+
+def make_active_user(test_db, name):
+    user = User(username=name, email=f'{name}@gmail.com', password='not-a-real-hash', first_name='Test', last_name='User', is_active=True)
+    test_db.add(user)
+    test_db.commit()
+    return user
+
+
+@pytest.mark.asyncio
+async def test_full_mail_queue_fails_before_commit(test_db, full_mail_queue, monkeypatch):
+    user = make_active_user(test_db, 'testuser3')
+    monkeypatch.setattr(mail_queue, '_loop', asyncio.get_running_loop())
+    request = SimpleNamespace(url=SimpleNamespace(hostname='testserver'))
+
+    async with TestingAsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as exc:
+            await async_user_service.deactivate_user(request, db, DeactivateUserSchema(confirmation=True), await db.get(User, user.id))
+
+    assert exc.value.status_code == 503
+
+    # Nothing was committed, so the client can simply retry
+    async with TestingAsyncSessionLocal() as db:
+        assert (await db.get(User, user.id)).is_active
+
+    test_db.query(User).filter(User.id == user.id).update({'is_active': False})
+    test_db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as exc:
+            await async_user_service.reactivate_user(db, user_service.create_access_token(user_id=user.id))
+
+    assert exc.value.status_code == 503
+
+    async with TestingAsyncSessionLocal() as db:
+        assert not (await db.get(User, user.id)).is_active
+
+    assert full_mail_queue.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_mail_queue_filling_after_commit_does_not_fail_the_request(test_db, full_mail_queue, monkeypatch):
+    user = make_active_user(test_db, 'testuser4')
+    monkeypatch.setattr(mail_queue, '_loop', asyncio.get_running_loop())
+    request = SimpleNamespace(url=SimpleNamespace(hostname='testserver'))
+
+    # Other requests take the last slots between the capacity check and the email
+    monkeypatch.setattr(mail_service, 'check_capacity', lambda: None)
+
+    async with TestingAsyncSessionLocal() as db:
+        reactivation_link = await async_user_service.deactivate_user(request, db, DeactivateUserSchema(confirmation=True), await db.get(User, user.id))
+
+    assert reactivation_link.startswith('https://testserver/api/v1/users/accounts/reactivate?token=')
+
+    async with TestingAsyncSessionLocal() as db:
+        await async_user_service.reactivate_user(db, reactivation_link.split('token=')[1])
+
+    async with TestingAsyncSessionLocal() as db:
+        assert (await db.get(User, user.id)).is_active
+
+    assert [full_mail_queue.get_nowait().subject for _ in range(3)] == ['Queued', 'Account deactivation', 'Account reactivation']
+
+
 # import pytest
 # from fastapi.testclient import TestClient
 # from unittest.mock import patch, MagicMock